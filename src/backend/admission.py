@@ -0,0 +1,184 @@
+"""
+Admission control protecting the Cosmos DB RU budget
+- A token bucket per (route class, userName) limits how often a single
+  player (or client address, for routes without a user) can hit a class
+  of endpoints. An empty bucket answers 429 with Retry-After. Route
+  classes without a configured limit are not rate limited.
+- A global cap on in-flight database requests sheds load with 429 instead
+  of letting every request queue up behind Cosmos DB throttling.
+
+The client address is the connection's peer unless TRUSTED_PROXY_HOPS
+reverse proxies sit in front of the app: only the X-Forwarded-For entries
+those proxies appended are trusted, since clients can send any
+X-Forwarded-For they like.
+
+Buckets and the in-flight count live in each worker process, so with
+serve.py's WORKERS processes a client can get up to WORKERS times the
+configured rate, and the database up to WORKERS * MAX_INFLIGHT_DB_REQUESTS
+requests in flight.
+
+Endpoints opt in with dependencies=[Depends(admission("<route class>"))].
+Middleware that has to reach the database before routing (idempotency keys)
+admits the request itself with admit() and marks the scope ADMITTED, so the
+endpoint's dependency doesn't count it a second time.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from config import settings
+from metrics import metrics
+
+# Buckets kept per route class before the least recently used are dropped
+MAX_BUCKETS = 10000
+
+# Scope key of requests admitted before routing; they hold an in-flight slot until they end
+ADMITTED = "admission.admitted"
+
+
+class TokenBucket:
+    """Classic token bucket: refills at rate tokens/second up to burst"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; returns 0 on success, otherwise seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Per-user rate limits and a global in-flight cap"""
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]], max_inflight: int):
+        self.limits = limits
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self._buckets: Dict[str, OrderedDict] = {route_class: OrderedDict() for route_class in limits}
+        self._lock = threading.Lock()
+
+    def check_rate(self, route_class: str, key: str) -> float:
+        """0 if admitted, otherwise the Retry-After in seconds"""
+        if route_class not in self.limits:
+            return 0.0
+        rate, burst = self.limits[route_class]
+        with self._lock:
+            buckets = self._buckets[route_class]
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = TokenBucket(rate, burst)
+                if len(buckets) > MAX_BUCKETS:
+                    buckets.popitem(last=False)
+            buckets.move_to_end(key)
+            return bucket.take()
+
+    def enter(self) -> bool:
+        """Reserve an in-flight database slot"""
+        with self._lock:
+            if self.inflight >= self.max_inflight:
+                return False
+            self.inflight += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def stats(self) -> dict:
+        return {"inflight": self.inflight, "maxInflight": self.max_inflight}
+
+
+controller = AdmissionController(settings.rate_limits, settings.MAX_INFLIGHT_DB_REQUESTS)
+metrics.register("admission", controller.stats)
+
+
+def _too_many_requests(message: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail={"success": False, "message": message},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+async def _request_user(request: Request) -> Optional[str]:
+    """userName from the path or, for JSON writes, from the body"""
+    user_name = request.path_params.get("userName")
+    if user_name is None and request.method == "POST":
+        try:
+            body = await request.json()  # already parsed and cached by FastAPI
+        except ValueError:
+            return None
+        if isinstance(body, dict):
+            user_name = body.get("userName")
+    return user_name if isinstance(user_name, str) else None
+
+
+def client_address(request: Request, trusted_hops: int) -> str:
+    """Client address as seen by the outermost of trusted_hops reverse proxies
+    
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For, so the last trusted_hops entries are trustworthy and
+    anything before them is whatever the client sent.
+    """
+    peer = request.client.host if request.client else "anonymous"
+    if trusted_hops <= 0:
+        return peer
+    forwarded = [
+        address.strip() for address in request.headers.get("x-forwarded-for", "").split(",") if address.strip()
+    ]
+    hops = forwarded[-trusted_hops:]
+    return hops[0] if hops else peer
+
+
+def admit(route_class: str, key: str) -> bool:
+    """Admit a request of key (userName or client address) to a route class
+    
+    Raises HTTPException 429 if it is refused. True if it took an in-flight
+    slot, which the caller gives back with controller.leave().
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return False
+
+    retry_after = controller.check_rate(route_class, key)
+    if retry_after:
+        metrics.incr(f"admission.rejected.{route_class}")
+        raise _too_many_requests("Too many requests, please slow down", retry_after)
+
+    if not controller.enter():
+        metrics.incr("admission.shed")
+        raise _too_many_requests("Server is busy, please retry shortly", 1)
+
+    metrics.incr(f"admission.admitted.{route_class}")
+    return True
+
+
+def admission(route_class: str):
+    """Dependency that applies admission control for a route class"""
+
+    async def dependency(request: Request):
+        if not settings.RATE_LIMIT_ENABLED or request.scope.get(ADMITTED):
+            yield
+            return
+
+        key = await _request_user(request) or client_address(request, settings.TRUSTED_PROXY_HOPS)
+        admit(route_class, key)
+        try:
+            yield
+        finally:
+            controller.leave()
+
+    return dependency
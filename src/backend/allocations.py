@@ -0,0 +1,140 @@
+"""
+Sampled per-route memory allocation profiling with tracemalloc
+With ALLOCATION_SAMPLE_RATE > 0, that fraction of HTTP requests runs with
+tracemalloc tracing. For each sampled request we record:
+
+- peak: the most memory the request had allocated at any point
+- net: memory it allocated that was still alive when it finished
+- the source lines holding most of that net memory
+
+Results are aggregated per route (method and path template), never per
+request, and exposed through GET /api/debug/allocations (X-Admin-Secret
+required) and, without the allocation sites, the "allocations" metrics group.
+
+Tracing only runs during sampled requests, and only one request is sampled
+at a time. Allocations by requests running concurrently with it are
+counted too, so keep the rate low under load.
+"""
+
+import random
+import tracemalloc
+from typing import Dict, Optional
+
+from metrics import metrics
+
+# Allocation sites kept per route between reports
+MAX_SITES_PER_ROUTE = 50
+
+_IGNORED_FRAMES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class RouteAllocations:
+    """Allocation statistics of the sampled requests of one route"""
+
+    def __init__(self):
+        self.samples = 0
+        self.peak_total = 0
+        self.peak_max = 0
+        self.net_total = 0
+        self.sites: Dict[str, int] = {}  # "file:line" -> net bytes summed over samples
+
+    def add(self, peak: int, net: int, sites: Dict[str, int]):
+        self.samples += 1
+        self.peak_total += peak
+        self.peak_max = max(self.peak_max, peak)
+        self.net_total += net
+        for site, size in sites.items():
+            self.sites[site] = self.sites.get(site, 0) + size
+        if len(self.sites) > MAX_SITES_PER_ROUTE:
+            self.sites = dict(sorted(self.sites.items(), key=lambda s: -s[1])[:MAX_SITES_PER_ROUTE])
+
+    def summary(self) -> dict:
+        return {
+            "samples": self.samples,
+            "avgPeakBytes": self.peak_total // self.samples,
+            "maxPeakBytes": self.peak_max,
+            "avgNetBytes": self.net_total // self.samples,
+        }
+
+    def report(self, top_sites: int) -> dict:
+        top = sorted(self.sites.items(), key=lambda s: -s[1])[:top_sites]
+        return dict(
+            self.summary(),
+            topSites=[{"site": site, "avgNetBytes": size // self.samples} for site, size in top]
+        )
+
+
+class AllocationProfiler:
+    """Samples requests and aggregates their allocations per route"""
+
+    def __init__(self, sample_rate: float, top_sites: int):
+        self.sample_rate = sample_rate
+        self.top_sites = top_sites
+        self.routes: Dict[str, RouteAllocations] = {}
+        self._sampling = False
+
+    def start(self) -> bool:
+        """Start tracing the current request if it is sampled"""
+        if self._sampling or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        if tracemalloc.is_tracing():
+            # Someone else (e.g. PYTHONTRACEMALLOC) owns tracemalloc
+            return False
+        self._sampling = True
+        tracemalloc.start()
+        return True
+
+    def stop(self, route: str):
+        """Stop tracing and record the request's allocations under route"""
+        try:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_FRAMES)
+            net, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            self._sampling = False
+
+        sites = {
+            f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}": stat.size
+            for stat in snapshot.statistics("lineno")[:self.top_sites]
+        }
+        self.routes.setdefault(route, RouteAllocations()).add(peak, net, sites)
+        metrics.incr("allocations.sampled")
+
+    def stats(self) -> dict:
+        return {
+            "sampleRate": self.sample_rate,
+            "routes": {route: allocations.summary() for route, allocations in self.routes.items()}
+        }
+
+    def report(self, route: Optional[str] = None) -> dict:
+        """Per-route statistics including the top allocation sites"""
+        return {
+            name: allocations.report(self.top_sites)
+            for name, allocations in sorted(self.routes.items())
+            if route is None or name == route
+        }
+
+
+class AllocationMiddleware:
+    """ASGI middleware profiling the allocations of sampled HTTP requests"""
+
+    def __init__(self, app, profiler: AllocationProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.start():
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            path = route.path if route is not None else "(unmatched)"
+            self.profiler.stop(f"{scope['method']} {path}")
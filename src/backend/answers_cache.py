@@ -0,0 +1,66 @@
+"""
+Process-wide cache for the admin answer documents
+The correct answers change a couple of times a year, so score endpoints
+read them from memory. Writes go through the cache and a background task
+revalidates every entry against Cosmos DB using its ETag.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class CacheEntry:
+    """Cached admin document with the ETag it was read at"""
+
+    def __init__(self, value: Any, etag: Optional[str]):
+        self.value = value
+        self.etag = etag
+        self.checked_at = time.monotonic()
+
+
+class AdminAnswersCache:
+    """Thread-safe cache of admin answer documents keyed by document id"""
+
+    def __init__(self, revalidate_seconds: float):
+        self.revalidate_seconds = revalidate_seconds
+        self._entries: Dict[str, CacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, doc_id: str, loader: Callable[[], CacheEntry]) -> Any:
+        """Get a cached document, loading it on the first access only"""
+        entry = self._entries.get(doc_id)
+        if entry is None:
+            entry = loader()
+            with self._lock:
+                # Keep whatever a concurrent write stored in the meantime
+                entry = self._entries.setdefault(doc_id, entry)
+        return entry.value
+
+    def put(self, doc_id: str, value: Any, etag: Optional[str]):
+        """Store a document after it was written"""
+        with self._lock:
+            self._entries[doc_id] = CacheEntry(value, etag)
+
+    def refresh(self, doc_id: str, previous: CacheEntry, entry: CacheEntry):
+        """Replace an entry after revalidation unless a write replaced it first"""
+        with self._lock:
+            if self._entries.get(doc_id) is previous:
+                self._entries[doc_id] = entry
+
+    def invalidate(self, doc_id: Optional[str] = None):
+        """Drop one document (or all of them) so the next read reloads it"""
+        with self._lock:
+            if doc_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(doc_id, None)
+
+    def stale_entries(self) -> Dict[str, CacheEntry]:
+        """Get the entries that are due for ETag revalidation"""
+        now = time.monotonic()
+        return {
+            doc_id: entry
+            for doc_id, entry in list(self._entries.items())
+            if now - entry.checked_at >= self.revalidate_seconds
+        }
@@ -0,0 +1,81 @@
+"""
+Optimal assignment (Hungarian algorithm)
+Used wherever we need the best giver -> receiver assignment instead of
+trying every permutation. Runs in O(n^3).
+"""
+
+from typing import List, Optional
+
+# Weight for pairs that may not be assigned (e.g. someone giving to themselves)
+FORBIDDEN = None
+
+_INF = float("inf")
+
+
+def min_cost_assignment(cost: List[List[float]]) -> Optional[List[int]]:
+    """Assign every row to a distinct column with minimum total cost
+
+    cost is a square matrix; an entry of inf forbids that pair.
+    Returns the column for each row, or None if no valid assignment exists.
+    """
+    n = len(cost)
+    if n == 0:
+        return []
+
+    # Potentials and matching are 1-indexed (column 0 is a sentinel)
+    u = [0.0] * (n + 1)
+    v = [0.0] * (n + 1)
+    match = [0] * (n + 1)  # match[column] = row
+    way = [0] * (n + 1)
+
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        min_slack = [_INF] * (n + 1)
+        used = [False] * (n + 1)
+        while True:
+            used[column] = True
+            current_row = match[column]
+            delta = _INF
+            next_column = 0
+            for j in range(1, n + 1):
+                if used[j]:
+                    continue
+                slack = cost[current_row - 1][j - 1] - u[current_row] - v[j]
+                if slack < min_slack[j]:
+                    min_slack[j] = slack
+                    way[j] = column
+                if min_slack[j] < delta:
+                    delta = min_slack[j]
+                    next_column = j
+            if delta == _INF:
+                return None
+            for j in range(n + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            column = next_column
+            if match[column] == 0:
+                break
+        # Follow the augmenting path back
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+
+    result = [0] * n
+    for j in range(1, n + 1):
+        result[match[j] - 1] = j - 1
+    return result
+
+
+def max_weight_assignment(weights: List[List[Optional[float]]]) -> Optional[List[int]]:
+    """Assign every row to a distinct column with maximum total weight
+
+    weights is a square matrix; FORBIDDEN (None) entries may not be used.
+    Returns the column for each row, or None if no valid assignment exists.
+    """
+    cost = [[_INF if w is FORBIDDEN else -w for w in row] for row in weights]
+    return min_cost_assignment(cost)
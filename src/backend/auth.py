@@ -1 +1,20 @@
-# No authentication - all endpoints are public
+# No authentication for players - game endpoints are public.
+# Endpoints that expose the whole game (correct answers included) or server
+# internals require an X-Admin-Secret header equal to ADMIN_SECRET.
+
+import hmac
+
+from fastapi import Header, HTTPException, status
+
+from config import settings
+
+
+def require_admin_secret(x_admin_secret: str = Header("")):
+    """Only requests with X-Admin-Secret: ADMIN_SECRET (never, while it is empty)"""
+    if not settings.ADMIN_SECRET or not hmac.compare_digest(
+        x_admin_secret.encode("utf-8"), settings.ADMIN_SECRET.encode("utf-8")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={"success": False, "message": "A valid X-Admin-Secret header is required"}
+        )
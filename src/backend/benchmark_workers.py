@@ -0,0 +1,109 @@
+"""
+Throughput benchmark for serve.py with increasing worker counts
+Starts the server once per worker count, drives it with several client
+processes for a fixed duration and prints requests per second.
+
+The default path is the scoreboard: a real read path going through the
+score query, the admin answers cache and request coalescing. Only 2xx
+responses count as served; throttled (429) and failed requests are
+reported separately. Run it against the configured Cosmos DB, or offline
+with COSMOS_BACKEND=fake and the COSMOS_FAKE_*_LATENCY settings.
+
+Usage:
+    python benchmark_workers.py [--workers 1,2,4] [--path /api/scoreboard] [--clients 8] [--duration 10]
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_healthy(base_url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become healthy")
+
+
+def client(url: str, duration: float, results):
+    """Send requests back to back for duration seconds"""
+    session = requests.Session()
+    count = rejected = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            status = session.get(url, timeout=10).status_code
+        except requests.RequestException:
+            errors += 1
+            continue
+        if status < 300:
+            count += 1
+        elif status < 500:
+            rejected += 1
+        else:
+            errors += 1
+    results.put((count, rejected, errors))
+
+
+def run(workers: int, path: str, clients: int, duration: float) -> float:
+    """Benchmark one worker count, return requests per second"""
+    port = free_port()
+    env = dict(os.environ, WORKERS=str(workers), PORT=str(port))
+    server = subprocess.Popen([sys.executable, "serve.py"], env=env, stdout=subprocess.DEVNULL)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_until_healthy(base_url)
+
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=client, args=(base_url + path, duration, results))
+            for _ in range(clients)
+        ]
+        for p in procs:
+            p.start()
+        totals = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+        requests_done = sum(count for count, _, _ in totals)
+        rejected = sum(rej for _, rej, _ in totals)
+        errors = sum(err for _, _, err in totals)
+        rps = requests_done / duration
+        print(f"  workers={workers:<3} {rps:>9.0f} req/s  ({requests_done} ok, {rejected} rejected, {errors} errors)")
+        return rps
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark throughput by worker count")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--path", default="/api/scoreboard")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"📈 GET {args.path} with {args.clients} clients for {args.duration}s per run")
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        rps = run(workers, args.path, args.clients, args.duration)
+        baseline = baseline or rps
+        print(f"           scaling vs first run: {rps / baseline:.2f}x")
@@ -0,0 +1,62 @@
+"""
+Single-flight coalescing of identical concurrent reads
+When many clients ask for the same expensive result at once (scoreboard,
+scores, all predictions at reveal time), only the first request runs the
+blocking computation. Requests for the same key that arrive while it runs
+wait for it and get the same result, or the same exception.
+
+Each flight has a deadline: waiters give up with TimeoutError after
+timeout seconds, and a request arriving after the deadline starts a new
+flight instead of joining one that may be stuck. Results are not kept
+once the flight lands.
+"""
+
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from metrics import metrics
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Shares one in-flight computation between concurrent callers per key"""
+
+    def __init__(self, timeout_seconds: float, executor: Optional[Executor] = None):
+        self.timeout_seconds = timeout_seconds
+        self.executor = executor  # runs the blocking functions; None = the default executor
+        self._flights: Dict[str, Tuple[asyncio.Task, float]] = {}  # key -> (task, deadline)
+
+    async def do(self, key: str, function: Callable[[], T], timeout: Optional[float] = None) -> T:
+        """Result of function(), run in the executor, shared with concurrent callers of key"""
+        now = time.monotonic()
+        flight = self._flights.get(key)
+        if flight is not None and flight[1] > now:
+            task, deadline = flight
+            metrics.incr("singleflight.coalesced")
+            metrics.incr(f"singleflight.coalesced.{key}")
+        else:
+            task = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(self.executor, function))
+            deadline = now + (timeout or self.timeout_seconds)
+            self._flights[key] = (task, deadline)
+            task.add_done_callback(lambda done: self._land(key, done))
+            metrics.incr(f"singleflight.executed.{key}")
+
+        try:
+            # shield: a waiter timing out must not cancel the flight for the others
+            return await asyncio.wait_for(asyncio.shield(task), max(deadline - now, 0))
+        except asyncio.TimeoutError:
+            metrics.incr(f"singleflight.timeouts.{key}")
+            raise TimeoutError(f"{key} did not complete in time") from None
+
+    def _land(self, key: str, task: asyncio.Task):
+        if self._flights.get(key, (None,))[0] is task:
+            del self._flights[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter gave up
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"inflight": sorted(self._flights)}
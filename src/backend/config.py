@@ -1,12 +1,14 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
     
-    REVEAL_DATE: datetime = datetime(2024, 12, 24, 0, 0, 0)
+    # Results are revealed, and frozen into the reveal snapshot, at this date (UTC).
+    # Unset: revealed now, and only frozen when an admin finalizes the game
+    REVEAL_DATE: Optional[datetime] = None
     PORT: int = 80
     CORS_ORIGINS: str = "*"  # Allow all origins for now
     VERSION: str = "0.0.28"
@@ -16,12 +18,123 @@ class Settings(BaseSettings):
     COSMOS_KEY: str = ""  # Set via COSMOS_KEY environment variable
     COSMOS_DATABASE: str = "AmigoInvisibleDB"
     COSMOS_CONTAINER: str = "Predictions"
+    # "azure", or "fake" for the in-memory stand-in (fake_cosmos.py) in performance tests
+    COSMOS_BACKEND: str = "azure"
+    # Fake backend: latency per request kind (e.g. "lognormal:8:0.5", see fake_cosmos.LatencyModel)
+    COSMOS_FAKE_READ_LATENCY: str = ""
+    COSMOS_FAKE_WRITE_LATENCY: str = ""
+    COSMOS_FAKE_QUERY_LATENCY: str = ""
+    COSMOS_FAKE_RU_PER_SECOND: float = 0  # provisioned throughput, 0 = never throttle
+    COSMOS_FAKE_ERROR_RATE: float = 0.0  # fraction of requests failing with 503
+    COSMOS_FAKE_SEED: int = 0
+    
+    # Resilience layer: retries for throttled calls and adaptive concurrency limit
+    COSMOS_MAX_RETRIES: int = 6
+    COSMOS_RETRY_BASE_MS: int = 50
+    COSMOS_RETRY_MAX_MS: int = 5000
+    COSMOS_CONCURRENCY_INITIAL: int = 16
+    COSMOS_CONCURRENCY_MIN: int = 1
+    COSMOS_CONCURRENCY_MAX: int = 64
+    
+    # user_submission storage schema for writes (1 = legacy, 3 = compact)
+    STORAGE_SCHEMA_VERSION: int = 3
+    # Rewrite legacy user_submission documents in the background on startup. Off by
+    # default: documents move to the compact schema as users write them, or all at
+    # once with upgrade_schema.py
+    SCHEMA_UPGRADE_ON_STARTUP: bool = False
+    
+    # Admin answer documents are cached in-process and revalidated by ETag
+    ADMIN_ANSWERS_REVALIDATE_SECONDS: int = 30
+    
+    # Production server (serve.py)
+    WORKERS: int = 0  # 0 = one worker per CPU core
+    UVICORN_LOOP: str = "auto"  # auto, asyncio or uvloop
+    UVICORN_HTTP: str = "auto"  # auto, h11 or httptools
+    UVICORN_BACKLOG: int = 2048
+    
+    # Shared local directory for cross-worker cache invalidation (empty = single worker)
+    INVALIDATION_DIR: str = ""
+    INVALIDATION_POLL_MS: int = 100
+    
+    # Live quiz: late answers accepted this long after a question's deadline
+    LIVE_QUIZ_GRACE_MS: int = 500
+    LIVE_QUIZ_QUESTIONS: int = 10  # questions per round unless the admin picks them
+    
+    # What-if engine: enumerate exactly up to this many completions, sample beyond
+    WHATIF_EXACT_LIMIT: int = 50000
+    WHATIF_SAMPLES: int = 10000
+    
+    # Admission control: token buckets per userName (or client) and route class
+    RATE_LIMIT_ENABLED: bool = True
+    # class:rate/s:burst, per worker process. Scoreboard and reveal routes are shared,
+    # cached reads that everyone asks for at once, and are only bounded by the in-flight cap
+    RATE_LIMITS: str = "quiz_answer:2:10,write:1:5,read:5:20"
+    MAX_INFLIGHT_DB_REQUESTS: int = 64  # per worker process
+    # Reverse proxies in front of the app whose X-Forwarded-For entries are trusted
+    TRUSTED_PROXY_HOPS: int = 0
+    
+    # Group commit: buffer quiz answers briefly and write each user's batch once
+    QUIZ_GROUP_COMMIT: bool = False
+    QUIZ_GROUP_COMMIT_WINDOW_MS: int = 5
+    QUIZ_GROUP_COMMIT_MAX_BATCH: int = 64
+    
+    # Question bank: builtin, file (JSON / NDJSON at QUESTION_BANK_FILE) or database
+    QUESTION_BANK_SOURCE: str = "builtin"
+    QUESTION_BANK_FILE: str = ""
+    QUESTION_BANK_RELOAD_SECONDS: int = 30
+    QUIZ_QUESTIONS_PER_USER: int = 0  # random subset per user, 0 = the whole bank
+    
+    # Idempotency-Key: responses of recent writes kept in Cosmos DB for replay to client retries
+    IDEMPOTENCY_TTL_SECONDS: int = 300
+    IDEMPOTENCY_LEASE_SECONDS: int = 30  # a key whose request hasn't finished by then can be retried
+    IDEMPOTENCY_CACHE_SIZE: int = 10000  # completed responses each worker replays without a database read
+    
+    # Independent reads of one request run concurrently, this many at a time
+    REQUEST_FANOUT_LIMIT: int = 4
+    REQUEST_FANOUT_THREADS: int = 32  # shared by all requests
+    
+    # Background jobs: score recomputation after admin answer changes
+    RESCORE_BATCH_SIZE: int = 50
+    RESCORE_DOCUMENTS_PER_SECOND: float = 100  # rate limit, leaves RUs for players
+    JOB_LOCK_TTL_SECONDS: int = 60  # a job not heard from this long is taken over
+    
+    # Memory allocation profiling (tracemalloc) of a sample of requests, per route
+    ALLOCATION_SAMPLE_RATE: float = 0.0  # fraction of requests, 0 = off
+    ALLOCATION_TOP_SITES: int = 10  # allocation sites reported per route
+    
+    # Shared admin secret: the X-Admin-Secret header of the snapshot export and
+    # the debug endpoints, and the key of signed X-Debug-Profile headers
+    ADMIN_SECRET: str = ""  # empty = those endpoints and headers are rejected
+    
+    # Sampling profiler: keeps stack samples of slow requests, and of requests
+    # with an X-Debug-Profile header signed with ADMIN_SECRET
+    SLOW_REQUEST_PROFILE_MS: int = 0  # sampling starts once a request runs this long; 0 = only signed requests
+    PROFILER_INTERVAL_MS: float = 5
+    PROFILER_MAX_SAMPLES: int = 2000  # per request
+    PROFILER_MAX_PROFILES: int = 50  # ring buffer size
+    
+    # Reveal snapshot: how often to retry freezing the results after the reveal date
+    # while the correct answers are still missing
+    REVEAL_SNAPSHOT_RETRY_SECONDS: int = 30
+    
+    # Identical concurrent expensive reads share one computation, for at most this long
+    COALESCE_TIMEOUT_SECONDS: float = 10
     
     @property
     def cors_origins_list(self) -> List[str]:
         """Convert comma-separated CORS origins to list"""
         return [origin.strip() for origin in self.CORS_ORIGINS.split(',')]
     
+    @property
+    def rate_limits(self) -> Dict[str, Tuple[float, int]]:
+        """Parse RATE_LIMITS into {route class: (tokens per second, burst)}"""
+        limits = {}
+        for entry in self.RATE_LIMITS.split(','):
+            if entry.strip():
+                route_class, rate, burst = entry.strip().split(':')
+                limits[route_class] = (float(rate), int(burst))
+        return limits
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
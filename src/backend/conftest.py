@@ -0,0 +1,28 @@
+"""
+Shared pytest setup
+Tests run against the in-memory Cosmos DB (fake_cosmos.py) without latency,
+throttling or injected errors, whatever the environment or .env says.
+"""
+
+import os
+
+os.environ.update(
+    COSMOS_BACKEND="fake",
+    COSMOS_FAKE_READ_LATENCY="",
+    COSMOS_FAKE_WRITE_LATENCY="",
+    COSMOS_FAKE_QUERY_LATENCY="",
+    COSMOS_FAKE_RU_PER_SECOND="0",
+    COSMOS_FAKE_ERROR_RATE="0",
+)
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def database():
+    """A Database on an emptied fake container, with nothing cached"""
+    from database import Database
+
+    database = Database()
+    database.container.inner.items.clear()
+    return database
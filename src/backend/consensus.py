@@ -0,0 +1,92 @@
+"""
+Crowd consensus over all stored predictions
+Keeps a giver x receiver vote matrix that is updated incrementally as
+predictions are saved, and finds the valid assignment (nobody gives to
+themselves) the crowd agrees on most with the Hungarian algorithm.
+"""
+
+import threading
+from typing import Callable, Dict, List
+
+from assignment import FORBIDDEN, max_weight_assignment
+
+
+class VoteMatrix:
+    """Giver x receiver vote counts over everyone's predictions"""
+
+    def __init__(self, participants: List[str]):
+        self.participants = participants
+        self.index = {name: i for i, name in enumerate(participants)}
+        self.counts = [[0] * len(participants) for _ in participants]
+        self.loaded = False
+        self._by_user: Dict[str, Dict[str, str]] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _apply(self, predictions: Dict[str, str], delta: int):
+        for giver, receiver in predictions.items():
+            if giver in self.index and receiver in self.index:
+                self.counts[self.index[giver]][self.index[receiver]] += delta
+
+    def ensure_loaded(self, loader: Callable[[], Dict[str, Dict[str, str]]]):
+        """Build the matrix from all predictions (userName -> predictions) if needed"""
+        while not self.loaded:
+            version = self._version
+            all_predictions = loader()
+            with self._lock:
+                # A save or invalidation while loading makes this snapshot unusable
+                if self._version != version:
+                    continue
+                self.counts = [[0] * len(self.participants) for _ in self.participants]
+                self._by_user = {}
+                for user_name, predictions in all_predictions.items():
+                    self._by_user[user_name] = dict(predictions)
+                    self._apply(predictions, 1)
+                self.loaded = True
+
+    def update(self, user_name: str, predictions: Dict[str, str]):
+        """Replace one user's votes"""
+        with self._lock:
+            self._version += 1
+            if not self.loaded:
+                return
+            previous = self._by_user.get(user_name)
+            if previous:
+                self._apply(previous, -1)
+            self._by_user[user_name] = dict(predictions)
+            self._apply(predictions, 1)
+
+    def invalidate(self):
+        """Drop the matrix so it is rebuilt on next use"""
+        with self._lock:
+            self._version += 1
+            self.loaded = False
+
+    def consensus(self) -> dict:
+        """Maximum-agreement valid assignment"""
+        with self._lock:
+            counts = [row[:] for row in self.counts]
+            voters = len(self._by_user)
+
+        weights = [
+            [FORBIDDEN if i == j else count for j, count in enumerate(row)]
+            for i, row in enumerate(counts)
+        ]
+        columns = max_weight_assignment(weights) or []
+
+        pairs = [
+            {
+                "giver": self.participants[i],
+                "receiver": self.participants[j],
+                "votes": counts[i][j],
+            }
+            for i, j in enumerate(columns)
+        ]
+        total_votes = sum(pair["votes"] for pair in pairs)
+        possible = voters * len(pairs)
+        return {
+            "voters": voters,
+            "assignment": pairs,
+            "totalVotes": total_votes,
+            "agreement": round(total_votes / possible * 100, 2) if possible else 0.0,
+        }
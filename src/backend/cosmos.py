@@ -0,0 +1,139 @@
+"""
+Cosmos DB connection helpers
+Kept separate from database.py so tools can get a container without
+creating the global Database instance.
+
+With COSMOS_BACKEND=fake, connections go to the in-memory stand-in in
+fake_cosmos.py instead, with the latency, throughput and error rate set by
+the COSMOS_FAKE_* settings.
+
+Async code runs its blocking Cosmos DB calls with to_db_thread, on threads
+of their own: while Cosmos DB throttles, calls waiting for the concurrency
+limiter or backing off hold those threads, not the event loop's default
+executor that everything else shares.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from azure.cosmos import CosmosClient
+from azure.cosmos._retry_options import RetryOptions
+from azure.cosmos.documents import ConnectionPolicy
+from config import settings
+from metrics import metrics
+from resilience import AdaptiveLimiter, ResilientContainer
+
+T = TypeVar("T")
+
+
+# Only the paths queries filter or sort on are indexed. Everything else,
+# including the nested predictions and quiz answers (p, qa, ab,
+# predictions/*, quizAnswers/*), is excluded, so writes don't pay to index them.
+INDEXING_POLICY = {
+    "indexingMode": "consistent",
+    "automatic": True,
+    "includedPaths": [
+        {"path": "/type/?"},
+        {"path": "/userName/?"},
+        {"path": "/updatedAt/?"},
+        {"path": "/schemaVersion/?"},
+        {"path": "/scoreKey/?"},
+        {"path": "/predictionsTotal/?"},
+        {"path": "/score/?"},
+        {"path": "/totalPoints/?"},
+    ],
+    "excludedPaths": [
+        {"path": "/*"},
+        {"path": "/\"_etag\"/?"},
+    ],
+    "compositeIndexes": [
+        # Scoreboard: ORDER BY c.score DESC, c.totalPoints DESC
+        [
+            {"path": "/score", "order": "descending"},
+            {"path": "/totalPoints", "order": "descending"},
+        ],
+    ],
+}
+
+PARTITION_KEY = {"paths": ["/type"], "kind": "Hash"}
+
+# Time to live is on, but documents only expire if they set a ttl (idempotency records)
+DEFAULT_TTL = -1
+
+
+# As many threads as calls the limiter ever lets through at once
+_db_executor = ThreadPoolExecutor(max_workers=settings.COSMOS_CONCURRENCY_MAX, thread_name_prefix="cosmos")
+
+
+async def to_db_thread(function: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking Cosmos DB call from async code on the Cosmos DB threads"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(function, *args, **kwargs))
+
+
+def db_executor() -> ThreadPoolExecutor:
+    """The Cosmos DB threads, for code that takes an executor"""
+    return _db_executor
+
+
+def resilient(container) -> ResilientContainer:
+    """Wrap a container with retries and adaptive concurrency limiting"""
+    wrapped = ResilientContainer(
+        container,
+        AdaptiveLimiter(
+            initial=settings.COSMOS_CONCURRENCY_INITIAL,
+            minimum=settings.COSMOS_CONCURRENCY_MIN,
+            maximum=settings.COSMOS_CONCURRENCY_MAX
+        ),
+        max_retries=settings.COSMOS_MAX_RETRIES,
+        base_delay_ms=settings.COSMOS_RETRY_BASE_MS,
+        max_delay_ms=settings.COSMOS_RETRY_MAX_MS
+    )
+    metrics.register("cosmos", wrapped.stats)
+    return wrapped
+
+
+def fake_client():
+    """The process-wide in-memory Cosmos DB, configured from settings"""
+    import fake_cosmos
+
+    return fake_cosmos.shared_client(
+        latency={
+            "read": fake_cosmos.LatencyModel(settings.COSMOS_FAKE_READ_LATENCY),
+            "write": fake_cosmos.LatencyModel(settings.COSMOS_FAKE_WRITE_LATENCY),
+            "query": fake_cosmos.LatencyModel(settings.COSMOS_FAKE_QUERY_LATENCY),
+        },
+        ru_per_second=settings.COSMOS_FAKE_RU_PER_SECOND or None,
+        error_rate=settings.COSMOS_FAKE_ERROR_RATE,
+        seed=settings.COSMOS_FAKE_SEED
+    )
+
+
+def connect_database():
+    """Connect to the configured Cosmos DB database, creating it if needed"""
+    if settings.COSMOS_BACKEND == "fake":
+        print("🧪 Using the in-memory Cosmos DB stand-in (COSMOS_BACKEND=fake)")
+        return fake_client().create_database_if_not_exists(id=settings.COSMOS_DATABASE)
+    
+    # Throttling is retried by the resilience layer, not inside the SDK
+    policy = ConnectionPolicy()
+    policy.RetryOptions = RetryOptions(max_retry_attempt_count=0)
+    
+    client = CosmosClient(settings.COSMOS_ENDPOINT, settings.COSMOS_KEY, connection_policy=policy)
+    return client.create_database_if_not_exists(id=settings.COSMOS_DATABASE)
+
+
+def connect_container():
+    """Connect to the configured Cosmos DB container, creating it if needed"""
+    database = connect_database()
+    container = database.create_container_if_not_exists(
+        id=settings.COSMOS_CONTAINER,
+        partition_key=PARTITION_KEY,
+        indexing_policy=INDEXING_POLICY,
+        default_ttl=DEFAULT_TTL
+    )
+    if settings.COSMOS_BACKEND == "fake":
+        metrics.register("fake_cosmos", container.stats)
+    return resilient(container)
@@ -1,81 +1,321 @@
-from typing import Dict, Optional, List
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional, List, Set, Tuple
 from datetime import datetime
-from azure.cosmos import CosmosClient, exceptions
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+from quiz_questions import QUESTION_BANK_ID, QuizQuestions, answered_bitmap, decode_bitmap, encode_bitmap, is_answered, mark_answered
+from reveal import REVEAL_SNAPSHOT_ID
 from models import Prediction, CorrectAnswers, AMIGOS_INVISIBLES, PLAYERS, QuizAnswer, QuizCorrectAnswers, UserSubmission, QuizAnswerData
+from answers_cache import AdminAnswersCache, CacheEntry
+from consensus import VoteMatrix
+from fanout import map_reads
+from cosmos import connect_container
+from invalidation import channel
+from schema import SubmissionCodec, encode_legacy, is_compact
+from scoring import SCORE_FIELDS, quiz_counts, score_fields, score_key
 from config import settings
 
 
+def _parse_correct_answers(item: dict) -> CorrectAnswers:
+    """Convert a stored correct answers document"""
+    if item.get('revealDate'):
+        item['revealDate'] = datetime.fromisoformat(item['revealDate'])
+    item['updatedAt'] = datetime.fromisoformat(item['updatedAt'])
+    return CorrectAnswers(**item)
+
+
+def _parse_quiz_correct_answers(item: dict) -> QuizCorrectAnswers:
+    """Convert a stored quiz correct answers document"""
+    item['updatedAt'] = datetime.fromisoformat(item['updatedAt'])
+    return QuizCorrectAnswers(**item)
+
+
+# Lock document keeping at most one background job running per game
+JOB_LOCK_ID = "job_lock"
+
+# Marker name of the one-off move of embedded quiz answers into the ledger (migrate_quiz_answers.py)
+QUIZ_ANSWER_LEDGER_MIGRATION = "quiz_answer_ledger"
+
+# Submissions this worker wrote last, kept as the base of the next conditional update
+WRITTEN_SUBMISSIONS_CACHE_SIZE = 1000
+
+# Admin answer documents: id -> (partition key, parser)
+ADMIN_DOCUMENTS = {
+    "correct_answers": ("answers", _parse_correct_answers),
+    "quiz_correct_answers": ("quiz_answers", _parse_quiz_correct_answers),
+}
+
+
 class Database:
     """Cosmos DB database for storing predictions and answers"""
     
     def __init__(self):
-        # Initialize Cosmos DB client with hardcoded credentials
-        self.client = CosmosClient(settings.COSMOS_ENDPOINT, settings.COSMOS_KEY)
-        self.database = self.client.create_database_if_not_exists(id=settings.COSMOS_DATABASE)
-        self.container = self.database.create_container_if_not_exists(
-            id=settings.COSMOS_CONTAINER,
-            partition_key={"paths": ["/type"], "kind": "Hash"}
-        )
+        self.container = connect_container()
+        self.codec = SubmissionCodec(self.container)
+        self.answers_cache = AdminAnswersCache(settings.ADMIN_ANSWERS_REVALIDATE_SECONDS)
+        channel.subscribe("admin_answers", self.answers_cache.invalidate)
+        self.vote_matrix = VoteMatrix(AMIGOS_INVISIBLES)
+        channel.subscribe("predictions", self.vote_matrix.invalidate)
+        self._written_submissions: "OrderedDict[str, dict]" = OrderedDict()  # userName -> item
+        self._written_lock = threading.Lock()
         print(f"✅ Connected to Cosmos DB: {settings.COSMOS_DATABASE}/{settings.COSMOS_CONTAINER}")
     
     def get_user_submission(self, user_name: str) -> Optional[UserSubmission]:
-        """Get complete user submission (predictions + quiz answers)"""
+        """Get a user's submission document (predictions; quiz answers live in the ledger)"""
+        item = self._read_submission_item(user_name)
+        return self._submission_from_item(item) if item else None
+    
+    def _read_submission_item(self, user_name: str) -> Optional[dict]:
         try:
-            item = self.container.read_item(
-                item=f"user_{user_name}",
-                partition_key="user_submission"
-            )
-            # Convert datetime strings and nested objects
-            item['timestamp'] = datetime.fromisoformat(item['timestamp'])
-            item['createdAt'] = datetime.fromisoformat(item['createdAt'])
-            item['updatedAt'] = datetime.fromisoformat(item['updatedAt'])
-            
-            # Convert quiz answers
-            quiz_answers = []
-            for qa in item.get('quizAnswers', []):
-                qa['timestamp'] = datetime.fromisoformat(qa['timestamp'])
-                quiz_answers.append(QuizAnswerData(**qa))
-            item['quizAnswers'] = quiz_answers
-            
-            return UserSubmission(**item)
+            return self.container.read_item(item=f"user_{user_name}", partition_key="user_submission")
         except exceptions.CosmosResourceNotFoundError:
             return None
     
+    def _submission_from_item(self, item: dict) -> UserSubmission:
+        # Decode either storage schema into the submission shape
+        data = self.codec.decode(item)
+        data['quizAnswers'] = [QuizAnswerData(**qa) for qa in data['quizAnswers']]
+        return UserSubmission(**data)
+    
     def save_user_submission(self, submission: UserSubmission) -> UserSubmission:
-        """Save or update complete user submission"""
-        now = datetime.utcnow()
+        """Save or update a user's predictions
         
-        # Try to get existing submission
+        The write is conditional on the document's ETag, so it never undoes a
+        concurrent update of the quiz answer summary.
+        """
+        while True:
+            now = datetime.utcnow()
+            existing_item = self._read_submission_item(submission.userName)
+            if existing_item:
+                # Update existing; answers from before the ledger stay as they are
+                existing = self.codec.decode(existing_item)
+                submission.id = existing_item['id']
+                submission.createdAt = existing['createdAt']
+                submission.updatedAt = now
+                submission.quizAnswers = [QuizAnswerData(**qa) for qa in existing['quizAnswers']]
+            else:
+                # New submission
+                submission.timestamp = now
+                submission.createdAt = now
+                submission.updatedAt = now
+                submission.quizAnswers = []
+            
+            # Prepare document for Cosmos DB, keeping the quiz answer summary
+            doc = self._encode_submission(submission)
+            if existing_item and self._summary_is_current(existing_item):
+                doc.update(self._summary_fields(
+                    submission.predictions, existing_item['quizCorrect'], existing_item['quizTotal'],
+                    decode_bitmap(existing_item['ab'])
+                ))
+            else:
+                quiz_answers = self._user_quiz_answers(submission.userName, existing_item)
+                doc.update(self._score_submission(submission.predictions, quiz_answers))
+            
+            if self._write_submission(doc, existing_item):
+                return submission
+    
+    def _write_submission(self, doc: dict, existing_item: Optional[dict]) -> bool:
+        """Create or conditionally replace a submission; False if another write got there first"""
         try:
-            existing_item = self.container.read_item(
-                item=f"user_{submission.userName}",
-                partition_key="user_submission"
+            if existing_item is None:
+                written = self.container.create_item(doc)
+            else:
+                written = self.container.replace_item(
+                    item=doc['id'],
+                    body=doc,
+                    etag=existing_item['_etag'],
+                    match_condition=MatchConditions.IfNotModified
+                )
+        except (exceptions.CosmosResourceExistsError, exceptions.CosmosAccessConditionFailedError):
+            return False
+        with self._written_lock:
+            self._written_submissions[doc['userName']] = written
+            self._written_submissions.move_to_end(doc['userName'])
+            while len(self._written_submissions) > WRITTEN_SUBMISSIONS_CACHE_SIZE:
+                self._written_submissions.popitem(last=False)
+        return True
+    
+    def _last_written_submission(self, user_name: str) -> Optional[dict]:
+        """The submission as this worker last wrote it, if it still remembers it
+        
+        It may be outdated: it is only good as the base of a write
+        conditional on its ETag, which fails if anyone wrote since.
+        """
+        with self._written_lock:
+            return self._written_submissions.get(user_name)
+    
+    def _encode_submission(self, submission: UserSubmission) -> dict:
+        """Document for a submission in the configured storage schema"""
+        if is_compact(settings.STORAGE_SCHEMA_VERSION) and self.codec.can_encode(submission):
+            return self.codec.encode(submission)
+        return encode_legacy(submission)
+    
+    def _score_key(self) -> str:
+        """Key of the admin answers scores are currently computed against"""
+        return score_key(self.get_correct_answers(), self.get_quiz_correct_answers())
+    
+    def _summary_fields(self, predictions: Dict[str, str], quiz_correct: int, quiz_total: int,
+                        bitmap: bytes) -> dict:
+        """Denormalized fields of a submission: scores, scoreKey and the answered bitmap"""
+        fields = score_fields(predictions, self.get_correct_answers(), quiz_correct, quiz_total)
+        fields['scoreKey'] = self._score_key()
+        fields['ab'] = encode_bitmap(bitmap)
+        fields['abVersion'] = self.codec.current_question_set_version()
+        return fields
+    
+    def _score_submission(self, predictions: Dict[str, str], quiz_answers: List[QuizAnswerData]) -> dict:
+        """Denormalized fields computed from all of a user's quiz answers"""
+        ordinals = QuizQuestions.bank.ordinals
+        quiz_correct, quiz_total = quiz_counts(quiz_answers, self.get_quiz_correct_answers())
+        bitmap = answered_bitmap(ordinals[qa.questionId] for qa in quiz_answers if qa.questionId in ordinals)
+        return self._summary_fields(predictions, quiz_correct, quiz_total, bitmap)
+    
+    def _summary_is_current(self, item: dict) -> bool:
+        """Whether the stored summary can be updated incrementally"""
+        return (
+            'quizTotal' in item
+            and item.get('scoreKey') == self._score_key()
+            and item.get('abVersion') == self.codec.current_question_set_version()
+        )
+    
+    def _current_score(self, item: dict) -> dict:
+        """Score fields of a document against the current admin answers, without storing them"""
+        data = self.codec.decode(item)
+        return self._score_submission(data['predictions'], self._user_quiz_answers(data['userName'], item))
+    
+    def _rescore(self, item: dict) -> dict:
+        """Recompute the score fields of a stale document and store them
+        
+        The write is conditional on the document's ETag; if the user wrote in
+        the meantime their write already carries fresh scores. Only the
+        rescore job stores scores: reads compute stale ones in memory.
+        """
+        fields = self._current_score(item)
+        try:
+            self.container.replace_item(
+                item=item['id'],
+                body={**item, **fields},
+                etag=item['_etag'],
+                match_condition=MatchConditions.IfNotModified
             )
-            # Update existing
-            submission.id = existing_item['id']
-            submission.createdAt = datetime.fromisoformat(existing_item['createdAt'])
-            submission.updatedAt = now
+        except exceptions.CosmosAccessConditionFailedError:
+            pass
+        return fields
+    
+    def count_submissions(self) -> int:
+        """Number of user_submission documents"""
+        query = "SELECT VALUE COUNT(1) FROM c WHERE c.type = 'user_submission'"
+        return next(iter(self.container.query_items(query=query, partition_key="user_submission")), 0)
+    
+    def count_stale_scores(self) -> int:
+        """Number of user_submission documents not scored against the current admin answers"""
+        query = (
+            "SELECT VALUE COUNT(1) FROM c WHERE c.type = 'user_submission' "
+            "AND (NOT IS_DEFINED(c.scoreKey) OR c.scoreKey != @scoreKey)"
+        )
+        parameters = [{"name": "@scoreKey", "value": self._score_key()}]
+        return next(iter(self.container.query_items(
+            query=query, parameters=parameters, partition_key="user_submission"
+        )), 0)
+    
+    def iter_submission_batches(self, batch_size: int) -> Iterator[List[dict]]:
+        """All user_submission documents, in batches of at most batch_size"""
+        query = "SELECT * FROM c WHERE c.type = 'user_submission'"
+        pages = self.container.query_items(
+            query=query, partition_key="user_submission", max_item_count=batch_size
+        ).by_page()
+        for page in pages:
+            page = list(page)
+            for start in range(0, len(page), batch_size):
+                yield page[start:start + batch_size]
+    
+    def rescore_batch(self, items: List[dict]) -> int:
+        """Recompute the stored scores of the stale documents in a batch, returns how many"""
+        key = self._score_key()
+        stale = [item for item in items if item.get('scoreKey') != key]
+        for item in stale:
+            self._rescore(item)
+        return len(stale)
+    
+    def get_user_score(self, user_name: str) -> Optional[dict]:
+        """Stored score of a user (a single point read), recomputed in memory if stale"""
+        try:
+            item = self.container.read_item(item=f"user_{user_name}", partition_key="user_submission")
         except exceptions.CosmosResourceNotFoundError:
-            # New submission
-            submission.timestamp = now
-            submission.createdAt = now
-            submission.updatedAt = now
-        
-        # Prepare document for Cosmos DB
-        doc = submission.dict()
-        doc['id'] = f"user_{submission.userName}"
-        doc['type'] = "user_submission"  # Partition key
-        doc['timestamp'] = doc['timestamp'].isoformat()
-        doc['createdAt'] = doc['createdAt'].isoformat()
-        doc['updatedAt'] = doc['updatedAt'].isoformat()
+            return None
         
-        # Convert quiz answers timestamps
-        for qa in doc['quizAnswers']:
-            qa['timestamp'] = qa['timestamp'].isoformat()
+        if item.get('scoreKey') == self._score_key():
+            fields = {field: item[field] for field in SCORE_FIELDS}
+        else:
+            fields = self._current_score(item)
+        return {"userName": user_name, **fields}
+    
+    def get_scoreboard(self) -> List[dict]:
+        """Stored scores of every user with predictions, best first
         
-        # Upsert to Cosmos DB
-        self.container.upsert_item(doc)
-        return submission
+        Rows scored against older admin answers, and legacy documents the
+        rescore job has not reached yet (no score fields at all), are scored
+        in memory from their documents; nothing is written.
+        """
+        key = self._score_key()
+        query = (
+            "SELECT c.userName, c.predictionsCorrect, c.predictionsTotal, c.quizCorrect, c.quizTotal, "
+            "c.totalPoints, c.maxTotalPoints, c.score, c.scoreKey "
+            "FROM c WHERE c.type = 'user_submission' AND c.predictionsTotal > 0 "
+            "ORDER BY c.score DESC, c.totalPoints DESC"
+        )
+        rows = list(self.container.query_items(query=query, partition_key="user_submission"))
+        # Not in the ORDER BY query: it can leave out documents without the sorted fields
+        legacy_query = (
+            "SELECT c.userName FROM c WHERE c.type = 'user_submission' AND NOT IS_DEFINED(c.predictionsTotal)"
+        )
+        rows += self.container.query_items(query=legacy_query, partition_key="user_submission")
+        
+        # Stale rows are recomputed from their documents, concurrently
+        stale = [row['userName'] for row in rows if row.get('scoreKey') != key]
+        fresh = dict(zip(stale, map_reads(self.get_user_score, stale)))
+        
+        scoreboard = []
+        for row in rows:
+            if row['userName'] in fresh:
+                row = fresh[row['userName']]
+                if row is None or not row['predictionsTotal']:
+                    continue
+            scoreboard.append({"userName": row['userName'], **{field: row[field] for field in SCORE_FIELDS}})
+        
+        # Recomputed rows may have moved
+        scoreboard.sort(key=lambda x: (x['score'], x['totalPoints']), reverse=True)
+        return scoreboard
+    
+    def upgrade_submissions(self) -> int:
+        """Rewrite legacy user_submission documents in the compact schema
+        
+        Each rewrite is conditional on the document's ETag, so a concurrent
+        write by the user wins and the document is picked up by the next run.
+        Returns the number of upgraded documents.
+        """
+        query = "SELECT * FROM c WHERE c.type = 'user_submission' AND NOT IS_DEFINED(c.schemaVersion)"
+        upgraded = 0
+        for item in self.container.query_items(query=query, partition_key="user_submission"):
+            submission = self._submission_from_item(item)
+            if not self.codec.can_encode(submission):
+                continue
+            doc = self.codec.encode(submission)
+            quiz_answers = self._user_quiz_answers(submission.userName, item)
+            doc.update(self._score_submission(submission.predictions, quiz_answers))
+            try:
+                self.container.replace_item(
+                    item=item['id'],
+                    body=doc,
+                    etag=item['_etag'],
+                    match_condition=MatchConditions.IfNotModified
+                )
+                upgraded += 1
+            except exceptions.CosmosAccessConditionFailedError:
+                continue
+        return upgraded
     
     def save_prediction(self, prediction: Prediction) -> Prediction:
         """Save or update a prediction - updates UserSubmission"""
@@ -90,6 +330,8 @@ class Database:
         
         # Save submission
         self.save_user_submission(submission)
+        self.vote_matrix.update(prediction.userName, prediction.predictions)
+        channel.publish("predictions")
         
         # Return prediction object for compatibility
         prediction.id = submission.id
@@ -116,30 +358,34 @@ class Database:
     
     def get_all_predictions(self) -> Dict[str, Prediction]:
         """Get all predictions"""
+        return {prediction.userName: prediction for prediction in self.iter_predictions()}
+    
+    def iter_predictions(self) -> Iterator[Prediction]:
+        """Stream all predictions, decoding each query page as it arrives"""
         query = "SELECT * FROM c WHERE c.type = 'user_submission'"
-        items = list(self.container.query_items(query=query, enable_cross_partition_query=True))
-        
-        predictions = {}
-        for item in items:
-            if not item.get('predictions'):
-                continue
-            
-            # Convert datetime strings
-            timestamp = datetime.fromisoformat(item['timestamp'])
-            createdAt = datetime.fromisoformat(item['createdAt'])
-            updatedAt = datetime.fromisoformat(item['updatedAt'])
-            
-            prediction = Prediction(
-                id=item['id'],
-                userName=item['userName'],
-                predictions=item['predictions'],
-                timestamp=timestamp,
-                createdAt=createdAt,
-                updatedAt=updatedAt
-            )
-            predictions[prediction.userName] = prediction
+        pages = self.container.query_items(query=query, enable_cross_partition_query=True).by_page()
         
-        return predictions
+        for page in pages:
+            for item in page:
+                data = self.codec.decode(item)
+                if not data['predictions']:
+                    continue
+                
+                yield Prediction(
+                    id=data['id'],
+                    userName=data['userName'],
+                    predictions=data['predictions'],
+                    timestamp=data['timestamp'],
+                    createdAt=data['createdAt'],
+                    updatedAt=data['updatedAt']
+                )
+    
+    def get_consensus(self) -> dict:
+        """Crowd's maximum-agreement assignment over all predictions"""
+        self.vote_matrix.ensure_loaded(
+            lambda: {user_name: p.predictions for user_name, p in self.get_all_predictions().items()}
+        )
+        return self.vote_matrix.consensus()
     
     def get_participants_status(self):
         """Get status of all participants"""
@@ -162,26 +408,57 @@ class Database:
         doc = answers.dict()
         doc['id'] = "correct_answers"
         doc['type'] = "answers"  # Partition key
-        doc['revealDate'] = doc['revealDate'].isoformat()
+        doc['revealDate'] = doc['revealDate'].isoformat() if doc['revealDate'] else None
         doc['updatedAt'] = doc['updatedAt'].isoformat()
         
-        # Upsert to Cosmos DB
-        self.container.upsert_item(doc)
+        # Upsert to Cosmos DB and write through to the cache
+        saved = self.container.upsert_item(doc)
+        self.answers_cache.put("correct_answers", answers, saved.get('_etag'))
+        channel.publish("admin_answers")
         return answers
     
     def get_correct_answers(self) -> Optional[CorrectAnswers]:
-        """Get correct answers"""
+        """Get correct answers (served from the admin answers cache)"""
+        return self.answers_cache.get(
+            "correct_answers",
+            lambda: self._load_admin_document("correct_answers")
+        )
+    
+    def _load_admin_document(self, doc_id: str) -> CacheEntry:
+        """Read an admin answer document for the cache"""
+        partition_key, parse = ADMIN_DOCUMENTS[doc_id]
         try:
-            item = self.container.read_item(
-                item="correct_answers",
-                partition_key="answers"
-            )
-            # Convert datetime strings back
-            item['revealDate'] = datetime.fromisoformat(item['revealDate'])
-            item['updatedAt'] = datetime.fromisoformat(item['updatedAt'])
-            return CorrectAnswers(**item)
+            item = self.container.read_item(item=doc_id, partition_key=partition_key)
+            return CacheEntry(parse(item), item.get('_etag'))
         except exceptions.CosmosResourceNotFoundError:
-            return None
+            return CacheEntry(None, None)
+    
+    def revalidate_admin_answers(self):
+        """Revalidate stale admin answer cache entries using their ETags"""
+        for doc_id, entry in self.answers_cache.stale_entries().items():
+            if entry.etag is None:
+                # Document did not exist, nothing to compare against
+                self.answers_cache.refresh(doc_id, entry, self._load_admin_document(doc_id))
+                continue
+            
+            partition_key, parse = ADMIN_DOCUMENTS[doc_id]
+            try:
+                item = self.container.read_item(
+                    item=doc_id,
+                    partition_key=partition_key,
+                    etag=entry.etag,
+                    match_condition=MatchConditions.IfModified
+                )
+            except exceptions.CosmosResourceNotFoundError:
+                self.answers_cache.refresh(doc_id, entry, CacheEntry(None, None))
+                continue
+            
+            if item:
+                fresh = CacheEntry(parse(item), item.get('_etag'))
+            else:
+                # 304 Not Modified
+                fresh = CacheEntry(entry.value, entry.etag)
+            self.answers_cache.refresh(doc_id, entry, fresh)
     
     def calculate_scores(self) -> list:
         """Calculate scores for all users based on correct answers"""
@@ -215,81 +492,300 @@ class Database:
     
     def save_quiz_answer(self, quiz_answer: QuizAnswer) -> QuizAnswer:
         """Save a quiz answer - updates UserSubmission"""
-        # Get or create user submission
-        submission = self.get_user_submission(quiz_answer.userName)
-        if not submission:
-            submission = UserSubmission(userName=quiz_answer.userName)
-        
-        # Check if question already answered
-        for existing in submission.quizAnswers:
-            if existing.questionId == quiz_answer.questionId:
-                raise ValueError(f"Question {quiz_answer.questionId} has already been answered")
-        
-        # Add new answer
-        quiz_answer.timestamp = datetime.utcnow()
-        answer_data = QuizAnswerData(
-            questionId=quiz_answer.questionId,
-            answer=quiz_answer.answer,
-            timestamp=quiz_answer.timestamp
+        error = self.save_quiz_answers(quiz_answer.userName, [quiz_answer])[0]
+        if error:
+            raise ValueError(error)
+        return quiz_answer
+    
+    def save_quiz_answers(self, user_name: str, quiz_answers: List[QuizAnswer]) -> List[Optional[str]]:
+        """Save several quiz answers of one user in the answer ledger
+        
+        Every answer is its own small document with a deterministic id,
+        written with create_item: the store rejects a second answer to the
+        same question, even from concurrent requests. The submission's answer
+        summary (bitmap and quiz scores) is then updated once for all of them.
+        
+        The ledger is the source of truth. If a worker died between the two
+        writes, the summary misses an answer the ledger has; the retry of
+        that answer conflicts, and the summary is rebuilt from the ledger.
+        Returns one entry per answer: None if it was saved, otherwise the error message.
+        """
+        now = datetime.utcnow()
+        errors = []
+        created = []
+        conflicts = []
+        
+        for quiz_answer in quiz_answers:
+            quiz_answer.timestamp = now
+            try:
+                self.container.create_item(self._ledger_document(user_name, quiz_answer))
+                created.append(quiz_answer)
+                errors.append(None)
+            except exceptions.CosmosResourceExistsError:
+                conflicts.append(quiz_answer.questionId)
+                errors.append(f"Question {quiz_answer.questionId} has already been answered")
+        
+        if created or conflicts:
+            # Answers given before the ledger existed take precedence
+            duplicates = self._record_quiz_answers(user_name, created, conflicts)
+            errors = [
+                f"Question {quiz_answer.questionId} has already been answered"
+                if error is None and quiz_answer.questionId in duplicates else error
+                for quiz_answer, error in zip(quiz_answers, errors)
+            ]
+        
+        return errors
+    
+    @staticmethod
+    def _ledger_document(user_name: str, answer) -> dict:
+        """Ledger document of one answer; its id makes (userName, questionId) unique"""
+        return {
+            "id": f"qa_{user_name}_{answer.questionId}",
+            "type": "quiz_answer",  # Partition key
+            "userName": user_name,
+            "questionId": answer.questionId,
+            "answer": answer.answer,
+            "timestamp": answer.timestamp.isoformat()
+        }
+    
+    def _ledger_answers(self, user_name: str) -> List[QuizAnswerData]:
+        """A user's answers in the ledger (a query within the quiz_answer partition)"""
+        query = (
+            "SELECT c.questionId, c.answer, c.timestamp FROM c "
+            "WHERE c.type = 'quiz_answer' AND c.userName = @userName"
         )
-        submission.quizAnswers.append(answer_data)
-        submission.updatedAt = datetime.utcnow()
+        items = self.container.query_items(
+            query=query, parameters=[{"name": "@userName", "value": user_name}], partition_key="quiz_answer"
+        )
+        return [
+            QuizAnswerData(
+                questionId=item['questionId'],
+                answer=item['answer'],
+                timestamp=datetime.fromisoformat(item['timestamp'])
+            )
+            for item in items
+        ]
+    
+    def _user_quiz_answers(self, user_name: str, item: Optional[dict]) -> List[QuizAnswerData]:
+        """All answers of a user: the ledger plus any still embedded in the submission"""
+        answers = {qa.questionId: qa for qa in self._ledger_answers(user_name)}
+        if item:
+            # Answers from before the ledger win, as they do when moved into it
+            for qa in self.codec.decode(item)['quizAnswers']:
+                answers[qa['questionId']] = QuizAnswerData(**qa)
+        return sorted(answers.values(), key=lambda qa: qa.timestamp)
+    
+    def _record_quiz_answers(self, user_name: str, created: List[QuizAnswer],
+                             conflicts: Iterable[str] = ()) -> Set[str]:
+        """Fold new ledger answers into the submission's answer summary
         
-        # Save submission
-        self.save_user_submission(submission)
+        Answers still embedded in the submission are moved into the ledger
+        first. conflicts are questions whose answers were already in the
+        ledger: if the summary lacks any of them, it is rebuilt from the
+        ledger. Returns the questionIds of new answers to questions that were
+        already answered that way.
         
-        return quiz_answer
+        The update starts from the submission as this worker last wrote it,
+        saving a read whenever nobody else wrote it since.
+        """
+        item = self._last_written_submission(user_name)
+        while True:
+            if item is None:
+                item = self._read_submission_item(user_name)
+            if item is None:
+                now = datetime.utcnow()
+                submission = UserSubmission(userName=user_name, timestamp=now, createdAt=now, updatedAt=now)
+            else:
+                submission = self._submission_from_item(item)
+            
+            duplicates = set()
+            if submission.quizAnswers:
+                duplicates = self._move_embedded_answers(user_name, submission.quizAnswers, created)
+                submission.quizAnswers = []
+                fields = self._score_submission(submission.predictions, self._ledger_answers(user_name))
+            elif item is not None and self._summary_is_current(item) and self._summary_has(item, conflicts):
+                if not created:
+                    return duplicates
+                fields = self._add_to_summary(item, submission.predictions, created)
+            else:
+                fields = self._score_submission(submission.predictions, self._ledger_answers(user_name))
+            
+            submission.updatedAt = datetime.utcnow()
+            doc = self._encode_submission(submission)
+            doc.update(fields)
+            if self._write_submission(doc, item):
+                return duplicates
+            item = None
+    
+    def _summary_has(self, item: dict, question_ids: Iterable[str]) -> bool:
+        """Whether a current summary counts answers to all of question_ids"""
+        ordinals = QuizQuestions.bank.ordinals
+        bitmap = decode_bitmap(item['ab'])
+        return all(
+            is_answered(bitmap, ordinals[question_id])
+            for question_id in question_ids if question_id in ordinals
+        )
+    
+    def _add_to_summary(self, item: dict, predictions: Dict[str, str], created: List[QuizAnswer]) -> dict:
+        """Current answer summary plus new answers, without reading the ledger
+        
+        Answers the summary already counts (an update retried after it was
+        stored) are not counted twice.
+        """
+        ordinals = QuizQuestions.bank.ordinals
+        bitmap = bytearray(decode_bitmap(item['ab']))
+        new = []
+        for quiz_answer in created:
+            ordinal = ordinals.get(quiz_answer.questionId)
+            if ordinal is not None:
+                if is_answered(bitmap, ordinal):
+                    continue
+                mark_answered(bitmap, ordinal)
+            new.append(quiz_answer)
+        quiz_correct, quiz_total = quiz_counts(new, self.get_quiz_correct_answers())
+        return self._summary_fields(
+            predictions, item['quizCorrect'] + quiz_correct, item['quizTotal'] + quiz_total, bitmap
+        )
+    
+    def _move_embedded_answers(self, user_name: str, embedded: List[QuizAnswerData],
+                               created: List[QuizAnswer]) -> Set[str]:
+        """Write answers embedded in a submission to the ledger; returns the new answers they override"""
+        for qa in embedded:
+            self.container.upsert_item(self._ledger_document(user_name, qa))
+        embedded_ids = {qa.questionId for qa in embedded}
+        return {quiz_answer.questionId for quiz_answer in created if quiz_answer.questionId in embedded_ids}
+    
+    def migrate_embedded_quiz_answers(self) -> int:
+        """Move quiz answers embedded in user_submission documents into the ledger
+        
+        Returns the number of submissions whose answers were moved.
+        """
+        query = (
+            "SELECT * FROM c WHERE c.type = 'user_submission' "
+            "AND (ARRAY_LENGTH(c.qa) > 0 OR ARRAY_LENGTH(c.quizAnswers) > 0)"
+        )
+        moved = 0
+        for item in self.container.query_items(query=query, partition_key="user_submission"):
+            if self.codec.decode(item)['quizAnswers']:
+                self._record_quiz_answers(item['userName'], [])
+                moved += 1
+        return moved
+    
+    def get_migration(self, name: str) -> Optional[dict]:
+        """Marker of a one-off data migration, if it has been run"""
+        try:
+            return self.container.read_item(item=f"migration_{name}", partition_key="migration")
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+    
+    def record_migration(self, name: str, **fields):
+        """Mark a one-off data migration as done"""
+        self.container.upsert_item({
+            "id": f"migration_{name}",
+            "type": "migration",  # Partition key
+            "name": name,
+            "completedAt": datetime.utcnow().isoformat(),
+            **fields
+        })
+    
+    def get_answered_bitmap(self, user_name: str) -> bytes:
+        """Bitmap of the question ordinals a user has answered
+        
+        Served from the bitmap stored with the submission; submissions
+        summarized for another question set are rebuilt from the answers.
+        """
+        item = self._read_submission_item(user_name)
+        if item is None:
+            return b""
+        if 'ab' in item and item.get('abVersion') == self.codec.current_question_set_version():
+            return decode_bitmap(item['ab'])
+        
+        ordinals = QuizQuestions.bank.ordinals
+        return bytes(answered_bitmap(
+            ordinals[qa.questionId] for qa in self._user_quiz_answers(user_name, item)
+            if qa.questionId in ordinals
+        ))
+    
+    def get_question_bank_version(self) -> Optional[str]:
+        """Version of the question bank stored in the database"""
+        try:
+            item = self.container.read_item(item=QUESTION_BANK_ID, partition_key="quiz_question")
+            return item['version']
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+    
+    def get_bank_questions(self) -> List[dict]:
+        """Questions of the question bank stored in the database, in ordinal order"""
+        try:
+            bank = self.container.read_item(item=QUESTION_BANK_ID, partition_key="quiz_question")
+        except exceptions.CosmosResourceNotFoundError:
+            return []
+        
+        query = "SELECT * FROM c WHERE c.type = 'quiz_question'"
+        by_id = {
+            item['id'].removeprefix("quiz_question_"): item
+            for item in self.container.query_items(query=query, partition_key="quiz_question")
+        }
+        return [
+            {
+                "id": question_id,
+                "question": by_id[question_id]['question'],
+                "options": by_id[question_id]['options'],
+                "correctAnswer": by_id[question_id]['correctAnswer'],
+                "timeLimit": by_id[question_id]['timeLimit']
+            }
+            for question_id in bank['questionIds'] if question_id in by_id
+        ]
     
     def get_user_quiz_answers(self, user_name: str) -> List[QuizAnswer]:
         """Get all quiz answers for a user"""
-        submission = self.get_user_submission(user_name)
-        if not submission:
-            return []
+        item = self._read_submission_item(user_name)
         
         # Convert to QuizAnswer objects for compatibility
-        answers = []
-        for qa in submission.quizAnswers:
-            # We need to check correctness from QUIZ_QUESTIONS
-            # For now, return with isCorrect=False as placeholder
-            answers.append(QuizAnswer(
+        return [
+            QuizAnswer(
                 id=f"quiz_answer_{user_name}_{qa.questionId}",
                 userName=user_name,
                 questionId=qa.questionId,
                 answer=qa.answer,
                 isCorrect=False,  # Will be calculated in main.py
                 timestamp=qa.timestamp
-            ))
-        
-        return answers
+            )
+            for qa in self._user_quiz_answers(user_name, item)
+        ]
     
     def get_all_quiz_answers(self) -> Dict[str, List[QuizAnswer]]:
         """Get all quiz answers grouped by user"""
+        answers_by_user: Dict[str, Dict[str, QuizAnswerData]] = {}
+        
+        query = "SELECT * FROM c WHERE c.type = 'quiz_answer'"
+        for item in self.container.query_items(query=query, partition_key="quiz_answer"):
+            answers_by_user.setdefault(item['userName'], {})[item['questionId']] = QuizAnswerData(
+                questionId=item['questionId'],
+                answer=item['answer'],
+                timestamp=datetime.fromisoformat(item['timestamp'])
+            )
+        
+        # Answers still embedded in submissions
         query = "SELECT * FROM c WHERE c.type = 'user_submission'"
-        items = list(self.container.query_items(query=query, enable_cross_partition_query=True))
+        for item in self.container.query_items(query=query, partition_key="user_submission"):
+            for qa in self.codec.decode(item)['quizAnswers']:
+                answers_by_user.setdefault(item['userName'], {})[qa['questionId']] = QuizAnswerData(**qa)
         
-        answers_by_user = {}
-        for item in items:
-            user_name = item['userName']
-            quiz_answers_data = item.get('quizAnswers', [])
-            
-            if not quiz_answers_data:
-                continue
-            
-            answers = []
-            for qa in quiz_answers_data:
-                timestamp = datetime.fromisoformat(qa['timestamp'])
-                answers.append(QuizAnswer(
-                    id=f"quiz_answer_{user_name}_{qa['questionId']}",
+        return {
+            user_name: [
+                QuizAnswer(
+                    id=f"quiz_answer_{user_name}_{qa.questionId}",
                     userName=user_name,
-                    questionId=qa['questionId'],
-                    answer=qa['answer'],
+                    questionId=qa.questionId,
+                    answer=qa.answer,
                     isCorrect=False,  # Calculated in main.py
-                    timestamp=timestamp
-                ))
-            
-            answers_by_user[user_name] = answers
-        
-        return answers_by_user
+                    timestamp=qa.timestamp
+                )
+                for qa in sorted(answers.values(), key=lambda qa: qa.timestamp)
+            ]
+            for user_name, answers in answers_by_user.items()
+        }
     
     def save_quiz_correct_answers(self, answers: QuizCorrectAnswers) -> QuizCorrectAnswers:
         """Save correct quiz answers (admin only)"""
@@ -301,22 +797,199 @@ class Database:
         doc['type'] = "quiz_answers"  # Partition key
         doc['updatedAt'] = doc['updatedAt'].isoformat()
         
-        # Upsert to Cosmos DB
-        self.container.upsert_item(doc)
+        # Upsert to Cosmos DB and write through to the cache
+        saved = self.container.upsert_item(doc)
+        self.answers_cache.put("quiz_correct_answers", answers, saved.get('_etag'))
+        channel.publish("admin_answers")
         return answers
     
     def get_quiz_correct_answers(self) -> Optional[QuizCorrectAnswers]:
-        """Get correct quiz answers"""
+        """Get correct quiz answers (served from the admin answers cache)"""
+        return self.answers_cache.get(
+            "quiz_correct_answers",
+            lambda: self._load_admin_document("quiz_correct_answers")
+        )
+    
+    def save_job(self, job: dict) -> dict:
+        """Persist the state of a background job"""
+        job['updatedAt'] = datetime.utcnow().isoformat()
+        self.container.upsert_item(job)
+        return job
+    
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Get a background job by id"""
         try:
-            item = self.container.read_item(
-                item="quiz_correct_answers",
-                partition_key="quiz_answers"
+            return self._without_system_fields(self.container.read_item(item=job_id, partition_key="job"))
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+    
+    def get_recent_jobs(self, limit: int = 20) -> List[dict]:
+        """Most recently created background jobs"""
+        query = "SELECT * FROM c WHERE c.type = 'job'"
+        items = self.container.query_items(query=query, partition_key="job")
+        jobs = [self._without_system_fields(item) for item in items if item['id'] != JOB_LOCK_ID]
+        jobs.sort(key=lambda job: job['createdAt'], reverse=True)
+        return jobs[:limit]
+    
+    @staticmethod
+    def _without_system_fields(item: dict) -> dict:
+        return {k: v for k, v in item.items() if not k.startswith('_')}
+    
+    def get_job_lock(self) -> Optional[dict]:
+        """The game's job lock document, if a job holds it"""
+        try:
+            return self.container.read_item(item=JOB_LOCK_ID, partition_key="job")
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+    
+    def acquire_job_lock(self, job_id: str, ttl_seconds: float) -> str:
+        """Take the game's job lock for a job; returns the id of the job holding it
+        
+        A lock that was not renewed within its TTL (the worker running the job
+        died) is taken over.
+        """
+        lock = {
+            "id": JOB_LOCK_ID,
+            "type": "job",  # Partition key
+            "jobId": job_id,
+            "expiresAt": time.time() + ttl_seconds,
+            "cancelRequested": False,
+            "rerunRequested": False
+        }
+        while True:
+            try:
+                self.container.create_item(lock)
+                return job_id
+            except exceptions.CosmosResourceExistsError:
+                pass
+            
+            current = self.get_job_lock()
+            if current is None:
+                continue
+            if current['expiresAt'] > time.time():
+                return current['jobId']
+            try:
+                self.container.replace_item(
+                    item=JOB_LOCK_ID,
+                    body=lock,
+                    etag=current['_etag'],
+                    match_condition=MatchConditions.IfNotModified
+                )
+                return job_id
+            except (exceptions.CosmosAccessConditionFailedError, exceptions.CosmosResourceNotFoundError):
+                continue
+    
+    def update_job_lock(self, job_id: str, **fields) -> Optional[dict]:
+        """Change the job lock while job_id holds it; None if it does not"""
+        while True:
+            lock = self.get_job_lock()
+            if lock is None or lock['jobId'] != job_id:
+                return None
+            lock.update(fields)
+            try:
+                return self.container.replace_item(
+                    item=JOB_LOCK_ID,
+                    body=lock,
+                    etag=lock['_etag'],
+                    match_condition=MatchConditions.IfNotModified
+                )
+            except exceptions.CosmosAccessConditionFailedError:
+                continue
+            except exceptions.CosmosResourceNotFoundError:
+                return None
+    
+    def release_job_lock(self, job_id: str):
+        """Release the job lock if job_id still holds it"""
+        lock = self.get_job_lock()
+        if lock is None or lock['jobId'] != job_id:
+            return
+        try:
+            self.container.delete_item(item=JOB_LOCK_ID, partition_key="job")
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+    
+    def save_live_quiz_round(self, started_at: float, question_ids: List[str]):
+        """Store the start time (epoch seconds) and questions of the live quiz round"""
+        self.container.upsert_item({
+            "id": "live_quiz",
+            "type": "live_quiz",  # Partition key
+            "startedAt": started_at,
+            "questionIds": question_ids,
+            "updatedAt": datetime.utcnow().isoformat()
+        })
+    
+    def get_live_quiz_round(self) -> Optional[Tuple[float, List[str]]]:
+        """Get the start time and questions of the current live quiz round"""
+        try:
+            item = self.container.read_item(item="live_quiz", partition_key="live_quiz")
+            return item['startedAt'], item.get('questionIds', [])
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+    
+    def get_reveal_snapshot(self) -> Optional[dict]:
+        """Get the reveal snapshot document (final results, or a reopened marker)"""
+        try:
+            return self._without_system_fields(
+                self.container.read_item(item=REVEAL_SNAPSHOT_ID, partition_key="reveal")
             )
-            # Convert datetime strings back
-            item['updatedAt'] = datetime.fromisoformat(item['updatedAt'])
-            return QuizCorrectAnswers(**item)
         except exceptions.CosmosResourceNotFoundError:
             return None
+    
+    def save_reveal_snapshot(self, doc: dict):
+        """Store the reveal snapshot document, replacing any previous one"""
+        self.container.upsert_item(doc)
+    
+    def create_reveal_snapshot(self, doc: dict) -> bool:
+        """Store the reveal snapshot unless one exists; returns whether it was stored"""
+        try:
+            self.container.create_item(doc)
+            return True
+        except exceptions.CosmosResourceExistsError:
+            return False
+    
+    def get_reveal_chunk(self, chunk_id: str) -> Optional[dict]:
+        """Get a chunk of the rows of a reveal snapshot"""
+        try:
+            return self.container.read_item(item=chunk_id, partition_key="reveal")
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+    
+    def save_reveal_chunk(self, doc: dict):
+        """Store a chunk of the rows of a reveal snapshot"""
+        self.container.upsert_item(doc)
+    
+    def delete_reveal_chunk(self, chunk_id: str):
+        """Remove a chunk of a discarded reveal snapshot"""
+        try:
+            self.container.delete_item(item=chunk_id, partition_key="reveal")
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+    
+    def get_idempotency_record(self, record_id: str) -> Optional[dict]:
+        """An idempotency key's record, with its ETag"""
+        try:
+            return self.container.read_item(item=record_id, partition_key="idempotency")
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+    
+    def create_idempotency_record(self, doc: dict) -> Optional[dict]:
+        """Store the record of an idempotency key unless it has one; returns it as stored"""
+        try:
+            return self.container.create_item(doc)
+        except exceptions.CosmosResourceExistsError:
+            return None
+    
+    def replace_idempotency_record(self, doc: dict, etag: str) -> Optional[dict]:
+        """Replace an idempotency record if it is unchanged since etag; returns it as stored"""
+        try:
+            return self.container.replace_item(
+                item=doc['id'],
+                body=self._without_system_fields(doc),
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified
+            )
+        except (exceptions.CosmosAccessConditionFailedError, exceptions.CosmosResourceNotFoundError):
+            return None
 
 
 # Global database instance
@@ -0,0 +1,715 @@
+"""
+In-memory stand-in for Cosmos DB
+FakeContainer implements the ContainerProxy surface the app uses, and
+FakeCosmosClient / FakeDatabase the client and database calls around it,
+so the whole backend runs offline with COSMOS_BACKEND=fake (see
+cosmos.connect_database). Documents are stored per partition key.
+
+It behaves like the real service where performance tests care:
+
+- Latency: every request (point operation or query page) sleeps for a
+  time drawn from a LatencyModel, per kind of request (read, write, query).
+- Request charges: every response carries x-ms-request-charge, in
+  client_connection.last_response_headers and to a response_hook, from a
+  rough RU model: reads by document size, writes by size and by the number
+  of values the indexing policy indexes, queries by page size.
+- Throttling: with max_ops_per_second or ru_per_second set, requests beyond
+  that budget within a one-second window fail with 429 and an
+  x-ms-retry-after-ms header, like Cosmos DB when the provisioned RUs are
+  exhausted. error_rate injects 503s at random.
+- ETags: every write gets a new _etag, IfModified reads return None for
+  304 Not Modified, and IfNotModified replaces fail with 412.
+- Queries: the SQL subset the app uses (SELECT *, SELECT VALUE COUNT(1),
+  property projections, WHERE with AND / OR / NOT, comparisons, @parameters,
+  IS_DEFINED and ARRAY_LENGTH, ORDER BY) is evaluated with Cosmos DB's
+  undefined semantics, and returned page by page (max_item_count, by_page
+  with continuation tokens). Anything else fails with 400, so a new query
+  shape shows up in tests instead of silently matching everything.
+
+Data lives in the process: every worker process has its own fake.
+"""
+
+import copy
+import functools
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+
+# Rough RU model, after the published charges of 1 KB documents
+READ_RU_PER_KB = 1.0
+WRITE_RU_PER_KB = 5.0
+INDEX_RU_PER_VALUE = 0.2  # each indexed value adds to the write charge
+QUERY_RU_PER_PAGE = 2.3
+
+# Page size when the query doesn't set max_item_count, as in Cosmos DB
+DEFAULT_PAGE_SIZE = 100
+
+DEFAULT_INDEXING_POLICY = {
+    "indexingMode": "consistent",
+    "automatic": True,
+    "includedPaths": [{"path": "/*"}],
+    "excludedPaths": [{"path": "/\"_etag\"/?"}],
+}
+
+
+def _throttled_error(retry_after_ms: int) -> exceptions.CosmosHttpResponseError:
+    error = exceptions.CosmosHttpResponseError(status_code=429, message="Request rate is large")
+    error.headers = {"x-ms-retry-after-ms": str(retry_after_ms)}
+    return error
+
+
+def _bad_request(message: str) -> exceptions.CosmosHttpResponseError:
+    return exceptions.CosmosHttpResponseError(status_code=400, message=message)
+
+
+class LatencyModel:
+    """Request latency distribution, parsed from a spec string (milliseconds)
+
+    "" or "0"                  no latency
+    "fixed:5"                  always 5 ms
+    "uniform:2:10"             uniformly between 2 and 10 ms
+    "normal:8:2"               mean 8 ms, standard deviation 2 ms (never below 0)
+    "lognormal:8:0.5"          median 8 ms, sigma 0.5: a long tail, like real networks
+    """
+
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+
+    def __init__(self, spec: str = ""):
+        self.spec = spec.strip()
+        parts = self.spec.split(":") if self.spec not in ("", "0") else ["fixed", "0"]
+        self.kind = parts[0].lower()
+        if self.kind not in self.KINDS or len(parts) - 1 != self.KINDS[self.kind]:
+            raise ValueError(f"Invalid latency spec {spec!r}, expected e.g. 'lognormal:8:0.5'")
+        self.params = [float(p) for p in parts[1:]]
+
+    def sample(self, rng: random.Random) -> float:
+        """One latency, in seconds"""
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            ms = rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            ms = rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return max(ms, 0.0) / 1000
+
+
+# --- Query evaluation ---------------------------------------------------------
+
+class _Undefined:
+    """Cosmos DB's undefined: missing properties and invalid comparisons"""
+
+    def __repr__(self):
+        return "undefined"
+
+
+UNDEFINED = _Undefined()
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^'\\]|\\.)*')
+      | (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<param>@\w+)
+      | (?P<name>[A-Za-z_]\w*)
+      | (?P<op><=|>=|!=|<>|[=<>(),.*\[\]])
+    )""", re.VERBOSE)
+
+_KEYWORDS = {"SELECT", "VALUE", "FROM", "WHERE", "AND", "OR", "NOT", "ORDER", "BY", "ASC", "DESC",
+             "TRUE", "FALSE", "NULL", "COUNT"}
+
+
+def _tokenize(query: str) -> List[Tuple[str, str]]:
+    tokens, position = [], 0
+    query = query.rstrip()
+    while position < len(query):
+        match = _TOKEN.match(query, position)
+        if match is None:
+            raise _bad_request(f"Syntax error near {query[position:position + 20]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "name" and value.upper() in _KEYWORDS:
+            kind, value = "keyword", value.upper()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+def _type_rank(value) -> Optional[int]:
+    """Cosmos DB's cross-type ordering: null < boolean < number < string"""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    return None
+
+
+def _compare(op: str, left, right):
+    if left is UNDEFINED or right is UNDEFINED:
+        return UNDEFINED
+    left_rank, right_rank = _type_rank(left), _type_rank(right)
+    if op in ("=", "!=", "<>"):
+        if left_rank != right_rank:
+            return UNDEFINED
+        return (left == right) if op == "=" else (left != right)
+    if left_rank is None or left_rank != right_rank:
+        return UNDEFINED
+    return {"<": left < right, "<=": left <= right, ">": left > right, ">=": left >= right}[op]
+
+
+def _not(value):
+    return not value if isinstance(value, bool) else UNDEFINED
+
+
+def _and(left, right):
+    if left is False or right is False:
+        return False
+    return True if left is True and right is True else UNDEFINED
+
+
+def _or(left, right):
+    if left is True or right is True:
+        return True
+    return False if left is False and right is False else UNDEFINED
+
+
+def _resolve(doc: dict, path: Tuple[str, ...]):
+    value = doc
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return UNDEFINED
+        value = value[key]
+    return value
+
+
+_FUNCTIONS: Dict[str, Callable] = {
+    "IS_DEFINED": lambda value: value is not UNDEFINED,
+    "ARRAY_LENGTH": lambda value: len(value) if isinstance(value, list) else UNDEFINED,
+}
+
+
+class _Query:
+    """A parsed query: projection, filter and ordering"""
+
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.position = 0
+        self.count = False
+        self.projection: Optional[List[Tuple[str, ...]]] = None  # None: SELECT *
+        self.where: Optional[Callable] = None
+        self.order_by: List[Tuple[Tuple[str, ...], bool]] = []  # (path, descending)
+        self.aliases = set()
+
+        self._expect("keyword", "SELECT")
+        if self._accept("keyword", "VALUE"):
+            self._expect("keyword", "COUNT")
+            self._expect("op", "(")
+            self._expect("number", "1")
+            self._expect("op", ")")
+            self.count = True
+        elif not self._accept("op", "*"):
+            self.projection = [self._path()]
+            while self._accept("op", ","):
+                self.projection.append(self._path())
+        self._expect("keyword", "FROM")
+        self.alias = self._expect("name")
+        if self._accept("keyword", "WHERE"):
+            self.where = self._or()
+        if self._accept("keyword", "ORDER"):
+            self._expect("keyword", "BY")
+            while True:
+                path = self._path()
+                descending = bool(self._accept("keyword", "DESC"))
+                if not descending:
+                    self._accept("keyword", "ASC")
+                self.order_by.append((path, descending))
+                if not self._accept("op", ","):
+                    break
+        if self.position != len(self.tokens):
+            raise _bad_request(f"Unsupported query syntax at {self.tokens[self.position][1]!r}")
+        if self.aliases - {self.alias}:
+            raise _bad_request(f"Unknown alias {sorted(self.aliases - {self.alias})[0]!r}")
+
+    def _peek(self) -> Tuple[str, str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else ("end", "")
+
+    def _accept(self, kind: str, value: Optional[str] = None) -> Optional[str]:
+        token_kind, token_value = self._peek()
+        if token_kind == kind and (value is None or token_value == value):
+            self.position += 1
+            return token_value
+        return None
+
+    def _expect(self, kind: str, value: Optional[str] = None) -> str:
+        accepted = self._accept(kind, value)
+        if accepted is None:
+            raise _bad_request(f"Expected {value or kind}, got {self._peek()[1]!r}")
+        return accepted
+
+    def _path(self) -> Tuple[str, ...]:
+        self.aliases.add(self._expect("name"))
+        path = []
+        while True:
+            if self._accept("op", "."):
+                path.append(self._expect("name"))
+            elif self._accept("op", "["):
+                path.append(json.loads('"' + self._expect("string")[1:-1] + '"'))
+                self._expect("op", "]")
+            else:
+                break
+        if not path:
+            raise _bad_request("Property path expected")
+        return tuple(path)
+
+    # Expressions compile to functions of (document, parameters)
+
+    def _or(self) -> Callable:
+        left = self._and()
+        while self._accept("keyword", "OR"):
+            left = functools.partial(lambda a, b, doc, params: _or(a(doc, params), b(doc, params)),
+                                     left, self._and())
+        return left
+
+    def _and(self) -> Callable:
+        terms = [self._not()]
+        while self._accept("keyword", "AND"):
+            terms.append(self._not())
+        if len(terms) == 1:
+            return terms[0]
+
+        def conjunction(doc, params):
+            result = True
+            for term in terms:
+                result = _and(result, term(doc, params))
+                if result is False:
+                    return False
+            return result
+        conjunction.terms = terms
+        return conjunction
+
+    def _not(self) -> Callable:
+        if self._accept("keyword", "NOT"):
+            operand = self._not()
+            return lambda doc, params: _not(operand(doc, params))
+        return self._comparison()
+
+    def _comparison(self) -> Callable:
+        left = self._operand()
+        kind, op = self._peek()
+        if kind == "op" and op in ("=", "!=", "<>", "<", "<=", ">", ">="):
+            self.position += 1
+            right = self._operand()
+            comparison = lambda doc, params: _compare(op, left(doc, params), right(doc, params))
+            if op == "=" and hasattr(left, "field") and hasattr(right, "constant"):
+                comparison.seek = (left.field, right)
+            return comparison
+        return left
+
+    def _operand(self) -> Callable:
+        kind, value = self._peek()
+        if self._accept("op", "("):
+            inner = self._or()
+            self._expect("op", ")")
+            return inner
+        if kind in ("string", "number", "param"):
+            self.position += 1
+            if kind == "string":
+                literal = json.loads('"' + value[1:-1].replace("\\'", "'") + '"')
+            elif kind == "number":
+                literal = float(value) if "." in value else int(value)
+            constant = (lambda doc, params: params.get(value, UNDEFINED)) if kind == "param" else (lambda doc, params: literal)
+            constant.constant = True
+            return constant
+        if kind == "keyword" and value in ("TRUE", "FALSE", "NULL"):
+            self.position += 1
+            constant = {"TRUE": True, "FALSE": False, "NULL": None}[value]
+            return lambda doc, params: constant
+        if kind == "name" and value.upper() in _FUNCTIONS:
+            self.position += 1
+            function = _FUNCTIONS[value.upper()]
+            self._expect("op", "(")
+            argument = self._or()
+            self._expect("op", ")")
+            return lambda doc, params: function(argument(doc, params))
+        if kind == "name":
+            path = self._path()
+            resolve = lambda doc, params: _resolve(doc, path)
+            if len(path) == 1:
+                resolve.field = path[0]
+            return resolve
+        raise _bad_request(f"Unsupported expression at {value!r}")
+
+    def run(self, docs: List[dict], params: Dict[str, Any]) -> list:
+        if self.where is not None:
+            # Like an index seek: narrow down by the top-level equalities first
+            for term in getattr(self.where, "terms", [self.where]):
+                if hasattr(term, "seek"):
+                    field, value = term.seek[0], term.seek[1](None, params)
+                    docs = [doc for doc in docs if doc.get(field, UNDEFINED) == value]
+            docs = [doc for doc in docs if self.where(doc, params) is True]
+        if self.count:
+            return [len(docs)]
+        if self.order_by:
+            # Documents without an ORDER BY property are left out, as with composite indexes
+            docs = [doc for doc in docs if all(_resolve(doc, path) is not UNDEFINED for path, _ in self.order_by)]
+            for path, descending in reversed(self.order_by):
+                docs.sort(key=lambda doc: (_type_rank(_resolve(doc, path)) or 0, _resolve(doc, path)),
+                          reverse=descending)
+        if self.projection is None:
+            return [copy.deepcopy(doc) for doc in docs]
+        rows = []
+        for doc in docs:
+            row = {}
+            for path in self.projection:
+                value = _resolve(doc, path)
+                if value is not UNDEFINED:
+                    row[path[-1]] = copy.deepcopy(value)
+            rows.append(row)
+        return rows
+
+
+@functools.lru_cache(maxsize=256)
+def _parse(query: str) -> _Query:
+    return _Query(query)
+
+
+# --- Indexing ---------------------------------------------------------------------
+
+def _leaf_paths(value, prefix: str = "") -> Iterator[str]:
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from _leaf_paths(child, f"{prefix}/{key}")
+    elif isinstance(value, list):
+        for child in value:
+            yield from _leaf_paths(child, f"{prefix}/[]")
+    else:
+        yield prefix
+
+
+def _path_pattern(path: str) -> Tuple[str, bool]:
+    """Indexing policy path as (prefix, exact): "/a/?" is exactly /a, "/a/*" all under /a"""
+    path = path.replace('"', "")
+    if path.endswith("/?"):
+        return path[:-2], True
+    return path[:-2] if path.endswith("/*") else path, False
+
+
+def _is_indexed(path: str, policy: dict) -> bool:
+    """The most specific matching included or excluded path wins"""
+    matches = []
+    for paths, include in ((policy.get("includedPaths", []), True), (policy.get("excludedPaths", []), False)):
+        for entry in paths:
+            prefix, exact = _path_pattern(entry["path"])
+            if path == prefix or (not exact and path.startswith(prefix + "/")):
+                matches.append((len(prefix), exact, not include))
+    return bool(matches) and not max(matches)[2]
+
+
+class FakeClientConnection:
+    """Holds the headers of the last response, like the SDK's CosmosClientConnection"""
+
+    def __init__(self):
+        self.last_response_headers: Dict[str, str] = {}
+
+
+class _Pages:
+    """Page iterator of a query; a failed page can be requested again"""
+
+    def __init__(self, container: "FakeContainer", rows: list, page_size: int, offset: int,
+                 response_hook: Optional[Callable]):
+        self.container = container
+        self.rows = rows
+        self.page_size = page_size
+        self.offset = offset
+        self.response_hook = response_hook
+        self.done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Iterator:
+        if self.done:
+            raise StopIteration
+        self.container._begin("query")
+        page = self.rows[self.offset:self.offset + self.page_size]
+        self.offset += len(page)
+        self.done = self.offset >= len(self.rows)  # an empty result is one empty page
+        self.container._respond(
+            QUERY_RU_PER_PAGE + READ_RU_PER_KB * _size_kb(page),
+            {"x-ms-item-count": str(len(page)), "x-ms-continuation": "" if self.done else str(self.offset)},
+            page, self.response_hook
+        )
+        return iter(page)
+
+
+class FakeQueryIterable:
+    """Query results, iterable directly or page by page like the SDK's ItemPaged"""
+
+    def __init__(self, container: "FakeContainer", rows: list, page_size: int, response_hook: Optional[Callable]):
+        self.container = container
+        self.rows = rows
+        self.page_size = page_size
+        self.response_hook = response_hook
+
+    def by_page(self, continuation_token: Optional[str] = None) -> _Pages:
+        return _Pages(self.container, self.rows, self.page_size, int(continuation_token or 0), self.response_hook)
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+
+def _size_kb(value) -> float:
+    return len(json.dumps(value, default=str)) / 1024
+
+
+class FakeContainer:
+    """Thread-safe in-memory container"""
+
+    def __init__(self, id: str = "fake", max_ops_per_second: Optional[int] = None,
+                 partition_key: Optional[dict] = None, indexing_policy: Optional[dict] = None,
+                 latency: Optional[Dict[str, LatencyModel]] = None, ru_per_second: Optional[float] = None,
+                 error_rate: float = 0.0, page_size: int = DEFAULT_PAGE_SIZE, seed: Optional[int] = None):
+        self.id = id
+        self.max_ops_per_second = max_ops_per_second
+        self.partition_key = partition_key or {"paths": ["/type"], "kind": "Hash"}
+        self.indexing_policy = indexing_policy or DEFAULT_INDEXING_POLICY
+        self.latency = latency or {}  # "read" / "write" / "query" -> LatencyModel
+        self.ru_per_second = ru_per_second
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.client_connection = FakeClientConnection()
+        self.items: Dict[Tuple[str, str], dict] = {}  # (partition key, id) -> document
+        self.operations = 0  # point operations and queries, as issued by the app
+        self.requests = 0  # round trips, counting every query page
+        self.request_charge = 0.0
+        self.throttled = 0
+        self.injected_errors = 0
+        self._pk_field = self.partition_key["paths"][0].lstrip("/")
+        self._indexed_paths: Tuple[dict, Dict[str, bool]] = (self.indexing_policy, {})  # policy, path -> indexed
+        self._window_start = time.monotonic()
+        self._window_ops = 0
+        self._window_ru = 0.0
+        self._lock = threading.Lock()
+        self._etags = itertools.count(1)
+        self._random = random.Random(seed)
+
+    def _begin(self, kind: str):
+        """Start one request: injected faults, throttling, then latency"""
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.injected_errors += 1
+                raise exceptions.CosmosHttpResponseError(status_code=503, message="Service unavailable (injected)")
+            now = time.monotonic()
+            if now - self._window_start >= 1:
+                self._window_start = now
+                self._window_ops = 0
+                self._window_ru = 0.0
+            if ((self.max_ops_per_second is not None and self._window_ops >= self.max_ops_per_second)
+                    or (self.ru_per_second is not None and self._window_ru >= self.ru_per_second)):
+                self.throttled += 1
+                raise _throttled_error(int((self._window_start + 1 - now) * 1000) + 1)
+            self._window_ops += 1
+            model = self.latency.get(kind)
+            delay = model.sample(self._random) if model is not None else 0.0
+        if delay > 0:
+            time.sleep(delay)
+
+    def _respond(self, charge: float, headers: Optional[dict] = None, result=None,
+                 response_hook: Optional[Callable] = None):
+        """Charge a completed request and publish its response headers"""
+        charge = round(charge, 2)
+        with self._lock:
+            self.request_charge += charge
+            self._window_ru += charge
+        response_headers = {
+            "x-ms-request-charge": f"{charge:.2f}",
+            "x-ms-activity-id": str(uuid.uuid4()),
+            **(headers or {}),
+        }
+        self.client_connection.last_response_headers = response_headers
+        if response_hook is not None:
+            response_hook(response_headers, result)
+
+    def _operation(self, kind: str):
+        """Count an operation issued by the app and start its request"""
+        with self._lock:
+            self.operations += 1
+        self._begin(kind)
+
+    def _key(self, body: dict) -> Tuple[str, str]:
+        return body.get(self._pk_field), body["id"]
+
+    def _write_charge(self, doc: dict) -> float:
+        policy = self.indexing_policy
+        if self._indexed_paths[0] is not policy:
+            self._indexed_paths = (policy, {})
+        indexed_paths = self._indexed_paths[1]
+        indexed = 0
+        for path in _leaf_paths(doc):
+            if path not in indexed_paths:
+                indexed_paths[path] = _is_indexed(path, policy)
+            indexed += indexed_paths[path]
+        return WRITE_RU_PER_KB * max(1.0, _size_kb(doc)) + INDEX_RU_PER_VALUE * indexed
+
+    def _store(self, key: Tuple[str, str], body: dict) -> dict:
+        doc = copy.deepcopy(body)
+        doc["_etag"] = f'"{next(self._etags)}"'
+        self.items[key] = doc
+        return copy.deepcopy(doc)
+
+    def _written(self, doc: dict, response_hook: Optional[Callable]) -> dict:
+        self._respond(self._write_charge(doc), {"etag": doc["_etag"]}, doc, response_hook)
+        return doc
+
+    def read(self, populate_quota_info: bool = False, **kwargs) -> dict:
+        """Container properties; re-indexing after a policy change completes at once"""
+        self._operation("read")
+        properties = {"id": self.id, "partitionKey": self.partition_key, "indexingPolicy": self.indexing_policy}
+        headers = {"x-ms-documentdb-collection-index-transformation-progress": "100"}
+        if populate_quota_info:
+            headers["x-ms-resource-usage"] = f"documentsCount={len(self.items)}"
+        self._respond(READ_RU_PER_KB, headers, properties, kwargs.get("response_hook"))
+        return copy.deepcopy(properties)
+
+    def read_item(self, item, partition_key, etag=None, match_condition=None, **kwargs):
+        self._operation("read")
+        doc = self.items.get((partition_key, item))
+        if doc is None:
+            self._respond(READ_RU_PER_KB)
+            raise exceptions.CosmosResourceNotFoundError(status_code=404, message="Not found")
+        if match_condition == MatchConditions.IfModified and doc["_etag"] == etag:
+            self._respond(READ_RU_PER_KB, {"etag": etag})
+            return None
+        doc = copy.deepcopy(doc)
+        self._respond(READ_RU_PER_KB * max(1.0, _size_kb(doc)), {"etag": doc["_etag"]}, doc, kwargs.get("response_hook"))
+        return doc
+
+    def upsert_item(self, body, **kwargs):
+        self._operation("write")
+        with self._lock:
+            doc = self._store(self._key(body), body)
+        return self._written(doc, kwargs.get("response_hook"))
+
+    def create_item(self, body, **kwargs):
+        self._operation("write")
+        with self._lock:
+            key = self._key(body)
+            if key in self.items:
+                raise exceptions.CosmosResourceExistsError(status_code=409, message="Conflict")
+            doc = self._store(key, body)
+        return self._written(doc, kwargs.get("response_hook"))
+
+    def replace_item(self, item, body, etag=None, match_condition=None, **kwargs):
+        self._operation("write")
+        with self._lock:
+            key = (body.get(self._pk_field), item)
+            if key not in self.items:
+                raise exceptions.CosmosResourceNotFoundError(status_code=404, message="Not found")
+            if match_condition == MatchConditions.IfNotModified and self.items[key]["_etag"] != etag:
+                raise exceptions.CosmosAccessConditionFailedError(status_code=412, message="Precondition failed")
+            doc = self._store(key, body)
+        return self._written(doc, kwargs.get("response_hook"))
+
+    def delete_item(self, item, partition_key, **kwargs):
+        self._operation("write")
+        with self._lock:
+            doc = self.items.pop((partition_key, item), None)
+        if doc is None:
+            raise exceptions.CosmosResourceNotFoundError(status_code=404, message="Not found")
+        self._respond(self._write_charge(doc), response_hook=kwargs.get("response_hook"))
+
+    def query_items(self, query, parameters=None, partition_key=None, max_item_count=None, **kwargs):
+        """Evaluates the query now; pages are charged and delayed as they are fetched"""
+        with self._lock:
+            self.operations += 1
+        parsed = _parse(query)
+        with self._lock:
+            # Documents are replaced on write, never changed in place, so they can be read unlocked
+            docs = [doc for (pk, _), doc in self.items.items() if partition_key is None or pk == partition_key]
+        rows = parsed.run(docs, {p["name"]: p["value"] for p in parameters or []})
+        return FakeQueryIterable(self, rows, max_item_count or self.page_size, kwargs.get("response_hook"))
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self.items),
+            "operations": self.operations,
+            "requests": self.requests,
+            "requestCharge": round(self.request_charge, 2),
+            "throttled": self.throttled,
+            "injectedErrors": self.injected_errors,
+        }
+
+
+class FakeDatabase:
+    """Database with the container management calls the app and tools use"""
+
+    def __init__(self, id: str, container_options: dict):
+        self.id = id
+        self.container_options = container_options
+        self.containers: Dict[str, FakeContainer] = {}
+        self._lock = threading.Lock()
+
+    def create_container_if_not_exists(self, id, partition_key=None, indexing_policy=None, **kwargs) -> FakeContainer:
+        with self._lock:
+            if id not in self.containers:
+                self.containers[id] = FakeContainer(
+                    id, partition_key=partition_key, indexing_policy=copy.deepcopy(indexing_policy),
+                    **self.container_options
+                )
+            return self.containers[id]
+
+    def get_container_client(self, container) -> FakeContainer:
+        if container not in self.containers:
+            raise exceptions.CosmosResourceNotFoundError(status_code=404, message=f"Container {container} not found")
+        return self.containers[container]
+
+    def replace_container(self, container, partition_key, indexing_policy=None, **kwargs) -> FakeContainer:
+        container = self.get_container_client(getattr(container, "id", container))
+        if indexing_policy is not None:
+            container.indexing_policy = copy.deepcopy(indexing_policy)
+        return container
+
+
+class FakeCosmosClient:
+    """CosmosClient stand-in; options are passed on to every FakeContainer"""
+
+    def __init__(self, **container_options):
+        self.container_options = container_options
+        self.databases: Dict[str, FakeDatabase] = {}
+        self._lock = threading.Lock()
+
+    def create_database_if_not_exists(self, id, **kwargs) -> FakeDatabase:
+        with self._lock:
+            if id not in self.databases:
+                self.databases[id] = FakeDatabase(id, self.container_options)
+            return self.databases[id]
+
+    def get_database_client(self, database) -> FakeDatabase:
+        return self.create_database_if_not_exists(database)
+
+
+_shared_client: Optional[FakeCosmosClient] = None
+
+
+def shared_client(**container_options) -> FakeCosmosClient:
+    """The process-wide fake, so every connection sees the same documents"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = FakeCosmosClient(**container_options)
+    return _shared_client
@@ -0,0 +1,50 @@
+"""
+Bounded concurrent fan-out of independent database reads
+The Cosmos DB client is synchronous, so reads that don't depend on each
+other run side by side on a shared thread pool. Each request runs at most
+REQUEST_FANOUT_LIMIT of them at a time, so one request can't take the
+whole pool (or the RU budget) for itself.
+"""
+
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, List, Optional, TypeVar
+
+from config import settings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_pool = ThreadPoolExecutor(max_workers=settings.REQUEST_FANOUT_THREADS, thread_name_prefix="fanout")
+
+
+async def gather_reads(*calls: Callable[[], T], limit: Optional[int] = None) -> List[T]:
+    """Run blocking calls concurrently from async code; results in call order"""
+    semaphore = asyncio.Semaphore(limit or settings.REQUEST_FANOUT_LIMIT)
+    loop = asyncio.get_running_loop()
+
+    async def run(call):
+        async with semaphore:
+            return await loop.run_in_executor(_pool, call)
+
+    return await asyncio.gather(*(run(call) for call in calls))
+
+
+def map_reads(function: Callable[[T], R], items: Iterable[T], limit: Optional[int] = None) -> List[R]:
+    """function over items, concurrently from blocking code; results in item order"""
+    items = list(items)
+    if len(items) <= 1:
+        return [function(item) for item in items]
+
+    limit = limit or settings.REQUEST_FANOUT_LIMIT
+    results: List[R] = [None] * len(items)
+    running = {}
+    for index, item in enumerate(items):
+        if len(running) >= limit:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+        running[_pool.submit(function, item)] = index
+    for future in wait(running).done:
+        results[running[future]] = future.result()
+    return results
@@ -0,0 +1,89 @@
+"""
+Group commit for quiz answers
+During a live round every player answers inside the same time window.
+Answers are buffered for a few milliseconds and all pending answers of a
+user are saved together: their ledger documents are created, and the
+user's answer summary is updated once for all of them. Each caller only
+gets its result once that batch has been written.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+from cosmos import to_db_thread
+from models import QuizAnswer
+
+
+class QuizAnswerCommitter:
+    """Buffers quiz answers and commits them per user in batches"""
+
+    def __init__(self, database, window_ms: int, max_batch: int):
+        self.database = database
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: Dict[str, List[Tuple[QuizAnswer, asyncio.Future]]] = {}
+        self._pending_count = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Commits of the same user run one after the other, so their summary
+        # updates don't fail each other's ETag checks
+        self._user_locks: Dict[str, asyncio.Lock] = {}
+        self._user_commits: Dict[str, int] = {}  # commits started per user, to drop idle locks
+        # The event loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, quiz_answer: QuizAnswer) -> QuizAnswer:
+        """Queue an answer and wait until it has been durably written"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(quiz_answer.userName, []).append((quiz_answer, future))
+        self._pending_count += 1
+
+        if self._pending_count >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Hand every pending user batch over to a commit task"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batches, self._pending = self._pending, {}
+        self._pending_count = 0
+        for user_name, entries in batches.items():
+            task = asyncio.create_task(self._commit(user_name, entries))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _commit(self, user_name: str, entries: List[Tuple[QuizAnswer, asyncio.Future]]):
+        """Write one user's batch and resolve the waiting requests"""
+        lock = self._user_locks.setdefault(user_name, asyncio.Lock())
+        self._user_commits[user_name] = self._user_commits.get(user_name, 0) + 1
+        try:
+            async with lock:
+                errors = await to_db_thread(
+                    self.database.save_quiz_answers,
+                    user_name,
+                    [quiz_answer for quiz_answer, _ in entries]
+                )
+        except Exception as e:
+            for _, future in entries:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._user_commits[user_name] -= 1
+            if not self._user_commits[user_name]:
+                del self._user_commits[user_name]
+                del self._user_locks[user_name]
+
+        for (quiz_answer, future), error in zip(entries, errors):
+            if future.done():
+                continue
+            if error:
+                future.set_exception(ValueError(error))
+            else:
+                future.set_result(quiz_answer)
@@ -0,0 +1,303 @@
+"""
+Idempotency keys for write endpoints
+Clients send an Idempotency-Key header with a write; retries with the same
+key get the first response replayed (with Idempotent-Replayed: true)
+instead of repeating the write. A duplicate that arrives while the first
+request is still running waits for it. Reusing a key with a different
+body is rejected with 422.
+
+Keys are claimed in Cosmos DB, so retries that land on another worker are
+recognized too. The first request creates the key's "idempotency" record
+(the create fails for everyone else) and stores its response there when it
+is done; duplicates read the record, backing off between reads, until then.
+A record in flight is never given up while its lease
+(IDEMPOTENCY_LEASE_SECONDS) runs, only taken over after it, when the worker
+running the request died.
+
+Every worker also keeps the completed responses it has seen in a bounded
+LRU (IDEMPOTENCY_CACHE_SIZE), so retries that come back to it are replayed
+without touching the database.
+
+Responses are replayed for IDEMPOTENCY_TTL_SECONDS. Records carry a Cosmos
+DB ttl, so they are deleted afterwards. Failed (5xx) and throttled (429)
+requests release the key, so they can be retried.
+
+Requests with a key are admitted (admission.admit) before their key is
+claimed or polled, so retries and duplicates count against the same token
+buckets and in-flight cap as any other request.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from admission import ADMITTED, admit, client_address, controller
+from config import settings
+from cosmos import to_db_thread
+from metrics import metrics
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# Responses that ask the client to retry are not replayed
+RETRYABLE_STATUSES = {429}
+
+# Larger responses are not stored (Cosmos DB items are limited to 2 MB)
+MAX_STORED_BODY_BYTES = 256 * 1024
+
+# How often a duplicate checks whether the first request completed: first
+# after POLL_SECONDS, then twice as long each time, up to MAX_POLL_SECONDS
+POLL_SECONDS = 0.05
+MAX_POLL_SECONDS = 1.0
+
+
+def _record_id(key: str) -> str:
+    # Keys may contain characters Cosmos DB ids can't ('/', '\\', '?', '#')
+    return "idem_" + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Idempotency records in Cosmos DB, shared by all workers"""
+
+    def __init__(self, database, ttl_seconds: float, lease_seconds: float, cache_size: int):
+        self.database = database
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.cache_size = cache_size
+        self._completed: "OrderedDict[str, dict]" = OrderedDict()  # record id -> completed record
+        self._lock = threading.Lock()
+
+    def _cached(self, record_id: str) -> Optional[dict]:
+        """A completed record this worker has seen, while it is replayed"""
+        with self._lock:
+            record = self._completed.get(record_id)
+            if record is None:
+                return None
+            if record['expiresAt'] <= time.time():
+                del self._completed[record_id]
+                return None
+            self._completed.move_to_end(record_id)
+            return record
+
+    def _remember(self, record: dict):
+        """Keep a completed record for replays, dropping expired and least recently used ones"""
+        if record['status'] is None or record['expiresAt'] <= time.time():
+            return
+        with self._lock:
+            self._completed[record['id']] = record
+            self._completed.move_to_end(record['id'])
+            now = time.time()
+            while self._completed:
+                oldest = next(iter(self._completed.values()))
+                if len(self._completed) <= self.cache_size and oldest['expiresAt'] > now:
+                    break
+                self._completed.popitem(last=False)
+
+    def get(self, key: str) -> Optional[dict]:
+        """The key's record, if any (read only)"""
+        record_id = _record_id(key)
+        record = self._cached(record_id)
+        if record is None:
+            record = self.database.get_idempotency_record(record_id)
+            if record is not None:
+                self._remember(record)
+        return record
+
+    def claim(self, key: str, fingerprint: str) -> Tuple[bool, dict]:
+        """Claim key for a request: (True, our record), or (False, the record of whoever has it)"""
+        cached = self._cached(_record_id(key))
+        if cached is not None:
+            return False, cached
+
+        db = self.database
+        record = {
+            "id": _record_id(key),
+            "type": "idempotency",  # Partition key
+            "fingerprint": fingerprint,
+            "status": None,
+            "headers": [],
+            "body": "",
+            "expiresAt": time.time() + self.lease_seconds,
+            "ttl": int(self.lease_seconds) + 1,  # outlives the lease
+        }
+        while True:
+            stored = db.create_idempotency_record(record)
+            if stored is not None:
+                return True, stored
+            current = db.get_idempotency_record(record['id'])
+            if current is None:
+                continue  # deleted by its ttl in the meantime
+            if current['expiresAt'] > time.time():
+                self._remember(current)
+                return False, current
+
+            # Replay window over, released, or its worker died mid-request
+            stored = db.replace_idempotency_record(record, current['_etag'])
+            if stored is not None:
+                metrics.incr("idempotency.taken_over")
+                return True, stored
+
+    def complete(self, record: dict, status: Optional[int], headers: List[tuple], body: bytes, keep: bool):
+        """Store the response in our record, or release the key"""
+        if keep and len(body) <= MAX_STORED_BODY_BYTES:
+            done = dict(
+                record,
+                status=status,
+                headers=[[name.decode("latin-1"), value.decode("latin-1")] for name, value in headers],
+                body=base64.b64encode(body).decode("ascii"),
+                expiresAt=time.time() + self.ttl_seconds,
+                ttl=int(self.ttl_seconds) + 1
+            )
+        else:
+            done = dict(record, expiresAt=0, ttl=1)
+        # Conditional: once our lease ran out, another request may own the key
+        stored = self.database.replace_idempotency_record(done, record['_etag'])
+        if stored is not None:
+            self._remember(stored)
+
+    def stats(self) -> dict:
+        return {"cachedResponses": len(self._completed), "cacheSize": self.cache_size}
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware applying idempotency keys to POSTs on the given paths
+
+    paths maps each path to the admission route class of its endpoint.
+    """
+
+    def __init__(self, app, store: IdempotencyStore, paths: Dict[str, str]):
+        self.app = app
+        self.store = store
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = dict(scope["headers"]).get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, "Idempotency-Key is too long")
+            return
+
+        # Buffer the body: it is fingerprinted and then handed to the app
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        key = f"{scope['path']}:{idempotency_key.decode('latin-1')}"
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        try:
+            holds_slot = admit(self.paths[scope["path"]], _admission_key(scope, body))
+        except HTTPException as e:
+            await _send_json(send, e.status_code, e.detail["message"], e.headers)
+            return
+        try:
+            await self._handle(scope, receive, send, key, fingerprint, body, holds_slot)
+        finally:
+            if holds_slot:
+                controller.leave()
+
+    async def _handle(self, scope, receive, send, key: str, fingerprint: str, body: bytes, admitted: bool):
+        """Claim the key and run the request, or replay (or wait for) whoever has it"""
+        claimed, record = await to_db_thread(self.store.claim, key, fingerprint)
+        delay = POLL_SECONDS
+        while not claimed:
+            if record['fingerprint'] != fingerprint:
+                await _send_json(send, 422, "Idempotency-Key was already used with a different request")
+                return
+            if record['status'] is not None:
+                metrics.incr("idempotency.replayed")
+                await _send_stored(send, record)
+                return
+
+            # Same request still running (on any worker): wait for it rather than racing it
+            if delay == POLL_SECONDS:
+                metrics.incr("idempotency.waited")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_SECONDS)
+            record = await to_db_thread(self.store.get, key)
+            if record is None or record['expiresAt'] <= time.time():
+                # Released, or its worker died: claim it (or see who did)
+                claimed, record = await to_db_thread(self.store.claim, key, fingerprint)
+
+        body_sent = False
+        response_status = None
+        response_headers: List[tuple] = []
+        response_body = b""
+
+        async def replay_receive():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def capture_send(message):
+            nonlocal response_status, response_headers, response_body
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response_body += message.get("body", b"")
+            await send(message)
+
+        if admitted:
+            scope = dict(scope, **{ADMITTED: True})
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        finally:
+            keep = response_status is not None and response_status not in RETRYABLE_STATUSES and response_status < 500
+            try:
+                await to_db_thread(
+                    self.store.complete, record, response_status, response_headers, response_body, keep
+                )
+            except Exception as e:
+                # The key stays claimed until its lease runs out
+                print(f"⚠️ Could not store the response for an idempotency key: {e}")
+
+
+def _admission_key(scope, body: bytes) -> str:
+    """userName of a JSON write, or the client address (as the admission dependency does)"""
+    try:
+        user_name = json.loads(body).get("userName")
+    except (ValueError, AttributeError):
+        user_name = None
+    if isinstance(user_name, str):
+        return user_name
+    return client_address(Request(scope), settings.TRUSTED_PROXY_HOPS)
+
+
+async def _send_stored(send, record: dict):
+    await send({
+        "type": "http.response.start",
+        "status": record["status"],
+        "headers": [
+            (name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]
+        ] + [(b"idempotent-replayed", b"true")],
+    })
+    await send({"type": "http.response.body", "body": base64.b64decode(record["body"])})
+
+
+async def _send_json(send, status_code: int, message: str, headers: Optional[dict] = None):
+    body = json.dumps({"detail": {"success": False, "message": message}}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + [
+            (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in (headers or {}).items()
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,93 @@
+"""
+Cross-worker cache invalidation without an external broker
+Every worker process publishes invalidations by rewriting its own small
+file per topic (<dir>/<topic>.<pid>) in a shared local directory. A
+background thread in each worker polls that directory and runs the
+subscribed callbacks when another worker's file changes.
+
+Without INVALIDATION_DIR (single worker) publishing is a no-op: the
+publishing process always updates its own caches directly.
+"""
+
+import glob
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+
+
+class InvalidationChannel:
+    """File-based publish/subscribe channel for cache invalidations"""
+
+    def __init__(self, directory: Optional[str], poll_ms: int):
+        self.directory = directory
+        self.poll_interval = poll_ms / 1000
+        self.pid = os.getpid()
+        self._subscribers: Dict[str, List[Callable[[], None]]] = {}
+        self._seen: Dict[str, str] = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._poller: Optional[threading.Thread] = None
+
+    def subscribe(self, topic: str, callback: Callable[[], None]):
+        """Run callback whenever another worker publishes on topic"""
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(callback)
+            if self.directory and self._poller is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._snapshot()  # ignore whatever was published before we started
+                self._poller = threading.Thread(target=self._poll_forever, daemon=True)
+                self._poller.start()
+
+    def publish(self, topic: str):
+        """Tell the other workers that topic changed"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._counter += 1
+            token = f"{self._counter}:{time.time_ns()}"
+        path = os.path.join(self.directory, f"{topic}.{self.pid}")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(token)
+        os.replace(tmp_path, path)
+
+    def _snapshot(self) -> Dict[str, str]:
+        """Read every publisher file of the subscribed topics, return the changed ones"""
+        changed = {}
+        for topic in list(self._subscribers):
+            for path in glob.glob(os.path.join(self.directory, f"{topic}.*")):
+                if path.endswith(".tmp") or path.endswith(f".{self.pid}"):
+                    continue
+                try:
+                    with open(path) as f:
+                        token = f.read()
+                except OSError:
+                    continue
+                if self._seen.get(path) != token:
+                    self._seen[path] = token
+                    changed[path] = topic
+        return changed
+
+    def _poll_forever(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                with self._lock:
+                    changed = self._snapshot()
+            except Exception as e:
+                print(f"⚠️ Invalidation poll failed: {e}")
+                continue
+            for topic in set(changed.values()):
+                for callback in self._subscribers.get(topic, []):
+                    try:
+                        callback()
+                    except Exception as e:
+                        print(f"⚠️ Invalidation callback for {topic} failed: {e}")
+
+
+# Global channel shared by all caches of this worker
+channel = InvalidationChannel(settings.INVALIDATION_DIR or None, settings.INVALIDATION_POLL_MS)
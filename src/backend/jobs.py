@@ -0,0 +1,162 @@
+"""
+Background jobs that recompute stored data after admin changes
+A job runs as an asyncio task in the worker that enqueued it, working
+through all user submissions in rate-limited batches. Its state is
+persisted as a "job" document, so any worker can report its progress or
+cancel it.
+
+A lock document keeps at most one job running per game. Changes made
+while a job runs don't start a second one: they ask the running job to go
+over the submissions once more when it is done.
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from cosmos import to_db_thread
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def _new_job(kind: str, reason: str) -> dict:
+    return {
+        "id": f"job_{uuid.uuid4().hex[:12]}",
+        "type": "job",  # Partition key
+        "kind": kind,
+        "reason": reason,
+        "status": "queued",
+        "total": None,
+        "processed": 0,
+        "rescored": 0,
+        "error": None,
+        "createdAt": _now(),
+        "startedAt": None,
+        "finishedAt": None,
+    }
+
+
+class JobRunner:
+    """Runs score recomputation jobs, one at a time per game"""
+
+    def __init__(self, database, batch_size: int, documents_per_second: float, lock_ttl_seconds: float):
+        self.database = database
+        self.batch_size = batch_size
+        self.documents_per_second = documents_per_second
+        self.lock_ttl_seconds = lock_ttl_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def enqueue_rescore(self, reason: str, rerun: bool = True) -> dict:
+        """Recompute every user's stored score; returns the job doing it
+        
+        If a job is already running, it is asked to go over the submissions
+        again when done (it may have passed them before the change), unless
+        rerun is False: nothing changed that it could have missed.
+        """
+        db = self.database
+        job = _new_job("rescore", reason)
+        holder = await to_db_thread(db.acquire_job_lock, job['id'], self.lock_ttl_seconds)
+        if holder != job['id']:
+            if rerun:
+                await to_db_thread(db.update_job_lock, holder, rerunRequested=True)
+            running = await to_db_thread(db.get_job, holder)
+            # The holder may not have stored its job document yet
+            return running or {"id": holder, "type": "job", "status": "queued"}
+
+        try:
+            await to_db_thread(db.save_job, job)
+        except Exception:
+            await to_db_thread(db.release_job_lock, job['id'])
+            raise
+        self._task = asyncio.create_task(self._run(job))
+        return job
+
+    async def cancel(self, job_id: str) -> dict:
+        """Ask a running job to stop after its current batch"""
+        job = await to_db_thread(self.database.get_job, job_id)
+        if job is None:
+            raise LookupError(f"Job {job_id} not found")
+        if job['status'] not in ACTIVE_STATUSES:
+            raise ValueError(f"Job {job_id} is already {job['status']}")
+        lock = await to_db_thread(self.database.update_job_lock, job_id, cancelRequested=True)
+        if lock is None:
+            raise ValueError(f"Job {job_id} is not running")
+        job['cancelRequested'] = True
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await to_db_thread(self.database.get_job, job_id)
+
+    async def recent(self) -> List[dict]:
+        return await to_db_thread(self.database.get_recent_jobs)
+
+    async def _run(self, job: dict):
+        db = self.database
+        try:
+            while True:
+                lock = await self._execute(job)
+                if job['status'] != "completed" or not lock or not lock.get('rerunRequested'):
+                    return
+
+                # Admin answers changed while the job ran: go over everything once more
+                rerun = _new_job(job['kind'], "rerun")
+                lock = await to_db_thread(
+                    db.update_job_lock, job['id'],
+                    jobId=rerun['id'], rerunRequested=False, expiresAt=time.time() + self.lock_ttl_seconds
+                )
+                if lock is None:
+                    return
+                job = rerun
+                await to_db_thread(db.save_job, job)
+        finally:
+            # Whatever failed, don't leave the lock held until its TTL runs out
+            # (a no-op if the job no longer holds it)
+            await to_db_thread(db.release_job_lock, job['id'])
+
+    async def _execute(self, job: dict) -> Optional[dict]:
+        """Run one job to the end; returns the job lock as last seen"""
+        db = self.database
+        job.update(status="running", startedAt=_now())
+        lock = None
+        try:
+            await to_db_thread(db.save_job, job)
+            print(f"⚙️ Job {job['id']} ({job['kind']}, {job['reason']}) started")
+            job['total'] = await to_db_thread(db.count_submissions)
+            batches = db.iter_submission_batches(self.batch_size)
+            while True:
+                # Renewing the lock each batch also picks up cancel and rerun requests
+                lock = await to_db_thread(
+                    db.update_job_lock, job['id'], expiresAt=time.time() + self.lock_ttl_seconds
+                )
+                if lock is None:
+                    raise RuntimeError("Job lock was lost")
+                if lock['cancelRequested']:
+                    job['status'] = "cancelled"
+                    break
+
+                batch = await to_db_thread(next, batches, None)
+                if batch is None:
+                    job['status'] = "completed"
+                    break
+                job['rescored'] += await to_db_thread(db.rescore_batch, batch)
+                job['processed'] += len(batch)
+                await to_db_thread(db.save_job, job)
+
+                # Spread the writes out so players keep their share of the RUs
+                await asyncio.sleep(len(batch) / self.documents_per_second)
+        except Exception as e:
+            job.update(status="failed", error=str(e))
+
+        job['finishedAt'] = _now()
+        try:
+            await to_db_thread(db.save_job, job)
+        except Exception as e:
+            print(f"⚠️ Could not store the final state of job {job['id']}: {e}")
+        print(f"⚙️ Job {job['id']} {job['status']}: {job['rescored']} of {job['processed']} submissions rescored")
+        return lock
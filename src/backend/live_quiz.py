@@ -0,0 +1,253 @@
+"""
+Live quiz rounds over WebSockets
+The server pushes each question of the round to all connected players
+at the same moment, closes it when its timeLimit runs out and accepts
+answers on the same connection. While a question is open its answers and
+the round totals are only kept in memory. When it closes, each player's
+answers are written to the answer ledger in one save (all of them in one
+group commit flush when enabled), and only then acknowledged: an
+acknowledged answer survives a crash or redeploy, and the ledger rejects a
+second answer to a question even from another worker.
+
+With several workers every worker runs the round for its own connections.
+The round's start time and questions are stored in the database and
+announced on the invalidation channel, so all workers open and close the
+same questions together.
+"""
+
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional, Set
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from config import settings
+from cosmos import to_db_thread
+from models import QuizAnswer
+from quiz_questions import QuizQuestionData, QuizQuestions
+
+# Seconds between announcing a round and showing the first question
+START_DELAY_SECONDS = 3
+
+
+class LiveQuizSession:
+    """One worker's view of the live quiz round"""
+
+    def __init__(self, database, committer=None):
+        self.database = database
+        self.committer = committer
+        self.connections: Dict[str, WebSocket] = {}
+        self.answered: Dict[str, Set[str]] = {}  # userName -> questionIds answered
+        self.pending: Dict[str, List[QuizAnswer]] = {}  # userName -> answers not yet written
+        self.totals: Dict[str, int] = {}  # userName -> correct answers this round
+        self.current: Optional[QuizQuestionData] = None
+        self.deadline = 0.0  # epoch seconds
+        self.started_at: Optional[float] = None
+        self.question_ids: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "startedAt": self.started_at,
+            "connectedPlayers": sorted(self.connections),
+            "questionIds": self.question_ids,
+            "currentQuestion": self.current.id if self.current else None,
+            "totals": self.totals,
+        }
+
+    def start(self, started_at: float, question_ids: List[str]):
+        """Run the round of these questions that starts at started_at (epoch seconds)"""
+        if self.running:
+            return
+        self.started_at = started_at
+        self.question_ids = question_ids
+        self._task = asyncio.create_task(self._run(started_at, question_ids))
+
+    async def connect(self, user_name: str, websocket: WebSocket):
+        """Serve one player's connection until it closes"""
+        await websocket.accept()
+        if user_name not in self.answered:
+            previous = await to_db_thread(self.database.get_user_quiz_answers, user_name)
+            self.answered[user_name] = {answer.questionId for answer in previous}
+        replaced = self.connections.get(user_name)
+        self.connections[user_name] = websocket
+        if replaced is not None:
+            # The player reconnected (another tab or a dropped network): only the newest socket is served
+            try:
+                await replaced.close(code=1000, reason="Replaced by a newer connection")
+            except RuntimeError:
+                pass  # already closed
+
+        await websocket.send_json({"type": "welcome", "userName": user_name, "totals": self.totals})
+        if self.current and time.time() < self.deadline:
+            await websocket.send_json(self._question_message(self.current))
+
+        try:
+            while True:
+                message = await self._receive(websocket)
+                if message is None:
+                    await websocket.send_json({"type": "error", "message": "Messages must be JSON objects"})
+                elif message.get("type") == "answer":
+                    error = self._answer(user_name, message)
+                    if error:
+                        await websocket.send_json(error)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if self.connections.get(user_name) is websocket:
+                del self.connections[user_name]
+
+    @staticmethod
+    async def _receive(websocket: WebSocket) -> Optional[dict]:
+        """Next message as a JSON object; None if it isn't one"""
+        frame = await websocket.receive()
+        if frame["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(frame.get("code", 1000))
+        text = frame.get("text")
+        if text is None:
+            text = (frame.get("bytes") or b"").decode("utf-8", "replace")
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return None
+        return message if isinstance(message, dict) else None
+
+    def _answer(self, user_name: str, message: dict) -> Optional[dict]:
+        """Take an answer for the open question; the error message if it is refused
+
+        Accepted answers are acknowledged once the question closes and they are written.
+        """
+        question_id = message.get("questionId")
+        grace = settings.LIVE_QUIZ_GRACE_MS / 1000
+
+        if not self.current or question_id != self.current.id or time.time() > self.deadline + grace:
+            return {"type": "error", "questionId": question_id, "message": "Question is not open"}
+        if question_id in self.answered[user_name]:
+            return {"type": "error", "questionId": question_id,
+                    "message": f"Question {question_id} has already been answered"}
+
+        answer = message.get("answer")
+        if not isinstance(answer, str):
+            return {"type": "error", "questionId": question_id, "message": "answer must be a string"}
+        self.answered[user_name].add(question_id)
+        self.pending.setdefault(user_name, []).append(QuizAnswer(
+            userName=user_name,
+            questionId=question_id,
+            answer=answer,
+            isCorrect=answer == self.current.correctAnswer
+        ))
+        return None
+
+    async def _save(self, user_name: str, answers: List[QuizAnswer]) -> List[Optional[str]]:
+        """Write a player's answers to the ledger; one error message (or None) per answer"""
+        if self.committer:
+            results = await asyncio.gather(
+                *(self.committer.submit(answer) for answer in answers), return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception) and not isinstance(result, ValueError):
+                    raise result
+            return [str(result) if isinstance(result, ValueError) else None for result in results]
+        return await to_db_thread(self.database.save_quiz_answers, user_name, answers)
+
+    async def _flush(self):
+        """Write the answers taken since the last flush and acknowledge them"""
+        pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        saved = await asyncio.gather(
+            *(self._save(user_name, answers) for user_name, answers in pending.items()), return_exceptions=True
+        )
+
+        acknowledgements = []
+        for (user_name, answers), errors in zip(pending.items(), saved):
+            if isinstance(errors, Exception):
+                print(f"⚠️ Could not save live quiz answers of {user_name}: {errors}")
+                self.answered[user_name].difference_update(answer.questionId for answer in answers)
+                errors = ["Answer could not be saved"] * len(answers)
+            for answer, error in zip(answers, errors):
+                if error:
+                    # e.g. answered before through another worker or the REST endpoint
+                    reply = {"type": "error", "questionId": answer.questionId, "message": error}
+                else:
+                    if answer.isCorrect:
+                        self.totals[user_name] = self.totals.get(user_name, 0) + 1
+                    reply = {
+                        "type": "answerResult",
+                        "questionId": answer.questionId,
+                        "isCorrect": answer.isCorrect,
+                        "totalCorrect": self.totals.get(user_name, 0)
+                    }
+                websocket = self.connections.get(user_name)
+                if websocket is not None:
+                    acknowledgements.append(websocket.send_json(reply))
+        await asyncio.gather(*acknowledgements, return_exceptions=True)
+
+    def _question_message(self, question: QuizQuestionData) -> dict:
+        return {
+            "type": "question",
+            "id": question.id,
+            "question": question.question,
+            "options": question.options,
+            "timeLimit": question.timeLimit,
+            "deadline": self.deadline,
+        }
+
+    async def _broadcast(self, message: dict):
+        """Send a message to every connected player at once"""
+        sockets = list(self.connections.values())
+        await asyncio.gather(*(ws.send_json(message) for ws in sockets), return_exceptions=True)
+
+    async def _run(self, started_at: float, question_ids: List[str]):
+        grace = settings.LIVE_QUIZ_GRACE_MS / 1000
+        opens_at = started_at
+        try:
+            for question_id in question_ids:
+                question = QuizQuestions.get_question_by_id(question_id)
+                if question is None:
+                    # Removed from the bank since the round was announced
+                    continue
+                # Schedule against the shared start time so all workers stay in step
+                await asyncio.sleep(max(0.0, opens_at - time.time()))
+                self.current = question
+                self.deadline = opens_at + question.timeLimit
+                await self._broadcast(self._question_message(question))
+
+                await asyncio.sleep(max(0.0, self.deadline + grace - time.time()))
+                self.current = None
+                await self._flush()
+                await self._broadcast({
+                    "type": "questionClosed",
+                    "questionId": question.id,
+                    "correctAnswer": question.correctAnswer,
+                    "totals": self.totals
+                })
+                opens_at = self.deadline + grace
+        finally:
+            self.current = None
+            await self._flush()
+            await self._broadcast({"type": "finished", "totals": self.totals})
+
+
+def select_questions(question_ids: Optional[List[str]], count: Optional[int]) -> List[str]:
+    """Questions of a round: the given ids, or count random questions of the bank"""
+    bank = QuizQuestions.bank
+    if question_ids:
+        unknown = [question_id for question_id in question_ids if question_id not in bank.by_id]
+        if unknown:
+            raise ValueError(f"Unknown questions: {', '.join(unknown)}")
+        return list(dict.fromkeys(question_ids))
+    count = min(count or settings.LIVE_QUIZ_QUESTIONS, len(bank))
+    return [bank.questions[ordinal].id for ordinal in sorted(random.sample(range(len(bank)), count))]
+
+
+def next_start_time() -> float:
+    """Start time for a round announced now"""
+    return time.time() + START_DELAY_SECONDS
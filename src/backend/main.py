@@ -1,16 +1,38 @@
-from fastapi import FastAPI, HTTPException, status
+import asyncio
+import json
+from itertools import islice
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, WebSocket, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional
 
+from admission import admission
+from auth import require_admin_secret
+from allocations import AllocationMiddleware, AllocationProfiler
+from coalesce import SingleFlight
 from config import settings
+from cosmos import db_executor, to_db_thread
 from models import (
     PredictionInput, Prediction, AnswersInput, CorrectAnswers,
     ParticipantStatus, Score, AMIGOS_INVISIBLES, PLAYERS, Question, QuizAnswerInput, QuizAnswer,
-    QuizCorrectAnswersInput, QuizCorrectAnswers, CombinedScore
+    QuizCorrectAnswersInput, QuizCorrectAnswers, CombinedScore, WhatIfInput, LiveQuizStartInput
 )
-from database import db
-from quiz_questions import QuizQuestions
+from database import QUIZ_ANSWER_LEDGER_MIGRATION, db
+from fanout import gather_reads
+from group_commit import QuizAnswerCommitter
+from idempotency import IdempotencyMiddleware, IdempotencyStore
+from invalidation import channel
+from jobs import JobRunner
+from live_quiz import LiveQuizSession, next_start_time, select_questions
+from metrics import metrics
+from profiler import ProfileBuffer, ProfilerMiddleware, StackSampler
+from quiz_questions import QuestionBankLoader, QuizQuestions, unanswered
+from reveal import RevealSnapshot, RevealSnapshots, matches_etag, prediction_row
+from schema import is_compact
+from snapshot import iter_documents, iter_snapshot_chunks
+from whatif import WhatIfError, what_if
 
 # Code version for tracking deployments
 BACKEND_VERSION = "0.0.28"
@@ -21,6 +43,53 @@ app = FastAPI(
     version=settings.VERSION
 )
 
+# Optional group commit for quiz answers
+quiz_committer = QuizAnswerCommitter(
+    db,
+    window_ms=settings.QUIZ_GROUP_COMMIT_WINDOW_MS,
+    max_batch=settings.QUIZ_GROUP_COMMIT_MAX_BATCH
+) if settings.QUIZ_GROUP_COMMIT else None
+
+# Live quiz round served over WebSockets
+live_quiz = LiveQuizSession(db, quiz_committer)
+
+# Question bank, reloaded when its source changes or another worker saw it change
+question_bank = QuestionBankLoader(settings.QUESTION_BANK_SOURCE, settings.QUESTION_BANK_FILE, db)
+channel.subscribe("question_bank", question_bank.check)
+
+# Concurrent identical expensive reads share one computation
+single_flight = SingleFlight(settings.COALESCE_TIMEOUT_SECONDS, db_executor())
+metrics.register("singleflight", single_flight.stats)
+
+# Final predictions and scores, frozen at the reveal date or on admin finalization
+reveal = RevealSnapshots(db, settings.REVEAL_DATE)
+channel.subscribe("reveal", reveal.load)
+
+# Background jobs (score recomputation after admin answer changes)
+jobs = JobRunner(
+    db,
+    batch_size=settings.RESCORE_BATCH_SIZE,
+    documents_per_second=settings.RESCORE_DOCUMENTS_PER_SECOND,
+    lock_ttl_seconds=settings.JOB_LOCK_TTL_SECONDS
+)
+
+# Sampled per-route memory allocation profiling (innermost, so it measures the route itself)
+allocation_profiler = AllocationProfiler(settings.ALLOCATION_SAMPLE_RATE, settings.ALLOCATION_TOP_SITES)
+metrics.register("allocations", allocation_profiler.stats)
+app.add_middleware(AllocationMiddleware, profiler=allocation_profiler)
+
+# Idempotency-Key support for client retries of writes (inside CORS, so replays get CORS headers)
+idempotency_store = IdempotencyStore(
+    db, settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_LEASE_SECONDS, settings.IDEMPOTENCY_CACHE_SIZE
+)
+metrics.register("idempotency", idempotency_store.stats)
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=idempotency_store,
+    # path -> admission route class of its endpoint
+    paths={"/api/predictions": "write", "/api/quiz/answer": "quiz_answer"}
+)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -28,8 +97,87 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Stack sampling of slow or explicitly requested requests (outermost, so it sees the whole request)
+profiles = ProfileBuffer(settings.PROFILER_MAX_PROFILES)
+metrics.register("profiler", profiles.stats)
+app.add_middleware(
+    ProfilerMiddleware,
+    sampler=StackSampler(settings.PROFILER_INTERVAL_MS, settings.PROFILER_MAX_SAMPLES),
+    buffer=profiles,
+    threshold_ms=settings.SLOW_REQUEST_PROFILE_MS,
+    secret=settings.ADMIN_SECRET
+)
+
+
+async def revalidate_admin_answers_periodically():
+    """Keep the cached admin answers in sync with Cosmos DB off the request path"""
+    while True:
+        await asyncio.sleep(settings.ADMIN_ANSWERS_REVALIDATE_SECONDS)
+        try:
+            await to_db_thread(db.revalidate_admin_answers)
+        except Exception as e:
+            print(f"⚠️ Admin answers revalidation failed: {e}")
+
+
+async def reload_question_bank_periodically():
+    """Pick up a new version of the question bank"""
+    while True:
+        await asyncio.sleep(settings.QUESTION_BANK_RELOAD_SECONDS)
+        try:
+            if await to_db_thread(question_bank.check):
+                # The other workers reload now instead of at their next poll
+                channel.publish("question_bank")
+        except Exception as e:
+            print(f"⚠️ Question bank reload failed: {e}")
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Start background maintenance tasks"""
+    # Warm the admin answers cache so the first score request doesn't pay for it
+    await gather_reads(db.get_correct_answers, db.get_quiz_correct_answers)
+    asyncio.create_task(revalidate_admin_answers_periodically())
+    await to_db_thread(question_bank.check)
+    asyncio.create_task(reload_question_bank_periodically())
+    await to_db_thread(reveal.load)
+    asyncio.create_task(reveal.freeze_at_reveal(settings.REVEAL_SNAPSHOT_RETRY_SECONDS))
+    if settings.SCHEMA_UPGRADE_ON_STARTUP and is_compact(settings.STORAGE_SCHEMA_VERSION):
+        asyncio.create_task(upgrade_submissions_in_background())
+    if await to_db_thread(db.get_migration, QUIZ_ANSWER_LEDGER_MIGRATION) is None:
+        print("⚠️ Quiz answers embedded in submissions are read from there until moved: "
+              "run python migrate_quiz_answers.py once")
+    # Backfill or refresh stored scores, only if some are stale: every worker
+    # starts here, and a job that is already running covers them anyway
+    if await to_db_thread(db.count_stale_scores):
+        await jobs.enqueue_rescore("startup", rerun=False)
+    
+    # Join live quiz rounds started by other workers
+    loop = asyncio.get_running_loop()
+    channel.subscribe(
+        "live_quiz",
+        lambda: asyncio.run_coroutine_threadsafe(join_live_quiz_round(), loop)
+    )
+
+
+async def upgrade_submissions_in_background():
+    """Move legacy user_submission documents to the compact schema"""
+    try:
+        upgraded = await to_db_thread(db.upgrade_submissions)
+        if upgraded:
+            print(f"✅ Upgraded {upgraded} submissions to the compact schema")
+    except Exception as e:
+        print(f"⚠️ Submission schema upgrade failed: {e}")
+
+
+async def join_live_quiz_round():
+    """Start this worker's side of the current live quiz round"""
+    current_round = await to_db_thread(db.get_live_quiz_round)
+    if current_round:
+        live_quiz.start(*current_round)
+
 
 @app.get("/api/health")
 async def health_check():
@@ -41,9 +189,16 @@ async def health_check():
     }
 
 
-@app.post("/api/predictions", status_code=status.HTTP_201_CREATED)
+@app.post("/api/predictions", status_code=status.HTTP_201_CREATED, dependencies=[Depends(admission("write"))])
 async def submit_predictions(prediction_input: PredictionInput):
     """Submit or update predictions for a user"""
+    # The stored snapshot, not this worker's copy: another worker may have just finalized
+    if await to_db_thread(reveal.is_final):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"success": False, "message": "The game is finalized: predictions can no longer change"}
+        )
+    
     try:
         # Create prediction object
         prediction = Prediction(
@@ -52,11 +207,11 @@ async def submit_predictions(prediction_input: PredictionInput):
         )
         
         # Check if this is an update
-        existing = db.get_prediction(prediction_input.userName)
+        existing = await to_db_thread(db.get_prediction, prediction_input.userName)
         is_update = existing is not None
         
         # Save to database
-        saved_prediction = db.save_prediction(prediction)
+        saved_prediction = await to_db_thread(db.save_prediction, prediction)
         
         return {
             "success": True,
@@ -75,39 +230,33 @@ async def submit_predictions(prediction_input: PredictionInput):
         )
 
 
-@app.get("/api/predictions/{userName}")
-async def get_user_predictions(userName: str):
-    """Get predictions for a specific user"""
-    # Validate userName
-    if userName not in PLAYERS:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid userName. Must be one of: {', '.join(PLAYERS)}"
-        )
-    
-    prediction = db.get_prediction(userName)
+@app.get("/api/predictions/consensus", dependencies=[Depends(admission("reveal"))])
+async def get_consensus():
+    """Crowd's best guess for the whole exchange - only after reveal date"""
+    current_date = datetime.utcnow()
+    reveal_date = settings.REVEAL_DATE
     
-    if not prediction:
+    if reveal_date is not None and current_date < reveal_date:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No predictions found for this user"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                "success": False,
+                "message": "Results cannot be revealed until December 24th",
+                "revealDate": reveal_date.isoformat() + "Z",
+                "canReveal": False
+            }
         )
     
     return {
         "success": True,
-        "data": {
-            "id": prediction.id,
-            "userName": prediction.userName,
-            "predictions": prediction.predictions,
-            "timestamp": prediction.timestamp.isoformat() + "Z"
-        }
+        "data": await to_db_thread(db.get_consensus)
     }
 
 
-@app.get("/api/predictions/status")
+@app.get("/api/predictions/status", dependencies=[Depends(admission("read"))])
 async def get_participants_status():
     """Get status of all participants"""
-    status_list = db.get_participants_status()
+    status_list = await to_db_thread(db.get_participants_status)
     submitted_count = sum(1 for s in status_list if s["hasSubmitted"])
     
     # Format timestamps
@@ -125,13 +274,41 @@ async def get_participants_status():
     }
 
 
-@app.get("/api/predictions/all")
-async def get_all_predictions():
-    """Get all predictions - only allowed after reveal date"""
+def stream_predictions_ndjson():
+    """One JSON line per prediction, emitted as soon as it is decoded"""
+    for prediction in db.iter_predictions():
+        yield json.dumps(prediction_row(prediction), ensure_ascii=False) + "\n"
+
+
+async def coalesced_read(key: str, function):
+    """Run an expensive read once for all concurrent requests of the same key"""
+    try:
+        return await single_flight.do(key, function)
+    except TimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail={"success": False, "message": str(e)}
+        )
+
+
+def frozen_response(request: Request, snapshot: RevealSnapshot, body: bytes) -> Response:
+    """Response served from the reveal snapshot (304 if the client has this version)"""
+    if matches_etag(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=snapshot.headers())
+    return Response(body, media_type="application/json", headers=snapshot.headers())
+
+
+@app.get("/api/predictions/all", dependencies=[Depends(admission("reveal"))])
+async def get_all_predictions(request: Request, stream: bool = False):
+    """Get all predictions - only allowed after reveal date
+    
+    With ?stream=true or Accept: application/x-ndjson the predictions are
+    streamed as NDJSON, one prediction per line.
+    """
     current_date = datetime.utcnow()
     reveal_date = settings.REVEAL_DATE
     
-    if current_date < reveal_date:
+    if reveal_date is not None and current_date < reveal_date:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail={
@@ -142,41 +319,126 @@ async def get_all_predictions():
             }
         )
     
-    predictions = db.get_all_predictions()
-    
-    predictions_list = []
-    for user_name, prediction in predictions.items():
-        predictions_list.append({
-            "userName": prediction.userName,
-            "predictions": prediction.predictions,
-            "timestamp": prediction.timestamp.isoformat() + "Z"
-        })
+    ndjson = stream or "application/x-ndjson" in request.headers.get("accept", "")
+    snapshot = reveal.current
+    if snapshot is not None:
+        if ndjson:
+            return StreamingResponse(
+                snapshot.iter_predictions_ndjson(), media_type="application/x-ndjson", headers=snapshot.headers()
+            )
+        return frozen_response(request, snapshot, snapshot.predictions_body)
+    
+    if ndjson:
+        return StreamingResponse(stream_predictions_ndjson(), media_type="application/x-ndjson")
+    
+    predictions_list = await coalesced_read(
+        "predictions",
+        lambda: [prediction_row(prediction) for prediction in db.get_all_predictions().values()]
+    )
     
     return {
         "success": True,
         "canReveal": True,
-        "revealDate": reveal_date.isoformat() + "Z",
+        "revealDate": reveal_date.isoformat() + "Z" if reveal_date else None,
         "data": predictions_list
     }
 
 
-@app.post("/api/admin/set-correct-answers")
+@app.post("/api/predictions/what-if", dependencies=[Depends(admission("reveal"))])
+async def get_what_if(what_if_input: WhatIfInput):
+    """Best possible score and chance of winning for every player - only after reveal date"""
+    current_date = datetime.utcnow()
+    reveal_date = settings.REVEAL_DATE
+    
+    if reveal_date is not None and current_date < reveal_date:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                "success": False,
+                "message": "Results cannot be revealed until December 24th",
+                "revealDate": reveal_date.isoformat() + "Z",
+                "canReveal": False
+            }
+        )
+    
+    predictions = await to_db_thread(db.get_all_predictions)
+    
+    try:
+        result = await asyncio.to_thread(  # computation only, no DB calls
+            what_if,
+            what_if_input.revealed,
+            {user_name: p.predictions for user_name, p in predictions.items()},
+            AMIGOS_INVISIBLES
+        )
+    except WhatIfError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return {
+        "success": True,
+        "data": result
+    }
+
+
+@app.get("/api/predictions/{userName}", dependencies=[Depends(admission("read"))])
+async def get_user_predictions(userName: str):
+    """Get predictions for a specific user"""
+    # Validate userName
+    if userName not in PLAYERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid userName. Must be one of: {', '.join(PLAYERS)}"
+        )
+    
+    prediction = await to_db_thread(db.get_prediction, userName)
+    
+    if not prediction:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No predictions found for this user"
+        )
+    
+    return {
+        "success": True,
+        "data": {
+            "id": prediction.id,
+            "userName": prediction.userName,
+            "predictions": prediction.predictions,
+            "timestamp": prediction.timestamp.isoformat() + "Z"
+        }
+    }
+
+
+@app.post("/api/admin/set-correct-answers", dependencies=[Depends(admission("admin"))])
 async def set_correct_answers(answers_input: AnswersInput):
-    """Set correct answers - admin only"""
+    """Set correct answers - admin only
+    
+    If the game is already finalized, the final results are frozen again
+    with the new answers.
+    """
     try:
         correct_answers = CorrectAnswers(
             answers=answers_input.answers,
             revealDate=settings.REVEAL_DATE
         )
         
-        saved_answers = db.save_correct_answers(correct_answers)
+        saved_answers = await to_db_thread(db.save_correct_answers, correct_answers)
+        
+        if await to_db_thread(reveal.refreeze):
+            channel.publish("reveal")
+        
+        # Stored scores are now stale: recompute them in the background
+        job = await jobs.enqueue_rescore("correct_answers")
         
         return {
             "success": True,
             "message": "Correct answers saved successfully",
             "data": {
                 "answers": saved_answers.answers,
-                "updatedAt": saved_answers.updatedAt.isoformat() + "Z"
+                "updatedAt": saved_answers.updatedAt.isoformat() + "Z",
+                "jobId": job['id']
             }
         }
     except ValueError as e:
@@ -186,13 +448,13 @@ async def set_correct_answers(answers_input: AnswersInput):
         )
 
 
-@app.get("/api/scores")
-async def get_scores():
+@app.get("/api/scores", dependencies=[Depends(admission("reveal"))])
+async def get_scores(request: Request):
     """Get scores for all participants - only after reveal date"""
     current_date = datetime.utcnow()
     reveal_date = settings.REVEAL_DATE
     
-    if current_date < reveal_date:
+    if reveal_date is not None and current_date < reveal_date:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail={
@@ -202,7 +464,11 @@ async def get_scores():
             }
         )
     
-    correct_answers = db.get_correct_answers()
+    snapshot = reveal.current
+    if snapshot is not None:
+        return frozen_response(request, snapshot, snapshot.scores_body)
+    
+    correct_answers = await to_db_thread(db.get_correct_answers)
     
     if not correct_answers:
         raise HTTPException(
@@ -214,7 +480,7 @@ async def get_scores():
             }
         )
     
-    scores = db.calculate_scores()
+    scores = await coalesced_read("scores", db.calculate_scores)
     
     return {
         "success": True,
@@ -224,9 +490,9 @@ async def get_scores():
     }
 
 
-@app.get("/api/quiz/questions/{userName}")
-async def get_quiz_questions(userName: str):
-    """Get quiz questions for a user (only unanswered ones)"""
+@app.get("/api/quiz/questions/{userName}", dependencies=[Depends(admission("read"))])
+async def get_quiz_questions(userName: str, limit: Optional[int] = Query(None, ge=1)):
+    """Get quiz questions for a user (only unanswered ones, from the user's subset of the bank)"""
     # Validate userName
     if userName not in PLAYERS:
         raise HTTPException(
@@ -234,18 +500,13 @@ async def get_quiz_questions(userName: str):
             detail=f"Invalid userName. Must be one of: {', '.join(PLAYERS)}"
         )
     
-    # Get user's already answered questions
-    answered_questions = db.get_user_quiz_answers(userName)
-    answered_ids = {answer.questionId for answer in answered_questions}
+    # Bitmap of the user's already answered question ordinals
+    bank = QuizQuestions.bank
+    answered = await to_db_thread(db.get_answered_bitmap, userName)
     
-    # Get all questions without correct answers
-    all_questions = QuizQuestions.get_questions_for_user()
-    
-    # Return only unanswered questions
-    questions_data = [
-        q for q in all_questions
-        if q["id"] not in answered_ids
-    ]
+    # Return only unanswered questions, up to limit
+    ordinals = unanswered(bank.user_ordinals(userName, settings.QUIZ_QUESTIONS_PER_USER), answered)
+    questions_data = [bank.user_views[ordinal] for ordinal in islice(ordinals, limit)]
     
     return {
         "success": True,
@@ -253,7 +514,7 @@ async def get_quiz_questions(userName: str):
     }
 
 
-@app.post("/api/quiz/answer", status_code=status.HTTP_201_CREATED)
+@app.post("/api/quiz/answer", status_code=status.HTTP_201_CREATED, dependencies=[Depends(admission("quiz_answer"))])
 async def submit_quiz_answer(answer_input: QuizAnswerInput):
     """Submit a quiz answer"""
     # Get the correct answer for this question
@@ -265,6 +526,15 @@ async def submit_quiz_answer(answer_input: QuizAnswerInput):
             detail="Question not found"
         )
     
+    # Only the questions /api/quiz/questions/{userName} serves the user can be answered
+    if not QuizQuestions.bank.is_assigned(
+        answer_input.userName, answer_input.questionId, settings.QUIZ_QUESTIONS_PER_USER
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Question {answer_input.questionId} is not one of {answer_input.userName}'s questions"
+        )
+    
     # Check if answer is correct
     is_correct = answer_input.answer == correct_answer
     
@@ -277,8 +547,11 @@ async def submit_quiz_answer(answer_input: QuizAnswerInput):
     )
     
     try:
-        # Save to database
-        saved_answer = db.save_quiz_answer(quiz_answer)
+        # Save to database (batched with concurrent answers in group commit mode)
+        if quiz_committer:
+            saved_answer = await quiz_committer.submit(quiz_answer)
+        else:
+            saved_answer = await to_db_thread(db.save_quiz_answer, quiz_answer)
         
         return {
             "success": True,
@@ -294,7 +567,7 @@ async def submit_quiz_answer(answer_input: QuizAnswerInput):
         )
 
 
-@app.get("/api/quiz/score/{userName}")
+@app.get("/api/quiz/score/{userName}", dependencies=[Depends(admission("read"))])
 async def get_user_quiz_score(userName: str):
     """Get quiz score for a specific user"""
     # Validate userName
@@ -305,7 +578,7 @@ async def get_user_quiz_score(userName: str):
         )
     
     # Get user's answers
-    answers = db.get_user_quiz_answers(userName)
+    answers = await to_db_thread(db.get_user_quiz_answers, userName)
     
     if not answers:
         return {
@@ -351,7 +624,7 @@ async def get_user_quiz_score(userName: str):
     }
 
 
-@app.post("/api/admin/quiz-answers")
+@app.post("/api/admin/quiz-answers", dependencies=[Depends(admission("admin"))])
 async def set_quiz_correct_answers(answers_input: QuizCorrectAnswersInput):
     """Set correct quiz answers - admin only"""
     try:
@@ -359,14 +632,18 @@ async def set_quiz_correct_answers(answers_input: QuizCorrectAnswersInput):
             answers=answers_input.answers
         )
         
-        saved_answers = db.save_quiz_correct_answers(correct_answers)
+        saved_answers = await to_db_thread(db.save_quiz_correct_answers, correct_answers)
+        
+        # Stored scores are now stale: recompute them in the background
+        job = await jobs.enqueue_rescore("quiz_correct_answers")
         
         return {
             "success": True,
             "message": "Quiz correct answers saved successfully",
             "data": {
                 "answers": saved_answers.answers,
-                "updatedAt": saved_answers.updatedAt.isoformat() + "Z"
+                "updatedAt": saved_answers.updatedAt.isoformat() + "Z",
+                "jobId": job['id']
             }
         }
     except ValueError as e:
@@ -386,7 +663,7 @@ async def get_admin_quiz_questions():
     }
 
 
-@app.get("/api/combined-score/{userName}")
+@app.get("/api/combined-score/{userName}", dependencies=[Depends(admission("read"))])
 async def get_combined_score(userName: str):
     """Get combined score (quiz + predictions) for a user"""
     # Validate userName
@@ -396,129 +673,250 @@ async def get_combined_score(userName: str):
             detail=f"Invalid userName. Must be one of: {', '.join(PLAYERS)}"
         )
     
-    # Check if admin has set correct answers
-    quiz_correct_answers = db.get_quiz_correct_answers()
-    predictions_correct_answers = db.get_correct_answers()
+    # Admin answers and the user's stored score fields (one point read), concurrently
+    quiz_correct_answers, predictions_correct_answers, scores = await gather_reads(
+        db.get_quiz_correct_answers,
+        db.get_correct_answers,
+        lambda: db.get_user_score(userName)
+    )
     has_admin_answers = quiz_correct_answers is not None and predictions_correct_answers is not None
     
-    # Get user's quiz answers
-    quiz_answers = db.get_user_quiz_answers(userName)
-    quiz_correct = 0
-    quiz_total = len(quiz_answers)
-    
-    if has_admin_answers and quiz_correct_answers:
-        for answer in quiz_answers:
-            if quiz_correct_answers.answers.get(answer.questionId) == answer.answer:
-                quiz_correct += 1
-    
-    # Get user's predictions
-    user_prediction = db.get_prediction(userName)
-    predictions_correct = 0
-    predictions_total = 0
-    
-    if user_prediction:
-        predictions_total = len(user_prediction.predictions)
-        if has_admin_answers and predictions_correct_answers:
-            for giver, receiver in user_prediction.predictions.items():
-                if predictions_correct_answers.answers.get(giver) == receiver:
-                    predictions_correct += 1
-    
-    # Calculate totals with weighted scoring
-    # Predictions: 10 points each
-    # Quiz questions: 1 point each
-    prediction_points = predictions_correct * 10
-    quiz_points = quiz_correct * 1
-    total_points = prediction_points + quiz_points
-    
-    max_prediction_points = predictions_total * 10
-    max_quiz_points = quiz_total * 1
-    max_total_points = max_prediction_points + max_quiz_points
-    
-    score = round((total_points / max_total_points) * 100, 2) if max_total_points > 0 else 0.0
+    scores = scores or {
+        "userName": userName,
+        "quizCorrect": 0,
+        "quizTotal": 0,
+        "predictionsCorrect": 0,
+        "predictionsTotal": 0,
+        "totalPoints": 0,
+        "maxTotalPoints": 0,
+        "score": 0.0
+    }
+    if not has_admin_answers:
+        # Answers only count once both answer sets have been published
+        scores.update(quizCorrect=0, predictionsCorrect=0, totalPoints=0, score=0.0)
     
     return {
         "success": True,
         "data": {
             "userName": userName,
-            "quizCorrect": quiz_correct,
-            "quizTotal": quiz_total,
-            "predictionsCorrect": predictions_correct,
-            "predictionsTotal": predictions_total,
-            "totalPoints": total_points,
-            "maxTotalPoints": max_total_points,
-            "score": score,
+            "quizCorrect": scores['quizCorrect'],
+            "quizTotal": scores['quizTotal'],
+            "predictionsCorrect": scores['predictionsCorrect'],
+            "predictionsTotal": scores['predictionsTotal'],
+            "totalPoints": scores['totalPoints'],
+            "maxTotalPoints": scores['maxTotalPoints'],
+            "score": scores['score'],
             "hasAdminAnswers": has_admin_answers
         }
     }
 
 
-@app.get("/api/scoreboard")
+@app.get("/api/scoreboard", dependencies=[Depends(admission("scoreboard"))])
 async def get_scoreboard():
     """Get scoreboard with all users ordered by score"""
-    # Check if admin has set correct answers
-    quiz_correct_answers = db.get_quiz_correct_answers()
-    predictions_correct_answers = db.get_correct_answers()
+    # Admin answers and the stored score fields (already ordered by score), concurrently;
+    # the scoreboard query is shared with concurrent scoreboard requests
+    (quiz_correct_answers, predictions_correct_answers), scoreboard = await asyncio.gather(
+        gather_reads(db.get_quiz_correct_answers, db.get_correct_answers),
+        coalesced_read("scoreboard", db.get_scoreboard)
+    )
     has_admin_answers = quiz_correct_answers is not None or predictions_correct_answers is not None
     
-    # Get all users who have submitted
-    predictions = db.get_all_predictions()
-    scoreboard = []
+    return {
+        "success": True,
+        "hasAdminAnswers": has_admin_answers,
+        "data": scoreboard
+    }
+
+
+@app.websocket("/ws/quiz/{userName}")
+async def live_quiz_socket(websocket: WebSocket, userName: str):
+    """Live quiz channel: questions are pushed, answers are sent back on the same socket"""
+    if userName not in PLAYERS:
+        await websocket.close(code=1008)
+        return
+    await live_quiz.connect(userName, websocket)
+
+
+@app.post("/api/admin/live-quiz/start", dependencies=[Depends(admission("admin"))])
+async def start_live_quiz(round_input: Optional[LiveQuizStartInput] = None):
+    """Start a live quiz round for all connected players - admin only
     
-    for user_name in predictions.keys():
-        # Get quiz answers
-        quiz_answers = db.get_user_quiz_answers(user_name)
-        quiz_correct = 0
-        quiz_total = len(quiz_answers)
-        
-        if has_admin_answers and quiz_correct_answers:
-            for answer in quiz_answers:
-                if quiz_correct_answers.answers.get(answer.questionId) == answer.answer:
-                    quiz_correct += 1
-        
-        # Get predictions
-        user_prediction = predictions[user_name]
-        predictions_correct = 0
-        predictions_total = len(user_prediction.predictions)
-        
-        if has_admin_answers and predictions_correct_answers:
-            for giver, receiver in user_prediction.predictions.items():
-                if predictions_correct_answers.answers.get(giver) == receiver:
-                    predictions_correct += 1
-        
-        # Calculate totals with weighted scoring
-        # Predictions: 10 points each
-        # Quiz questions: 1 point each
-        prediction_points = predictions_correct * 10
-        quiz_points = quiz_correct * 1
-        total_points = prediction_points + quiz_points
-        
-        max_prediction_points = predictions_total * 10
-        max_quiz_points = quiz_total * 1
-        max_total_points = max_prediction_points + max_quiz_points
-        
-        score = round((total_points / max_total_points) * 100, 2) if max_total_points > 0 else 0.0
-        
-        scoreboard.append({
-            "userName": user_name,
-            "quizCorrect": quiz_correct,
-            "quizTotal": quiz_total,
-            "predictionsCorrect": predictions_correct,
-            "predictionsTotal": predictions_total,
-            "totalPoints": total_points,
-            "maxTotalPoints": max_total_points,
-            "score": score
-        })
+    The round asks round_input.questionIds, or round_input.count random
+    questions of the bank (LIVE_QUIZ_QUESTIONS without a body).
+    """
+    if live_quiz.running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A live quiz round is already running"
+        )
     
-    # Sort by score descending, then by total points as tiebreaker
-    scoreboard.sort(key=lambda x: (x['score'], x['totalPoints']), reverse=True)
+    round_input = round_input or LiveQuizStartInput()
+    try:
+        question_ids = select_questions(round_input.questionIds, round_input.count)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"success": False, "message": str(e)}
+        )
+    
+    started_at = next_start_time()
+    await to_db_thread(db.save_live_quiz_round, started_at, question_ids)
+    channel.publish("live_quiz")
+    live_quiz.start(started_at, question_ids)
     
     return {
         "success": True,
-        "hasAdminAnswers": has_admin_answers,
-        "data": scoreboard
+        "message": "Live quiz round started",
+        "data": {
+            "startedAt": datetime.utcfromtimestamp(started_at).isoformat() + "Z",
+            "questionIds": question_ids,
+            "connectedPlayers": sorted(live_quiz.connections)
+        }
+    }
+
+
+@app.get("/api/admin/live-quiz")
+async def get_live_quiz_status():
+    """Get the state of the live quiz round - admin only"""
+    return {
+        "success": True,
+        "data": live_quiz.status()
+    }
+
+
+@app.get("/api/admin/snapshot", dependencies=[Depends(require_admin_secret), Depends(admission("admin"))])
+async def export_snapshot():
+    """Download the game data as a gzip-compressed NDJSON snapshot - requires X-Admin-Secret
+
+    The snapshot includes the correct answers, so it is never served without it.
+    """
+    filename = f"snapshot-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.ndjson.gz"
+    return StreamingResponse(
+        iter_snapshot_chunks(iter_documents(db.container)),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.post("/api/admin/reveal/finalize", dependencies=[Depends(admission("admin"))])
+async def finalize_reveal():
+    """Freeze the final predictions and scores now - admin only"""
+    try:
+        snapshot = await to_db_thread(reveal.finalize)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"success": False, "message": str(e)}
+        )
+    channel.publish("reveal")
+    return {
+        "success": True,
+        "message": "Game finalized",
+        "data": snapshot.summary()
+    }
+
+
+@app.post("/api/admin/reveal/reopen", dependencies=[Depends(admission("admin"))])
+async def reopen_reveal():
+    """Discard the frozen results so predictions and answers can change again - admin only"""
+    await to_db_thread(reveal.reopen)
+    channel.publish("reveal")
+    return {
+        "success": True,
+        "message": "Game reopened: results will be recomputed when it is finalized again"
+    }
+
+
+@app.get("/api/admin/jobs", dependencies=[Depends(admission("admin"))])
+async def get_jobs():
+    """Get the most recent background jobs - admin only"""
+    return {
+        "success": True,
+        "data": await jobs.recent()
+    }
+
+
+@app.get("/api/admin/jobs/{jobId}", dependencies=[Depends(admission("admin"))])
+async def get_job(jobId: str):
+    """Get the status and progress of a background job - admin only"""
+    job = await jobs.get(jobId)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"success": False, "message": f"Job {jobId} not found"}
+        )
+    return {
+        "success": True,
+        "data": job
+    }
+
+
+@app.post("/api/admin/jobs/{jobId}/cancel", dependencies=[Depends(admission("admin"))])
+async def cancel_job(jobId: str):
+    """Cancel a running background job - admin only"""
+    try:
+        job = await jobs.cancel(jobId)
+    except LookupError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"success": False, "message": str(e)}
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"success": False, "message": str(e)}
+        )
+    return {
+        "success": True,
+        "message": "Job cancellation requested",
+        "data": job
     }
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """In-process service metrics"""
+    return {
+        "success": True,
+        "data": metrics.snapshot()
+    }
+
+
+@app.get("/api/debug/allocations", dependencies=[Depends(require_admin_secret)])
+async def get_allocations(route: Optional[str] = None):
+    """Memory allocated by sampled requests, per route, with the top allocation sites - requires X-Admin-Secret"""
+    return {
+        "success": True,
+        "sampleRate": allocation_profiler.sample_rate,
+        "data": allocation_profiler.report(route)
+    }
+
+
+@app.get("/api/debug/profiles", dependencies=[Depends(require_admin_secret)])
+async def get_profiles():
+    """Recently profiled requests, newest first - requires X-Admin-Secret"""
+    return {
+        "success": True,
+        "data": profiles.recent()
+    }
+
+
+@app.get("/api/debug/profiles/{requestId}", dependencies=[Depends(require_admin_secret)])
+async def get_profile(requestId: str):
+    """Stack samples of a profiled request, in folded format for flame graphs - requires X-Admin-Secret"""
+    profile = profiles.get(requestId)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"success": False, "message": f"No profile for request {requestId}"}
+        )
+    return PlainTextResponse(
+        profile.folded(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{requestId}.folded"'}
+    )
+
+
 @app.get("/api/version")
 async def get_version():
     """Get backend version information"""
@@ -0,0 +1,37 @@
+"""
+In-process metrics exposed through GET /api/metrics
+Counters are incremented by the request path; other modules can register
+a source callable that is evaluated whenever a snapshot is taken.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Callable, Dict
+
+
+class Metrics:
+    """Thread-safe counters plus pluggable metric sources"""
+
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(int)
+        self._sources: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def register(self, name: str, source: Callable[[], dict]):
+        """Add a group of metrics computed on demand"""
+        self._sources[name] = source
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            data = {"counters": dict(self._counters)}
+        for name, source in self._sources.items():
+            data[name] = source()
+        return data
+
+
+# Global metrics registry
+metrics = Metrics()
@@ -0,0 +1,110 @@
+"""
+Apply the indexing policy to an existing container
+Containers created before cosmos.INDEXING_POLICY existed still index every
+path. This replaces their policy in place (Cosmos DB re-indexes online,
+the container stays available) and measures the RU charge of a typical
+user_submission write before and after. It also turns on time to live
+(cosmos.DEFAULT_TTL), which expires idempotency records.
+
+Usage:
+    python migrate_indexing.py [--samples 20] [--no-wait]
+"""
+
+import argparse
+import time
+from datetime import datetime
+from typing import Optional
+
+from cosmos import DEFAULT_TTL, INDEXING_POLICY, PARTITION_KEY, connect_database
+from config import settings
+from models import AMIGOS_INVISIBLES, QuizAnswerData, UserSubmission
+from quiz_questions import QuizQuestions
+from schema import SubmissionCodec
+from scoring import quiz_counts, score_fields, score_key
+
+# Probe documents live in their own partition so no query ever sees them
+PROBE_TYPE = "ru_probe"
+
+
+def _request_charge(container) -> float:
+    return float(container.client_connection.last_response_headers.get("x-ms-request-charge", 0))
+
+
+def probe_document(codec: SubmissionCodec, i: int) -> dict:
+    """A fully filled in user_submission, as the app would write it"""
+    now = datetime.utcnow()
+    submission = UserSubmission(
+        userName=f"probe_{i}",
+        predictions={
+            giver: AMIGOS_INVISIBLES[(n + 1 + i) % len(AMIGOS_INVISIBLES)]
+            for n, giver in enumerate(AMIGOS_INVISIBLES)
+        },
+        quizAnswers=[
+            QuizAnswerData(questionId=q.id, answer=q.options[i % len(q.options)], timestamp=now)
+            for q in QuizQuestions.get_all_questions()
+        ],
+        timestamp=now,
+        createdAt=now,
+        updatedAt=now
+    )
+    doc = codec.encode(submission)
+    doc.update(score_fields(submission.predictions, None, *quiz_counts(submission.quizAnswers, None)))
+    doc['scoreKey'] = score_key(None, None)
+    doc['id'] = f"{PROBE_TYPE}_{i}"
+    doc['type'] = PROBE_TYPE
+    return doc
+
+
+def measure_write_ru(container, samples: int) -> float:
+    """Average RU charge of upserting a user_submission-shaped document"""
+    codec = SubmissionCodec(container)
+    charges = []
+    for i in range(samples):
+        container.upsert_item(probe_document(codec, i))
+        charges.append(_request_charge(container))
+    for i in range(samples):
+        container.delete_item(item=f"{PROBE_TYPE}_{i}", partition_key=PROBE_TYPE)
+    return sum(charges) / len(charges)
+
+
+def index_transformation_progress(container) -> Optional[int]:
+    """Percentage of the re-indexing done after a policy change"""
+    container.read(populate_quota_info=True)
+    progress = container.client_connection.last_response_headers.get(
+        "x-ms-documentdb-collection-index-transformation-progress"
+    )
+    return int(progress) if progress is not None else None
+
+
+def migrate(samples: int, wait: bool):
+    database = connect_database()
+    container = database.get_container_client(settings.COSMOS_CONTAINER)
+
+    before = measure_write_ru(container, samples)
+    print(f"📏 Write RU before: {before:.2f}")
+
+    database.replace_container(
+        container, partition_key=PARTITION_KEY, indexing_policy=INDEXING_POLICY, default_ttl=DEFAULT_TTL
+    )
+    print("🔧 Indexing policy replaced, re-indexing online")
+
+    if not wait:
+        return
+    while True:
+        progress = index_transformation_progress(container)
+        print(f"   re-indexing: {progress if progress is not None else '?'}%")
+        if progress is None or progress >= 100:
+            break
+        time.sleep(5)
+
+    after = measure_write_ru(container, samples)
+    saved = (1 - after / before) * 100 if before else 0.0
+    print(f"📏 Write RU after: {after:.2f} ({saved:.0f}% less per write)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the indexing policy to the existing container")
+    parser.add_argument("--samples", type=int, default=20, help="writes used to measure the RU charge")
+    parser.add_argument("--no-wait", action="store_true", help="don't wait for re-indexing or measure after")
+    args = parser.parse_args()
+    migrate(args.samples, not args.no_wait)
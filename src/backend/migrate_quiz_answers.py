@@ -0,0 +1,35 @@
+"""
+Move quiz answers embedded in user_submission documents into the answer ledger
+Submissions from before the ledger keep their quiz answers embedded. Servers
+read them from there and move a user's answers the next time that user
+answers; this moves all the others at once. It scans every submission, so
+it runs once, not on server startup: it records a marker when it is done,
+and is skipped when run again unless --force is given (after restoring an
+old snapshot, say). Moves are idempotent, so it is safe while the game is
+live.
+
+Usage:
+    python migrate_quiz_answers.py [--force]
+"""
+
+import argparse
+
+from database import QUIZ_ANSWER_LEDGER_MIGRATION, db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move embedded quiz answers into the answer ledger")
+    parser.add_argument("--force", action="store_true", help="run even if it was run before")
+    args = parser.parse_args()
+
+    marker = db.get_migration(QUIZ_ANSWER_LEDGER_MIGRATION)
+    if marker is not None and not args.force:
+        print(f"✅ Quiz answers were moved to the ledger at {marker['completedAt']} (--force runs it again)")
+        return
+    moved = db.migrate_embedded_quiz_answers()
+    db.record_migration(QUIZ_ANSWER_LEDGER_MIGRATION, submissions=moved)
+    print(f"✅ Moved quiz answers of {moved} submissions to the answer ledger")
+
+
+if __name__ == "__main__":
+    main()
@@ -85,10 +85,31 @@ class AnswersInput(BaseModel):
         return v
 
 
+class WhatIfInput(BaseModel):
+    """Input model for the what-if engine: pairs revealed so far"""
+    revealed: Dict[str, str]
+
+    @validator('revealed')
+    def validate_revealed(cls, v):
+        for giver, receiver in v.items():
+            if giver not in AMIGOS_INVISIBLES:
+                raise ValueError(f'Invalid giver: {giver}')
+            if receiver not in AMIGOS_INVISIBLES:
+                raise ValueError(f'Invalid receiver: {receiver}')
+            if giver == receiver:
+                raise ValueError(f'{giver} cannot give to themselves')
+        
+        # Each receiver gets exactly one gift
+        if len(set(v.values())) != len(v):
+            raise ValueError('Each receiver can only be revealed once')
+        
+        return v
+
+
 class CorrectAnswers(BaseModel):
     """Correct answers object"""
     answers: Dict[str, str]
-    revealDate: datetime
+    revealDate: Optional[datetime] = None
     updatedAt: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -163,6 +184,18 @@ class UserQuizScore(BaseModel):
     answers: List[QuizAnswer]
 
 
+class LiveQuizStartInput(BaseModel):
+    """Questions of a live quiz round: these ids, or count random questions of the bank"""
+    questionIds: Optional[List[str]] = None
+    count: Optional[int] = None
+
+    @validator('count')
+    def validate_count(cls, v):
+        if v is not None and v < 1:
+            raise ValueError('count must be at least 1')
+        return v
+
+
 class QuizCorrectAnswersInput(BaseModel):
     """Input model for setting correct quiz answers"""
     answers: Dict[str, str]  # questionId -> correctAnswer
@@ -0,0 +1,252 @@
+"""
+Sampling profiler for slow requests
+A background thread samples the Python stacks of every other thread every
+PROFILER_INTERVAL_MS, for the requests being recorded:
+
+- requests with a valid X-Debug-Profile header, from their start
+- any other request once it has run for SLOW_REQUEST_PROFILE_MS; it is
+  kept as a slow profile (starting at the threshold) when it ends
+
+Requests finishing under the threshold are never sampled.
+
+Kept profiles go into a bounded ring buffer. Each one holds stacks in the
+folded format ("thread;outer;...;inner count" per line), which flamegraph.pl
+and speedscope read directly. Profiles are downloaded by request id from
+GET /api/debug/profiles/{requestId} (X-Admin-Secret required). The id is
+generated here and returned in the X-Request-ID response header; a
+client's own X-Request-ID is only kept as clientRequestId.
+
+X-Debug-Profile is "<unix time>.<hex HMAC-SHA256 of '<unix time>.<METHOD> <path>'>"
+keyed with ADMIN_SECRET, valid for a few minutes (see sign_profile_request).
+
+Samples are taken from all threads, so requests running at the same time
+share each other's samples.
+"""
+
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from metrics import metrics
+
+REQUEST_ID_HEADER = b"x-request-id"
+DEBUG_PROFILE_HEADER = b"x-debug-profile"
+
+# How long a signed debug header stays valid
+SIGNATURE_MAX_AGE_SECONDS = 300
+
+# Leaf frames of threads that are waiting rather than working
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),  # idle ThreadPoolExecutor worker
+}
+
+
+def sign_profile_request(secret: str, method: str, path: str, timestamp: Optional[int] = None) -> str:
+    """X-Debug-Profile header value that asks for a request to be profiled"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    message = f"{timestamp}.{method.upper()} {path}".encode("utf-8")
+    return f"{timestamp}.{hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()}"
+
+
+def verify_profile_request(secret: str, method: str, path: str, header: str) -> bool:
+    if not secret or "." not in header:
+        return False
+    timestamp, _ = header.split(".", 1)
+    if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > SIGNATURE_MAX_AGE_SECONDS:
+        return False
+    return hmac.compare_digest(header, sign_profile_request(secret, method, path, int(timestamp)))
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples all thread stacks while at least one request is being recorded"""
+
+    def __init__(self, interval_ms: float, max_samples: int):
+        self.interval = interval_ms / 1000
+        self.max_samples = max_samples
+        self._recordings: Dict[str, list] = {}  # request id -> [Counter of folded stacks, samples, start time]
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self, request_id: str, delay: float = 0.0):
+        """Record request_id's samples, starting delay seconds from now"""
+        with self._lock:
+            self._recordings[request_id] = [Counter(), 0, time.monotonic() + delay]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+
+    def end(self, request_id: str) -> Counter:
+        with self._lock:
+            stacks, *_ = self._recordings.pop(request_id, (Counter(),))
+        return stacks
+
+    def _run(self):
+        while True:
+            with self._lock:
+                # Sleep until the earliest recording starts (or a new one is added)
+                starts = [recording[2] for recording in self._recordings.values()]
+                wait = max(0.0, min(starts) - time.monotonic()) if starts else None
+                if wait != 0:
+                    self._wake.clear()
+            if wait != 0:
+                self._wake.wait(wait)
+                continue
+
+            time.sleep(self.interval)
+            stacks = self._sample()
+            with self._lock:
+                now = time.monotonic()
+                for recording in self._recordings.values():
+                    if recording[2] <= now and recording[1] < self.max_samples:
+                        recording[0].update(stacks)
+                        recording[1] += 1
+
+    def _sample(self) -> List[str]:
+        """One folded stack per busy thread"""
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own or (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_LEAVES:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(_frame_name(frame))
+                frame = frame.f_back
+            frames.append(names.get(ident, f"thread-{ident}"))
+            stacks.append(";".join(reversed(frames)))
+        return stacks
+
+
+class Profile:
+    """Stack samples of one profiled request"""
+
+    def __init__(self, request_id: str, route: str, duration_ms: float, status: Optional[int],
+                 trigger: str, stacks: Counter, client_request_id: Optional[str] = None):
+        self.request_id = request_id
+        self.client_request_id = client_request_id
+        self.route = route
+        self.duration_ms = duration_ms
+        self.status = status
+        self.trigger = trigger
+        self.stacks = stacks
+        self.captured_at = datetime.utcnow().isoformat() + "Z"
+
+    def summary(self) -> dict:
+        return {
+            "requestId": self.request_id,
+            "clientRequestId": self.client_request_id,
+            "route": self.route,
+            "durationMs": round(self.duration_ms, 1),
+            "status": self.status,
+            "trigger": self.trigger,
+            "samples": sum(self.stacks.values()),
+            "capturedAt": self.captured_at,
+        }
+
+    def folded(self) -> str:
+        """Flame graph input: one "frame;frame;... count" line per distinct stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileBuffer:
+    """Ring buffer of the most recent profiles"""
+
+    def __init__(self, max_profiles: int):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles[profile.request_id] = profile
+            self._profiles.move_to_end(profile.request_id)
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(request_id)
+
+    def recent(self) -> List[dict]:
+        with self._lock:
+            return [profile.summary() for profile in reversed(self._profiles.values())]
+
+    def stats(self) -> dict:
+        return {"profiles": len(self._profiles), "maxProfiles": self.max_profiles}
+
+
+class ProfilerMiddleware:
+    """ASGI middleware recording slow or explicitly requested HTTP requests"""
+
+    def __init__(self, app, sampler: StackSampler, buffer: ProfileBuffer, threshold_ms: float, secret: str):
+        self.app = app
+        self.sampler = sampler
+        self.buffer = buffer
+        self.threshold_ms = threshold_ms
+        self.secret = secret
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        requested = DEBUG_PROFILE_HEADER in headers and verify_profile_request(
+            self.secret, scope["method"], scope["path"], headers[DEBUG_PROFILE_HEADER].decode("latin-1")
+        )
+        if self.threshold_ms <= 0 and not requested:
+            await self.app(scope, receive, send)
+            return
+
+        # Our own id: a client's X-Request-ID could name (and replace) someone else's profile
+        request_id = uuid.uuid4().hex
+        client_request_id = headers.get(REQUEST_ID_HEADER, b"").decode("latin-1")[:64] or None
+        response_status = None
+
+        async def send_with_request_id(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER, request_id.encode("latin-1"))
+                ])
+            await send(message)
+
+        self.sampler.begin(request_id, 0.0 if requested else self.threshold_ms / 1000)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            stacks = self.sampler.end(request_id)
+            slow = 0 < self.threshold_ms <= duration_ms
+            if requested or slow:
+                route = scope.get("route")
+                self.buffer.add(Profile(
+                    request_id,
+                    f"{scope['method']} {route.path if route is not None else scope['path']}",
+                    duration_ms,
+                    response_status,
+                    "header" if requested else "slow",
+                    stacks,
+                    client_request_id
+                ))
+                metrics.incr("profiler.captured")
@@ -1,12 +1,25 @@
 """
 Quiz questions with correct answers
-This file contains the hardcoded quiz questions and their correct answers
+The question bank is the hardcoded list below unless QUESTION_BANK_SOURCE
+points at a JSON / NDJSON file or at the quiz_question documents in the
+database. Every question has an integer ordinal (its position in the
+bank), so a user's answered questions fit in a bitmap with one bit per
+ordinal. QuestionBankLoader reloads the bank when its version changes.
 """
 
-from typing import List, Dict
+import base64
+import hashlib
+import json
+import os
+import random
+from typing import Dict, Iterable, Iterator, List, Optional
 from pydantic import BaseModel
 
 
+# Document listing the question bank stored in the database (type quiz_question)
+QUESTION_BANK_ID = "question_bank"
+
+
 class QuizQuestionData(BaseModel):
     """Quiz question with options and correct answer"""
     id: str
@@ -16,8 +29,78 @@ class QuizQuestionData(BaseModel):
     timeLimit: int  # Time limit in seconds
 
 
+class QuestionBank:
+    """Immutable set of questions indexed by id and ordinal"""
+    
+    def __init__(self, questions: Iterable[QuizQuestionData]):
+        self.questions = list(questions)
+        self.by_id = {q.id: q for q in self.questions}
+        self.ordinals = {q.id: i for i, q in enumerate(self.questions)}
+        # Without correct answers, as served to players
+        self.user_views = [
+            {
+                "id": q.id,
+                "question": q.question,
+                "options": q.options,
+                "timeLimit": q.timeLimit
+            }
+            for q in self.questions
+        ]
+        encoded = json.dumps([q.dict() for q in self.questions], ensure_ascii=False, sort_keys=True)
+        self.version = hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:12]
+    
+    def __len__(self) -> int:
+        return len(self.questions)
+    
+    def user_ordinals(self, user_name: str, size: int) -> List[int]:
+        """The user's random subset of the bank (stable per bank version); size 0 = everything"""
+        if size <= 0 or size >= len(self.questions):
+            return list(range(len(self.questions)))
+        return random.Random(f"{self.version}:{user_name}").sample(range(len(self.questions)), size)
+    
+    def is_assigned(self, user_name: str, question_id: str, size: int) -> bool:
+        """Whether a question is in the user's subset of the bank"""
+        ordinal = self.ordinals.get(question_id)
+        return ordinal is not None and ordinal in self.user_ordinals(user_name, size)
+
+
+def mark_answered(bitmap: bytearray, ordinal: int) -> bytearray:
+    """Set the bit of a question ordinal, growing the bitmap as needed"""
+    index = ordinal >> 3
+    if index >= len(bitmap):
+        bitmap.extend(bytes(index + 1 - len(bitmap)))
+    bitmap[index] |= 1 << (ordinal & 7)
+    return bitmap
+
+
+def answered_bitmap(ordinals: Iterable[int]) -> bytearray:
+    """Bitmap with the bit of every answered question ordinal set"""
+    bitmap = bytearray()
+    for ordinal in ordinals:
+        mark_answered(bitmap, ordinal)
+    return bitmap
+
+
+def is_answered(bitmap: bytes, ordinal: int) -> bool:
+    index = ordinal >> 3
+    return index < len(bitmap) and bool(bitmap[index] >> (ordinal & 7) & 1)
+
+
+def unanswered(ordinals: Iterable[int], bitmap: bytes) -> Iterator[int]:
+    """Ordinals whose bit is not set, in the given order"""
+    return (ordinal for ordinal in ordinals if not is_answered(bitmap, ordinal))
+
+
+def encode_bitmap(bitmap: bytes) -> str:
+    return base64.b64encode(bytes(bitmap)).decode("ascii")
+
+
+def decode_bitmap(value: str) -> bytes:
+    return base64.b64decode(value)
+
+
 class QuizQuestions:
-    """Hardcoded quiz questions"""
+    """Quiz questions of the current question bank"""
     
     QUESTIONS: List[QuizQuestionData] = [
         QuizQuestionData(
@@ -70,18 +153,23 @@ class QuizQuestions:
         )
     ]
     
+    # Current question bank, replaced as a whole when it is reloaded
+    bank: QuestionBank = None
+    
+    @classmethod
+    def use(cls, bank: QuestionBank):
+        """Switch to another question bank"""
+        cls.bank = bank
+    
     @classmethod
     def get_all_questions(cls) -> List[QuizQuestionData]:
         """Get all quiz questions"""
-        return cls.QUESTIONS
+        return cls.bank.questions
     
     @classmethod
     def get_question_by_id(cls, question_id: str) -> QuizQuestionData:
         """Get a specific question by ID"""
-        for question in cls.QUESTIONS:
-            if question.id == question_id:
-                return question
-        return None
+        return cls.bank.by_id.get(question_id)
     
     @classmethod
     def get_correct_answer(cls, question_id: str) -> str:
@@ -92,15 +180,7 @@ class QuizQuestions:
     @classmethod
     def get_questions_for_user(cls) -> List[Dict]:
         """Get questions without correct answers (for API response)"""
-        return [
-            {
-                "id": q.id,
-                "question": q.question,
-                "options": q.options,
-                "timeLimit": q.timeLimit
-            }
-            for q in cls.QUESTIONS
-        ]
+        return cls.bank.user_views
     
     @classmethod
     def get_questions_for_admin(cls) -> List[Dict]:
@@ -113,5 +193,55 @@ class QuizQuestions:
                 "correctAnswer": q.correctAnswer,
                 "timeLimit": q.timeLimit
             }
-            for q in cls.QUESTIONS
+            for q in cls.bank.questions
         ]
+
+
+QuizQuestions.use(QuestionBank(QuizQuestions.QUESTIONS))
+
+
+class QuestionBankLoader:
+    """Loads the question bank from its configured source and reloads it on change
+    
+    source is "builtin", "file" (JSON list or NDJSON of questions) or
+    "database" (quiz_question documents, see seed_quiz_questions.py).
+    """
+    
+    def __init__(self, source: str, path: str = "", database=None):
+        if source not in ("builtin", "file", "database"):
+            raise ValueError(f"Unknown question bank source: {source}")
+        self.source = source
+        self.path = path
+        self.database = database
+        self.marker: Optional[str] = None
+    
+    def _marker(self) -> Optional[str]:
+        """Cheap change marker of the source"""
+        if self.source == "file":
+            stat = os.stat(self.path)
+            return f"{stat.st_mtime_ns}:{stat.st_size}"
+        if self.source == "database":
+            return self.database.get_question_bank_version()
+        return "builtin"
+    
+    def _load(self) -> QuestionBank:
+        if self.source == "file":
+            from bulk_loader import read_documents
+            return QuestionBank(QuizQuestionData(**q) for q in read_documents(self.path))
+        if self.source == "database":
+            return QuestionBank(QuizQuestionData(**q) for q in self.database.get_bank_questions())
+        return QuestionBank(QuizQuestions.QUESTIONS)
+    
+    def check(self) -> bool:
+        """Reload the bank if its source changed; returns whether a new bank is in use"""
+        marker = self._marker()
+        if marker is None or marker == self.marker:
+            # Nothing stored yet (database) or nothing changed
+            return False
+        bank = self._load()
+        self.marker = marker
+        if bank.version == QuizQuestions.bank.version:
+            return False
+        QuizQuestions.use(bank)
+        print(f"📚 Question bank {bank.version} loaded: {len(bank)} questions ({self.source})")
+        return True
@@ -0,0 +1,223 @@
+"""
+Resilience layer for Cosmos DB calls
+- Throttled (429) and unavailable (503) responses are retried with jittered
+  exponential backoff that honours the x-ms-retry-after-ms header.
+- A 503 doesn't say whether the write happened. When create_item is retried
+  after one and then conflicts, the stored document is read back: if it is
+  the one we were creating, the first attempt succeeded and the create
+  returns it instead of the conflict.
+- An adaptive AIMD limiter bounds how many operations are in flight: the
+  limit grows by one per window of successful calls and halves when Cosmos
+  DB starts throttling (429). A 503 is retried, but isn't backpressure, so
+  it leaves the limit alone.
+
+ResilientContainer wraps anything with the ContainerProxy surface, so it can
+be exercised against fake_cosmos.FakeContainer with simulated throttling:
+
+    python resilience.py
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from azure.cosmos import exceptions
+
+RETRYABLE_STATUS_CODES = {429, 503}
+THROTTLED_STATUS_CODE = 429
+
+# Fields Cosmos DB adds to every stored document
+SYSTEM_FIELDS = {"_rid", "_self", "_etag", "_attachments", "_ts"}
+
+# Minimum time between two decreases, so one burst of 429s counts once
+DECREASE_COOLDOWN_SECONDS = 0.1
+
+
+class AdaptiveLimiter:
+    """Additive-increase / multiplicative-decrease concurrency limit"""
+
+    def __init__(self, initial: int, minimum: int, maximum: int, backoff_ratio: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff_ratio = backoff_ratio
+        self.inflight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.inflight >= int(self.limit):
+                self._condition.wait()
+            self.inflight += 1
+
+    def release(self, throttled: bool = False):
+        with self._condition:
+            self.inflight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._last_decrease >= DECREASE_COOLDOWN_SECONDS:
+                    self.limit = max(self.minimum, self.limit * self.backoff_ratio)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class ResilientContainer:
+    """ContainerProxy wrapper adding retries and adaptive concurrency limiting"""
+
+    def __init__(self, container, limiter: AdaptiveLimiter, max_retries: int,
+                 base_delay_ms: int, max_delay_ms: int, sleep: Callable[[float], None] = time.sleep,
+                 partition_key_field: str = "type"):
+        self.inner = container
+        self.partition_key_field = partition_key_field
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay_ms / 1000
+        self.max_delay = max_delay_ms / 1000
+        self.sleep = sleep
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Anything not wrapped (id, client_connection, ...) comes from the real container
+        return getattr(self.inner, name)
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def _delay(self, attempt: int, error: exceptions.CosmosHttpResponseError) -> float:
+        """Backoff before the next attempt, honouring the server's retry-after"""
+        retry_after_ms = (error.headers or {}).get("x-ms-retry-after-ms")
+        if retry_after_ms is not None:
+            # Small jitter so throttled callers don't all come back at once
+            return float(retry_after_ms) / 1000 + random.uniform(0, self.base_delay)
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _call(self, operation: Callable, *args, failed_statuses: Optional[list] = None, **kwargs):
+        """Run operation with retries; failed_statuses collects the status of every retried failure"""
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            throttled = False
+            try:
+                self._count(calls=1)
+                return operation(*args, **kwargs)
+            except exceptions.CosmosHttpResponseError as e:
+                if e.status_code not in RETRYABLE_STATUS_CODES:
+                    raise
+                if e.status_code == THROTTLED_STATUS_CODE:
+                    throttled = True
+                    self._count(throttled=1)
+                if failed_statuses is not None:
+                    failed_statuses.append(e.status_code)
+                if attempt >= self.max_retries:
+                    self._count(failures=1)
+                    raise
+                error = e
+            finally:
+                self.limiter.release(throttled=throttled)
+
+            self.sleep(self._delay(attempt, error))
+            attempt += 1
+            self._count(retries=1)
+
+    def read_item(self, *args, **kwargs):
+        return self._call(self.inner.read_item, *args, **kwargs)
+
+    def upsert_item(self, *args, **kwargs):
+        return self._call(self.inner.upsert_item, *args, **kwargs)
+
+    def create_item(self, body, **kwargs):
+        failed_statuses = []
+        try:
+            return self._call(self.inner.create_item, body, failed_statuses=failed_statuses, **kwargs)
+        except exceptions.CosmosResourceExistsError:
+            # An attempt that failed with 503 may have created the document after all
+            stored = self._stored_as(body) if 503 in failed_statuses else None
+            if stored is None:
+                raise
+            return stored
+
+    def _stored_as(self, body: dict) -> Optional[dict]:
+        """The stored document with body's id, if its content is body"""
+        try:
+            stored = self._call(self.inner.read_item, item=body["id"], partition_key=body.get(self.partition_key_field))
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+        return stored if {k: v for k, v in stored.items() if k not in SYSTEM_FIELDS} == body else None
+
+    def replace_item(self, *args, **kwargs):
+        return self._call(self.inner.replace_item, *args, **kwargs)
+
+    def patch_item(self, *args, **kwargs):
+        return self._call(self.inner.patch_item, *args, **kwargs)
+
+    def delete_item(self, *args, **kwargs):
+        return self._call(self.inner.delete_item, *args, **kwargs)
+
+    def query_items(self, *args, **kwargs) -> "ResilientQuery":
+        return ResilientQuery(self, self.inner.query_items(*args, **kwargs))
+
+    def stats(self) -> dict:
+        return {
+            "concurrencyLimit": round(self.limiter.limit, 2),
+            "inflight": self.limiter.inflight,
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
+
+
+class ResilientQuery:
+    """Query results fetched page by page through the resilience layer"""
+
+    def __init__(self, container: ResilientContainer, results):
+        self.container = container
+        self.results = results
+
+    def by_page(self, continuation_token: Optional[str] = None):
+        pages = (
+            self.results.by_page(continuation_token)
+            if hasattr(self.results, "by_page") else iter([self.results])
+        )
+        while True:
+            # A failed page request leaves the continuation token untouched, so it can be retried
+            page = self.container._call(next, pages, None)
+            if page is None:
+                return
+            yield list(page)
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    from fake_cosmos import FakeContainer
+
+    fake = FakeContainer(max_ops_per_second=200)
+    container = ResilientContainer(
+        fake, AdaptiveLimiter(initial=32, minimum=1, maximum=64),
+        max_retries=10, base_delay_ms=20, max_delay_ms=1000
+    )
+
+    def write(i):
+        container.upsert_item({"id": f"doc_{i}", "type": "demo", "value": i})
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=64) as pool:
+        list(pool.map(write, range(1000)))
+    print(f"1000 writes in {time.monotonic() - started:.1f}s against a 200 ops/s fake")
+    print(container.stats())
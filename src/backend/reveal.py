@@ -0,0 +1,277 @@
+"""
+Frozen reveal snapshot
+Once the reveal date has passed and the admin has set the correct answers,
+the predictions and scores are final. They are computed once, stored in
+Cosmos DB and served by every worker from memory. The reveal moment is
+exactly when every client asks for them at once.
+
+The rows are stored in chunk documents of at most MAX_CHUNK_BYTES, so a
+big game stays under the 2 MB item limit; the "reveal_snapshot" document
+names the version and its chunk count, and is written after the chunks.
+
+The URLs stay the same whatever the version, so responses carry the
+version as ETag with Cache-Control: no-cache: clients and CDNs keep them,
+and revalidate with If-None-Match (a 304 without body while unchanged).
+
+The snapshot is taken by a scheduler when the reveal date (REVEAL_DATE, if
+set) passes and the correct answers exist, or right away when an admin
+finalizes the game. While it exists, predictions can't change. Changing the correct
+answers takes a new snapshot, and an admin reopening the game discards it;
+it is then recomputed the next time the game is finalized.
+"""
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from cosmos import to_db_thread
+from fanout import map_reads
+from models import Prediction
+
+REVEAL_SNAPSHOT_ID = "reveal_snapshot"
+
+# Cached anywhere, but revalidated on every use: the same URL gets a new
+# version when the correct answers change
+REVEAL_CACHE_CONTROL = "public, no-cache"
+
+# Rows per chunk document stay well under Cosmos DB's 2 MB item limit
+MAX_CHUNK_BYTES = 512 * 1024
+
+# Tries to read a snapshot whose chunks are being replaced by a newer one
+LOAD_ATTEMPTS = 3
+
+
+def prediction_row(prediction: Prediction) -> dict:
+    """A prediction as returned by /api/predictions/all"""
+    return {
+        "userName": prediction.userName,
+        "predictions": prediction.predictions,
+        "timestamp": prediction.timestamp.isoformat() + "Z"
+    }
+
+
+def _json_body(content: dict) -> bytes:
+    # Same encoding as FastAPI's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _chunk_id(version: str, index: int) -> str:
+    return f"{REVEAL_SNAPSHOT_ID}_{version}_{index}"
+
+
+def split_chunks(doc: dict) -> List[dict]:
+    """Chunk documents holding a snapshot's predictions and scores, in order"""
+    chunks = []
+
+    def new_chunk() -> dict:
+        chunk = {
+            "id": _chunk_id(doc['version'], len(chunks)),
+            "type": "reveal",  # Partition key
+            "version": doc['version'],
+            "predictions": [],
+            "scores": [],
+        }
+        chunks.append(chunk)
+        return chunk
+
+    chunk, size = new_chunk(), 0
+    for field in ("predictions", "scores"):
+        for row in doc[field]:
+            row_size = len(_json_body(row))
+            if size and size + row_size > MAX_CHUNK_BYTES:
+                chunk, size = new_chunk(), 0
+            chunk[field].append(row)
+            size += row_size
+    return chunks
+
+
+def matches_etag(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names etag (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class RevealSnapshot:
+    """Final predictions and scores, with the response bodies rendered once"""
+
+    def __init__(self, doc: dict):
+        self.version = doc['version']
+        self.finalized_at = doc['finalizedAt']
+        self.reveal_date = doc['revealDate']
+        self.predictions = doc['predictions']
+        self.scores = doc['scores']
+        self.etag = f'"{self.version}"'
+        self.predictions_body = _json_body({
+            "success": True,
+            "canReveal": True,
+            "revealDate": self.reveal_date,
+            "data": self.predictions
+        })
+        self.scores_body = _json_body({
+            "success": True,
+            "canReveal": True,
+            "hasCorrectAnswers": True,
+            "data": self.scores
+        })
+
+    def iter_predictions_ndjson(self) -> Iterator[str]:
+        for row in self.predictions:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+
+    def headers(self) -> dict:
+        return {"Cache-Control": REVEAL_CACHE_CONTROL, "ETag": self.etag}
+
+    def summary(self) -> dict:
+        return {
+            "version": self.version,
+            "finalizedAt": self.finalized_at,
+            "predictions": len(self.predictions),
+            "scores": len(self.scores),
+        }
+
+
+class RevealSnapshots:
+    """The game's reveal snapshot, as stored in Cosmos DB and held in memory"""
+
+    def __init__(self, database, reveal_date: Optional[datetime]):
+        self.database = database
+        self.reveal_date = reveal_date
+        self.current: Optional[RevealSnapshot] = None
+        self.reopened = False
+
+    def load(self):
+        """Pick up the stored snapshot (or its absence)"""
+        for _ in range(LOAD_ATTEMPTS):
+            head = self.database.get_reveal_snapshot()
+            if head is None or head.get('status') != "final":
+                self.reopened = head is not None and head.get('status') == "reopened"
+                self.current = None
+                return
+            self.reopened = False
+            if self.current is not None and self.current.version == head['version']:
+                return
+            chunks = map_reads(
+                self.database.get_reveal_chunk, [_chunk_id(head['version'], i) for i in range(head['chunks'])]
+            )
+            if None not in chunks:
+                self.current = RevealSnapshot(dict(
+                    head,
+                    predictions=[row for chunk in chunks for row in chunk['predictions']],
+                    scores=[row for chunk in chunks for row in chunk['scores']]
+                ))
+                return
+            # A newer snapshot replaced this one (and removed its chunks) meanwhile: read it
+        print(f"⚠️ Reveal snapshot {head['version']} is missing chunks, serving live results")
+        self.current = None
+
+    def _store(self, doc: dict, replace: bool) -> bool:
+        """Store a snapshot document as chunks plus head; False if one exists and replace is False"""
+        chunks = split_chunks(doc)
+        for chunk in chunks:
+            self.database.save_reveal_chunk(chunk)
+        head = {field: value for field, value in doc.items() if field not in ("predictions", "scores")}
+        head['chunks'] = len(chunks)
+
+        previous = self.database.get_reveal_snapshot() if replace else None
+        if replace:
+            self.database.save_reveal_snapshot(head)
+        elif not self.database.create_reveal_snapshot(head):
+            # Another worker got there first; the chunks are shared if it took the same version
+            winner = self.database.get_reveal_snapshot()
+            if winner is None or winner.get('version') != head['version']:
+                self._delete_chunks(head)
+            return False
+        if previous is not None and previous.get('status') == "final" and previous['version'] != doc['version']:
+            self._delete_chunks(previous)
+        return True
+
+    def _delete_chunks(self, head: dict):
+        for index in range(head['chunks']):
+            self.database.delete_reveal_chunk(_chunk_id(head['version'], index))
+
+    def _compute(self) -> Optional[dict]:
+        """Snapshot document of the current results; None without correct answers"""
+        if self.database.get_correct_answers() is None:
+            return None
+        predictions = [prediction_row(prediction) for prediction in self.database.iter_predictions()]
+        scores = self.database.calculate_scores()
+        content = json.dumps([predictions, scores], sort_keys=True, ensure_ascii=False)
+        return {
+            "id": REVEAL_SNAPSHOT_ID,
+            "type": "reveal",  # Partition key
+            "status": "final",
+            "version": hashlib.sha256(content.encode("utf-8")).hexdigest()[:16],
+            "finalizedAt": datetime.utcnow().isoformat() + "Z",
+            "revealDate": self.reveal_date.isoformat() + "Z" if self.reveal_date else None,
+            "predictions": predictions,
+            "scores": scores,
+        }
+
+    def finalize(self) -> RevealSnapshot:
+        """Freeze the results now (admin finalization)"""
+        doc = self._compute()
+        if doc is None:
+            raise ValueError("Correct answers have not been set yet")
+        self._store(doc, replace=True)
+        self.current, self.reopened = RevealSnapshot(doc), False
+        return self.current
+
+    def is_final(self) -> bool:
+        """Whether the stored snapshot is final, whatever this worker has loaded"""
+        head = self.database.get_reveal_snapshot()
+        return head is not None and head.get('status') == "final"
+
+    def refreeze(self) -> bool:
+        """Take a new snapshot if the game is finalized (the correct answers changed)"""
+        self.load()
+        if self.current is None:
+            return False
+        self.finalize()
+        return True
+
+    def reopen(self):
+        """Discard the snapshot until the game is finalized again"""
+        previous = self.database.get_reveal_snapshot()
+        self.database.save_reveal_snapshot({"id": REVEAL_SNAPSHOT_ID, "type": "reveal", "status": "reopened"})
+        self.current, self.reopened = None, True
+        if previous is not None and previous.get('status') == "final":
+            self._delete_chunks(previous)
+
+    def freeze_if_due(self) -> bool:
+        """Take the snapshot at the reveal date; True once nothing is left to do"""
+        self.load()
+        if self.current is not None or self.reopened or self.reveal_date is None:
+            return True
+        if datetime.utcnow() < self.reveal_date:
+            return False
+        doc = self._compute()
+        if doc is None:
+            return False
+        # Every worker tries at the reveal date; the first one wins
+        if self._store(doc, replace=False):
+            self.current = RevealSnapshot(doc)
+            print(f"🔒 Reveal snapshot {self.current.version} taken")
+        else:
+            self.load()
+        return True
+
+    async def freeze_at_reveal(self, retry_seconds: float):
+        """Background task: wait for the reveal date, then take the snapshot (none without a date)"""
+        if self.reveal_date is None:
+            return
+        while True:
+            delay = (self.reveal_date - datetime.utcnow()).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(min(delay, retry_seconds))
+                continue
+            try:
+                if await to_db_thread(self.freeze_if_due):
+                    return
+            except Exception as e:
+                print(f"⚠️ Reveal snapshot failed: {e}")
+            # Waiting for the admin to set the correct answers
+            await asyncio.sleep(retry_seconds)
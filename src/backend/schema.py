@@ -0,0 +1,229 @@
+"""
+Storage schema for user_submission documents
+
+Version 1 (legacy) stores predictions as a name -> name dict and quiz
+answers as full option strings with ISO timestamps.
+
+Version 3 (compact) stores:
+    p     receiver index per giver index of the roster (-1 = no prediction)
+    qa    [question ordinal, option index (or the raw answer), epoch µs]
+    ts / createdAt / updatedAt   epoch microseconds (exact integers: they
+          stay below 2^53), so decoded timestamps keep the precision of
+          the version 1 ISO strings
+    rosterVersion / questionSetVersion   which roster and question set the
+          indices refer to. Every version ever written is stored once as a
+          "schema" document, so older documents stay readable after the
+          roster or the questions change.
+
+Version 2 is version 3 with epoch milliseconds; it is still read.
+
+SubmissionCodec.decode always returns the version 1 shape (with datetimes), so
+nothing above the storage layer sees the difference.
+"""
+
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from azure.cosmos import exceptions
+
+from models import AMIGOS_INVISIBLES, UserSubmission
+from quiz_questions import QuizQuestions
+
+COMPACT_SCHEMA_VERSION = 3
+
+# Compact schema versions -> microseconds per unit of their epoch timestamps
+TIMESTAMP_UNITS_US = {2: 1000, 3: 1}
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _version_of(value) -> str:
+    """Short content hash used as roster / question set version"""
+    encoded = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:12]
+
+
+def is_compact(schema_version) -> bool:
+    return schema_version in TIMESTAMP_UNITS_US
+
+
+def to_epoch_us(value: datetime) -> int:
+    """Naive UTC datetime -> epoch microseconds"""
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch(value: int, unit_us: int = 1) -> datetime:
+    """Epoch timestamp in units of unit_us microseconds -> naive UTC datetime"""
+    return EPOCH + timedelta(microseconds=value * unit_us)
+
+
+def current_question_set() -> List[list]:
+    """[questionId, options] for every question, in ordinal order"""
+    return [[q.id, q.options] for q in QuizQuestions.get_all_questions()]
+
+
+class SubmissionCodec:
+    """Encodes and decodes user_submission documents in both schema versions"""
+
+    def __init__(self, container):
+        self.container = container
+        self.roster_version = _version_of(AMIGOS_INVISIBLES)
+        self._rosters: Dict[str, List[str]] = {self.roster_version: AMIGOS_INVISIBLES}
+        self._question_sets: Dict[str, List[list]] = {}
+        self._bank = None
+        self._sync_question_set()
+        self._registered = set()
+        self._lock = threading.Lock()
+
+    def _sync_question_set(self):
+        """Follow the current question bank (it can be reloaded at runtime)"""
+        bank = QuizQuestions.bank
+        if bank is self._bank:
+            return
+        question_set = current_question_set()
+        version = _version_of(question_set)
+        self._question_sets[version] = question_set
+        self.question_set, self.question_set_version, self._bank = question_set, version, bank
+
+    def current_question_set_version(self) -> str:
+        """Version of the question set of the current question bank"""
+        self._sync_question_set()
+        return self.question_set_version
+
+    def _register_current_versions(self):
+        """Store the current roster and question set once per process"""
+        self._sync_question_set()
+        if self.question_set_version in self._registered:
+            return
+        with self._lock:
+            if self.question_set_version in self._registered:
+                return
+            if not self._registered:
+                self.container.upsert_item({
+                    "id": f"roster_{self.roster_version}",
+                    "type": "schema",  # Partition key
+                    "values": AMIGOS_INVISIBLES
+                })
+            self.container.upsert_item({
+                "id": f"question_set_{self.question_set_version}",
+                "type": "schema",
+                "values": self.question_set
+            })
+            self._registered.add(self.question_set_version)
+
+    def _lookup(self, cache: Dict[str, list], prefix: str, version: str) -> list:
+        if version not in cache:
+            try:
+                item = self.container.read_item(item=f"{prefix}_{version}", partition_key="schema")
+            except exceptions.CosmosResourceNotFoundError:
+                raise ValueError(f"Unknown {prefix} version: {version}")
+            cache[version] = item["values"]
+        return cache[version]
+
+    def encode(self, submission: UserSubmission) -> dict:
+        """Compact document (COMPACT_SCHEMA_VERSION) for a submission"""
+        self._register_current_versions()
+
+        roster_index = {name: i for i, name in enumerate(AMIGOS_INVISIBLES)}
+        predictions = [-1] * len(AMIGOS_INVISIBLES)
+        for giver, receiver in submission.predictions.items():
+            predictions[roster_index[giver]] = roster_index[receiver]
+
+        ordinals = self._bank.ordinals
+        quiz_answers = []
+        for qa in submission.quizAnswers:
+            ordinal = ordinals[qa.questionId]
+            options = self.question_set[ordinal][1]
+            # Free-text answers that are not one of the options are kept as is
+            answer = options.index(qa.answer) if qa.answer in options else qa.answer
+            quiz_answers.append([ordinal, answer, to_epoch_us(qa.timestamp)])
+
+        return {
+            "id": f"user_{submission.userName}",
+            "type": "user_submission",  # Partition key
+            "userName": submission.userName,
+            "schemaVersion": COMPACT_SCHEMA_VERSION,
+            "rosterVersion": self.roster_version,
+            "questionSetVersion": self.question_set_version,
+            "p": predictions if submission.predictions else [],
+            "qa": quiz_answers,
+            "ts": to_epoch_us(submission.timestamp),
+            "createdAt": to_epoch_us(submission.createdAt),
+            "updatedAt": to_epoch_us(submission.updatedAt),
+        }
+
+    def can_encode(self, submission: UserSubmission) -> bool:
+        """Whether every answer refers to a question of the current set"""
+        self._sync_question_set()
+        return all(qa.questionId in self._bank.ordinals for qa in submission.quizAnswers)
+
+    def decode(self, item: dict) -> dict:
+        """Version 1 shaped dict (with datetimes) from a document of any version"""
+        if not is_compact(item.get("schemaVersion")):
+            return self._decode_legacy(item)
+        unit = TIMESTAMP_UNITS_US[item["schemaVersion"]]
+
+        roster = self._lookup(self._rosters, "roster", item["rosterVersion"])
+        predictions = {
+            roster[giver]: roster[receiver]
+            for giver, receiver in enumerate(item.get("p", []))
+            if receiver >= 0
+        }
+
+        quiz_answers = []
+        if item.get("qa"):
+            question_set = self._lookup(self._question_sets, "question_set", item["questionSetVersion"])
+            for ordinal, answer, timestamp in item["qa"]:
+                question_id, options = question_set[ordinal]
+                quiz_answers.append({
+                    "questionId": question_id,
+                    "answer": options[answer] if isinstance(answer, int) else answer,
+                    "timestamp": from_epoch(timestamp, unit),
+                })
+
+        return {
+            "id": item["id"],
+            "userName": item["userName"],
+            "predictions": predictions,
+            "quizAnswers": quiz_answers,
+            "timestamp": from_epoch(item["ts"], unit),
+            "createdAt": from_epoch(item["createdAt"], unit),
+            "updatedAt": from_epoch(item["updatedAt"], unit),
+        }
+
+    @staticmethod
+    def _decode_legacy(item: dict) -> dict:
+        return {
+            "id": item["id"],
+            "userName": item["userName"],
+            "predictions": item.get("predictions") or {},
+            "quizAnswers": [
+                {
+                    "questionId": qa["questionId"],
+                    "answer": qa["answer"],
+                    "timestamp": datetime.fromisoformat(qa["timestamp"]),
+                }
+                for qa in item.get("quizAnswers", [])
+            ],
+            "timestamp": datetime.fromisoformat(item["timestamp"]),
+            "createdAt": datetime.fromisoformat(item["createdAt"]),
+            "updatedAt": datetime.fromisoformat(item["updatedAt"]),
+        }
+
+
+def encode_legacy(submission: UserSubmission) -> dict:
+    """Version 1 document for a submission"""
+    doc = submission.dict()
+    doc['id'] = f"user_{submission.userName}"
+    doc['type'] = "user_submission"  # Partition key
+    doc['timestamp'] = doc['timestamp'].isoformat()
+    doc['createdAt'] = doc['createdAt'].isoformat()
+    doc['updatedAt'] = doc['updatedAt'].isoformat()
+
+    # Convert quiz answers timestamps
+    for qa in doc['quizAnswers']:
+        qa['timestamp'] = qa['timestamp'].isoformat()
+    return doc
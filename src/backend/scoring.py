@@ -0,0 +1,65 @@
+"""
+Per-user scores stored on user_submission documents
+Every write of a submission also stores its score fields, computed against
+the admin answers at that moment. scoreKey records which admin answers were
+used, so a row scored before the answers changed is recognised as stale
+and recomputed instead of being served as is.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from models import CorrectAnswers, QuizAnswerData, QuizCorrectAnswers
+
+# Weighted scoring: predictions are worth 10 points each, quiz questions 1
+PREDICTION_POINTS = 10
+QUIZ_POINTS = 1
+
+SCORE_FIELDS = (
+    "predictionsCorrect", "predictionsTotal", "quizCorrect", "quizTotal",
+    "totalPoints", "maxTotalPoints", "score",
+)
+
+
+def score_key(correct_answers: Optional[CorrectAnswers],
+              quiz_correct_answers: Optional[QuizCorrectAnswers]) -> str:
+    """Identifies the admin answers a score was computed against"""
+    return "|".join(
+        answers.updatedAt.isoformat() if answers else "-"
+        for answers in (correct_answers, quiz_correct_answers)
+    )
+
+
+def quiz_counts(quiz_answers: List[QuizAnswerData],
+                quiz_correct_answers: Optional[QuizCorrectAnswers]) -> Tuple[int, int]:
+    """(correct, total) quiz answers of one user"""
+    quiz_correct = 0
+    if quiz_correct_answers:
+        quiz_correct = sum(
+            1 for qa in quiz_answers
+            if quiz_correct_answers.answers.get(qa.questionId) == qa.answer
+        )
+    return quiz_correct, len(quiz_answers)
+
+
+def score_fields(predictions: Dict[str, str], correct_answers: Optional[CorrectAnswers],
+                 quiz_correct: int, quiz_total: int) -> dict:
+    """Score fields of one user's submission"""
+    predictions_correct = 0
+    if correct_answers:
+        predictions_correct = sum(
+            1 for giver, receiver in predictions.items()
+            if correct_answers.answers.get(giver) == receiver
+        )
+
+    total_points = predictions_correct * PREDICTION_POINTS + quiz_correct * QUIZ_POINTS
+    max_total_points = len(predictions) * PREDICTION_POINTS + quiz_total * QUIZ_POINTS
+
+    return {
+        "predictionsCorrect": predictions_correct,
+        "predictionsTotal": len(predictions),
+        "quizCorrect": quiz_correct,
+        "quizTotal": quiz_total,
+        "totalPoints": total_points,
+        "maxTotalPoints": max_total_points,
+        "score": round((total_points / max_total_points) * 100, 2) if max_total_points > 0 else 0.0,
+    }
@@ -1,11 +1,23 @@
 """
 Script to seed quiz questions into the database
-Run this script to populate the database with initial quiz questions
+Run this script to populate the database with initial quiz questions, or
+pass a JSON / NDJSON file with a whole question bank:
+
+    python seed_quiz_questions.py [questions.ndjson]
+
+Workers running with QUESTION_BANK_SOURCE=database pick up the new bank
+once the question_bank version document changes: right away when this
+script runs with the servers' INVALIDATION_DIR, otherwise at their next
+QUESTION_BANK_RELOAD_SECONDS poll.
 """
 
-from database import db
+import sys
+
+from bulk_loader import BulkLoader, read_documents
+from cosmos import connect_container
+from invalidation import channel
 from models import Question
-import uuid
+from quiz_questions import QUESTION_BANK_ID, QuestionBank, QuizQuestionData
 
 # Define your quiz questions here
 QUIZ_QUESTIONS = [
@@ -13,13 +25,15 @@ QUIZ_QUESTIONS = [
         "id": "q1",
         "question": "¿Cuántas personas participan en el amigo invisible?",
         "options": ["5", "6", "7", "8"],
-        "correctAnswer": "7"
+        "correctAnswer": "7",
+        "timeLimit": 10
     },
     {
         "id": "q2",
         "question": "¿Cuándo se revelan los resultados?",
         "options": ["23 Dic", "24 Dic", "25 Dic", "31 Dic"],
-        "correctAnswer": "24 Dic"
+        "correctAnswer": "24 Dic",
+        "timeLimit": 10
     },
     {
         "id": "q3",
@@ -30,29 +44,41 @@ QUIZ_QUESTIONS = [
             "Hacer una fiesta",
             "Ninguna"
         ],
-        "correctAnswer": "Adivinar quién es el amigo invisible de cada persona"
+        "correctAnswer": "Adivinar quién es el amigo invisible de cada persona",
+        "timeLimit": 15
     }
 ]
 
 
-def seed_questions():
-    """Seed quiz questions into the database"""
-    print("🌱 Seeding quiz questions...")
-    
-    for q_data in QUIZ_QUESTIONS:
-        question = Question(**q_data)
-        
+def question_documents(questions=QUIZ_QUESTIONS):
+    """Build the quiz question documents, plus the bank document listing them in ordinal order"""
+    questions = [Question(**q_data) for q_data in questions]
+    for question in questions:
         # Prepare document
         doc = question.dict()
         doc['id'] = f"quiz_question_{question.id}"
         doc['type'] = "quiz_question"  # Partition key
-        
-        # Upsert to database
-        db.container.upsert_item(doc)
-        print(f"✅ Added question: {question.id} - {question.question[:50]}...")
+        yield doc
+    
+    bank = QuestionBank(QuizQuestionData(**question.dict()) for question in questions)
+    yield {
+        "id": QUESTION_BANK_ID,
+        "type": "quiz_question",
+        "version": bank.version,
+        "questionIds": [question.id for question in questions]
+    }
+
+
+def seed_questions(questions=QUIZ_QUESTIONS):
+    """Seed quiz questions into the database (unchanged questions are skipped)"""
+    print("🌱 Seeding quiz questions...")
+    
+    loader = BulkLoader(connect_container())
+    stats = loader.load(question_documents(questions))
     
-    print(f"\n✨ Successfully seeded {len(QUIZ_QUESTIONS)} quiz questions!")
+    channel.publish("question_bank")
+    print(f"\n✨ Successfully seeded quiz questions: {stats.summary()}")
 
 
 if __name__ == "__main__":
-    seed_questions()
+    seed_questions(list(read_documents(sys.argv[1])) if len(sys.argv) > 1 else QUIZ_QUESTIONS)
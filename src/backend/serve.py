@@ -0,0 +1,48 @@
+"""
+Production entrypoint: run the API with several uvicorn worker processes
+Settings (environment variables):
+    WORKERS           number of worker processes (0 = one per CPU core)
+    UVICORN_LOOP      event loop implementation (auto, asyncio, uvloop)
+    UVICORN_HTTP      HTTP parser (auto, h11, httptools)
+    UVICORN_BACKLOG   listen socket backlog
+    INVALIDATION_DIR  shared directory for cross-worker cache invalidation
+"""
+
+import os
+import tempfile
+
+import uvicorn
+
+from config import settings
+
+
+def worker_count() -> int:
+    """Configured number of workers"""
+    return settings.WORKERS if settings.WORKERS > 0 else (os.cpu_count() or 1)
+
+
+def main():
+    workers = worker_count()
+
+    if workers > 1 and not settings.INVALIDATION_DIR:
+        # Workers inherit the environment, so they all share this channel directory
+        os.environ["INVALIDATION_DIR"] = tempfile.mkdtemp(prefix="bingo-invalidation-")
+
+    print(
+        f"🚀 Starting {workers} worker(s) on port {settings.PORT} "
+        f"(loop={settings.UVICORN_LOOP}, http={settings.UVICORN_HTTP}, backlog={settings.UVICORN_BACKLOG})"
+    )
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=settings.PORT,
+        workers=workers,
+        loop=settings.UVICORN_LOOP,
+        http=settings.UVICORN_HTTP,
+        backlog=settings.UVICORN_BACKLOG,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
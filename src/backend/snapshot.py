@@ -0,0 +1,122 @@
+"""
+Streaming snapshot export and restore of all game data
+A snapshot is gzip-compressed NDJSON: a header line followed by one line
+per document (user submissions, answer documents, schema documents, ...)
+without Cosmos DB system properties. Export streams the query page by
+page and restore loads in bounded concurrent batches, so memory use does
+not grow with the size of the game.
+
+Only the game data partitions (SNAPSHOT_TYPES) are exported and restored.
+Jobs and their lock, idempotency records, the reveal snapshot and the live
+round are transient: restoring them would bring back stale locks and
+expired idempotency claims. Migration markers are left out too: a
+restored snapshot may have data to migrate again.
+
+Usage:
+    python snapshot.py export game.ndjson.gz
+    python snapshot.py restore game.ndjson.gz [--concurrency 8] [--batch-size 100]
+"""
+
+import argparse
+import gzip
+import json
+import zlib
+from datetime import datetime
+from typing import IO, Iterable, Iterator
+
+from bulk_loader import SYSTEM_FIELDS, BulkLoader, LoadStats
+
+SNAPSHOT_FORMAT = "amigo-invisible-snapshot"
+SNAPSHOT_VERSION = 1
+
+# Partition keys (document types) of the game data
+SNAPSHOT_TYPES = ("user_submission", "quiz_answer", "answers", "quiz_answers", "schema", "quiz_question")
+
+
+def _header() -> dict:
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "createdAt": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+def _line(doc: dict) -> bytes:
+    return (json.dumps(doc, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def iter_documents(container) -> Iterator[dict]:
+    """Every game data document in the container, without system properties"""
+    for doc_type in SNAPSHOT_TYPES:
+        for item in container.query_items(query="SELECT * FROM c", partition_key=doc_type):
+            yield {k: v for k, v in item.items() if k not in SYSTEM_FIELDS}
+
+
+def iter_snapshot_chunks(documents: Iterable[dict]) -> Iterator[bytes]:
+    """Gzip-compressed snapshot of the documents as a stream of chunks"""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    yield compressor.compress(_line(_header()))
+    for doc in documents:
+        chunk = compressor.compress(_line(doc))
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def export_snapshot(container, fileobj: IO[bytes]) -> int:
+    """Write a snapshot to a binary file object, return the number of documents"""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for doc in iter_documents(container):
+            count += 1
+            yield doc
+
+    for chunk in iter_snapshot_chunks(counted()):
+        fileobj.write(chunk)
+    return count
+
+
+def read_snapshot(fileobj: IO[bytes]) -> Iterator[dict]:
+    """Game data documents from a snapshot file object"""
+    with gzip.open(fileobj, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError("Not a game snapshot")
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {header.get('version')}")
+        for line in f:
+            if line.strip():
+                doc = json.loads(line)
+                # Snapshots taken before SNAPSHOT_TYPES also hold transient documents
+                if doc.get("type") in SNAPSHOT_TYPES:
+                    yield doc
+
+
+def restore_snapshot(container, fileobj: IO[bytes], concurrency: int = 8,
+                     batch_size: int = 100, verbose: bool = True) -> LoadStats:
+    """Load a snapshot into any container (unchanged documents are skipped)"""
+    loader = BulkLoader(container, concurrency=concurrency, batch_size=batch_size, verbose=verbose)
+    return loader.load(read_snapshot(fileobj))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or restore a game snapshot")
+    parser.add_argument("command", choices=["export", "restore"])
+    parser.add_argument("path", help="snapshot file (.ndjson.gz)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    from cosmos import connect_container
+
+    container = connect_container()
+    if args.command == "export":
+        with open(args.path, "wb") as f:
+            count = export_snapshot(container, f)
+        print(f"✨ Snapshot of {count} documents written to {args.path}")
+    else:
+        with open(args.path, "rb") as f:
+            stats = restore_snapshot(container, f, args.concurrency, args.batch_size)
+        print(f"\n✨ Restored {stats.summary()}")
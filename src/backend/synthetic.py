@@ -0,0 +1,87 @@
+"""
+Synthetic games for exercising the service beyond the real roster
+A game has a configurable number of participants (the amigos invisibles
+everyone makes predictions about), players (participants plus people who
+only play) and quiz questions, with random predictions and quiz answers
+for every player. Generation is deterministic for a given seed.
+
+The roster lives in models, so install_roster has to run before database
+or main is imported. Used by test_scale.py.
+"""
+
+import json
+import random
+from typing import Dict, List
+
+from config import settings
+from models import AMIGOS_INVISIBLES, PLAYERS, CorrectAnswers, Prediction, QuizAnswer, QuizCorrectAnswers
+
+
+def _single_cycle(names: List[str], rng: random.Random) -> Dict[str, str]:
+    """Random giver -> receiver assignment in which nobody gives to themselves (Sattolo)"""
+    receivers = list(names)
+    for i in range(len(receivers) - 1, 0, -1):
+        j = rng.randrange(i)
+        receivers[i], receivers[j] = receivers[j], receivers[i]
+    return dict(zip(names, receivers))
+
+
+class SyntheticGame:
+    """Roster, questions, answers and player submissions of a generated game"""
+
+    def __init__(self, participants: int, players: int, questions: int,
+                 answered_fraction: float = 0.5, seed: int = 0):
+        if participants < 2:
+            raise ValueError("A game needs at least 2 participants")
+        if players < participants:
+            raise ValueError("Every participant is also a player")
+        rng = random.Random(seed)
+
+        self.participants = [f"Amigo {i:04d}" for i in range(participants)]
+        self.players = self.participants + [f"Player {i:04d}" for i in range(players - participants)]
+        self.questions = [
+            {
+                "id": f"sq{i}",
+                "question": f"Synthetic question {i}?",
+                "options": [f"Option {i}.{n}" for n in range(4)],
+                "correctAnswer": f"Option {i}.{rng.randrange(4)}",
+                "timeLimit": 10
+            }
+            for i in range(questions)
+        ]
+        self.correct_answers = _single_cycle(self.participants, rng)
+        self.quiz_correct_answers = {q["id"]: q["correctAnswer"] for q in self.questions}
+
+        answered = int(questions * answered_fraction)
+        self.predictions = {player: _single_cycle(self.participants, rng) for player in self.players}
+        self.quiz_answers = {
+            player: {q["id"]: rng.choice(q["options"]) for q in rng.sample(self.questions, answered)}
+            for player in self.players
+        }
+
+    def install_roster(self):
+        """Make this game's participants and players the roster of the process"""
+        AMIGOS_INVISIBLES[:] = self.participants
+        PLAYERS[:] = self.players
+
+    def write_question_bank(self, path: str):
+        """Write the questions as an NDJSON file for QUESTION_BANK_SOURCE=file"""
+        with open(path, "w", encoding="utf-8") as f:
+            for question in self.questions:
+                f.write(json.dumps(question) + "\n")
+
+    def load(self, database):
+        """Store the admin answers and every player's predictions and quiz answers"""
+        database.save_correct_answers(CorrectAnswers(answers=self.correct_answers, revealDate=settings.REVEAL_DATE))
+        database.save_quiz_correct_answers(QuizCorrectAnswers(answers=self.quiz_correct_answers))
+        for player in self.players:
+            database.save_prediction(Prediction(userName=player, predictions=self.predictions[player]))
+            database.save_quiz_answers(player, [
+                QuizAnswer(
+                    userName=player,
+                    questionId=question_id,
+                    answer=answer,
+                    isCorrect=answer == self.quiz_correct_answers[question_id]
+                )
+                for question_id, answer in self.quiz_answers[player].items()
+            ])
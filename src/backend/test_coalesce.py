@@ -0,0 +1,98 @@
+"""
+Tests of single-flight coalescing (coalesce.SingleFlight)
+
+    python -m pytest test_coalesce.py
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from coalesce import SingleFlight
+
+
+def blocking(result=None, error=None):
+    """A computation that blocks until released, and records its calls"""
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        if error is not None:
+            raise error
+        return result if result is not None else len(calls)
+
+    return compute, calls, release
+
+
+async def concurrently(flight, key, compute, release, count=20):
+    waiters = [asyncio.create_task(flight.do(key, compute)) for _ in range(count)]
+    await asyncio.sleep(0.05)
+    release.set()
+    return await asyncio.gather(*waiters, return_exceptions=True)
+
+
+def test_concurrent_calls_share_one_computation():
+    compute, calls, release = blocking(result={"rows": [1, 2, 3]})
+
+    results = asyncio.run(concurrently(SingleFlight(timeout_seconds=5), "scoreboard", compute, release))
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_concurrent_calls_share_the_exception():
+    compute, calls, release = blocking(error=RuntimeError("query failed"))
+
+    results = asyncio.run(concurrently(SingleFlight(timeout_seconds=5), "scores", compute, release))
+
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_results_are_not_kept_after_the_flight():
+    compute, calls, release = blocking()
+    release.set()
+
+    async def run():
+        flight = SingleFlight(timeout_seconds=5)
+        first = await flight.do("scoreboard", compute)
+        second = await flight.do("scoreboard", compute)
+        return first, second, flight.stats()
+
+    assert asyncio.run(run()) == (1, 2, {"inflight": []})
+
+
+def test_keys_are_computed_separately():
+    compute, calls, release = blocking()
+
+    async def run():
+        flight = SingleFlight(timeout_seconds=5)
+        waiters = [asyncio.create_task(flight.do(key, compute)) for key in ("scores", "scoreboard", "scores")]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 2
+    assert results[0] == results[2]
+
+
+def test_waiters_time_out_and_a_stuck_flight_is_not_joined():
+    compute, calls, release = blocking()
+
+    async def run():
+        flight = SingleFlight(timeout_seconds=0.05)
+        with pytest.raises(TimeoutError):
+            await flight.do("scoreboard", compute)
+        # After the deadline, a new flight starts instead of waiting for the stuck one
+        late = asyncio.create_task(flight.do("scoreboard", compute, timeout=5))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await late
+
+    assert asyncio.run(run()) == 2
+    assert len(calls) == 2
@@ -0,0 +1,93 @@
+"""
+Tests of group commit for quiz answers (group_commit.QuizAnswerCommitter)
+against a Database on the in-memory Cosmos DB.
+
+    python -m pytest test_group_commit.py
+"""
+
+import asyncio
+
+from group_commit import QuizAnswerCommitter
+from models import QuizAnswer
+from quiz_questions import QuizQuestions
+
+
+class RecordingDatabase:
+    """Passes batches on to the database and records them"""
+
+    def __init__(self, database, error=None):
+        self.database = database
+        self.error = error
+        self.batches = []
+
+    def save_quiz_answers(self, user_name, quiz_answers):
+        self.batches.append((user_name, [quiz_answer.questionId for quiz_answer in quiz_answers]))
+        if self.error is not None:
+            raise self.error
+        return self.database.save_quiz_answers(user_name, quiz_answers)
+
+
+def answer(user_name, question_id, text="Paula"):
+    return QuizAnswer(userName=user_name, questionId=question_id, answer=text, isCorrect=False)
+
+
+def submit_all(committer, quiz_answers):
+    async def run():
+        return await asyncio.gather(
+            *(committer.submit(quiz_answer) for quiz_answer in quiz_answers), return_exceptions=True
+        )
+    return asyncio.run(run())
+
+
+def test_answers_of_a_user_are_written_in_one_batch(database):
+    recorder = RecordingDatabase(database)
+    committer = QuizAnswerCommitter(recorder, window_ms=20, max_batch=64)
+    questions = [q.id for q in QuizQuestions.get_all_questions()]
+
+    results = submit_all(committer, [answer("Paula", q) for q in questions[:3]] + [answer("Lula", questions[0])])
+
+    assert [result.questionId for result in results] == questions[:3] + questions[:1]
+    assert sorted(recorder.batches) == [("Lula", questions[:1]), ("Paula", questions[:3])]
+    assert len(database.get_user_quiz_answers("Paula")) == 3
+    assert database.get_user_score("Paula")["quizTotal"] == 3
+
+
+def test_a_duplicate_in_the_batch_fails_alone(database):
+    committer = QuizAnswerCommitter(database, window_ms=20, max_batch=64)
+
+    first, duplicate = submit_all(committer, [answer("Paula", "q1", "Paula"), answer("Paula", "q1", "Lula")])
+
+    assert first.answer == "Paula"
+    assert isinstance(duplicate, ValueError)
+    assert [qa.answer for qa in database.get_user_quiz_answers("Paula")] == ["Paula"]
+
+
+def test_a_full_batch_is_written_without_waiting_for_the_window(database):
+    recorder = RecordingDatabase(database)
+    committer = QuizAnswerCommitter(recorder, window_ms=60_000, max_batch=2)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(committer.submit(answer("Paula", "q1")), committer.submit(answer("Paula", "q2"))), 5
+        )
+
+    assert len(asyncio.run(run())) == 2
+    assert recorder.batches == [("Paula", ["q1", "q2"])]
+
+
+def test_a_failed_write_fails_every_answer_of_the_batch(database):
+    committer = QuizAnswerCommitter(RecordingDatabase(database, error=RuntimeError("unavailable")), 20, 64)
+
+    results = submit_all(committer, [answer("Paula", "q1"), answer("Paula", "q2")])
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert database.get_user_quiz_answers("Paula") == []
+
+
+def test_nothing_is_kept_once_the_batches_are_written(database):
+    committer = QuizAnswerCommitter(database, window_ms=20, max_batch=64)
+
+    submit_all(committer, [answer("Paula", "q1"), answer("Lula", "q1"), answer("Miriam", "q1")])
+
+    assert committer._user_locks == {}
+    assert committer._tasks == set()
@@ -0,0 +1,211 @@
+"""
+Tests of Idempotency-Key handling (idempotency.py) with the records in the
+in-memory Cosmos DB. Two apps on the same database stand in for two workers.
+
+    python -m pytest test_idempotency.py
+"""
+
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from admission import controller
+from config import settings
+from idempotency import IdempotencyMiddleware, IdempotencyStore
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limits(monkeypatch):
+    """Rate limits are off, except where a test turns them on"""
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+
+
+class Worker:
+    """An app with one idempotent write endpoint, counting the writes it runs"""
+
+    def __init__(self, database, lease_seconds=30, fail=0):
+        self.writes = []
+        self.fail = fail
+        self.store = IdempotencyStore(database, ttl_seconds=300, lease_seconds=lease_seconds, cache_size=100)
+        app = FastAPI()
+
+        @app.post("/api/predictions", status_code=201)
+        async def write(body: dict):
+            if self.fail:
+                self.fail -= 1
+                raise HTTPException(status_code=503, detail="Unavailable")
+            self.writes.append(body)
+            return {"success": True, "write": len(self.writes)}
+
+        app.add_middleware(IdempotencyMiddleware, store=self.store, paths={"/api/predictions": "write"})
+        self.client = TestClient(app)
+
+    def post(self, body, key="key-1"):
+        return self.client.post("/api/predictions", json=body, headers={"Idempotency-Key": key})
+
+
+class CountingDatabase:
+    """Passes calls on to the database, counting them by method"""
+
+    def __init__(self, database):
+        self.database = database
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        method = getattr(self.database, name)
+
+        def call(*args, **kwargs):
+            self.calls[name] += 1
+            return method(*args, **kwargs)
+        return call
+
+
+def test_a_retry_gets_the_first_response_replayed(database):
+    worker = Worker(database)
+
+    first = worker.post({"userName": "Paula"})
+    retry = worker.post({"userName": "Paula"})
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json() == {"success": True, "write": 1}
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert len(worker.writes) == 1
+
+
+def test_a_key_reused_with_another_body_is_rejected(database):
+    worker = Worker(database)
+    worker.post({"userName": "Paula"})
+
+    response = worker.post({"userName": "Lula"})
+
+    assert response.status_code == 422
+    assert len(worker.writes) == 1
+
+
+def test_different_keys_are_separate_writes(database):
+    worker = Worker(database)
+
+    worker.post({"userName": "Paula"}, key="key-1")
+    worker.post({"userName": "Paula"}, key="key-2")
+
+    assert len(worker.writes) == 2
+
+
+def test_a_retry_on_another_worker_is_replayed(database):
+    first_worker, second_worker = Worker(database), Worker(database)
+
+    first = first_worker.post({"userName": "Paula"})
+    retry = second_worker.post({"userName": "Paula"})
+
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert second_worker.writes == []
+
+
+def test_a_retry_on_the_same_worker_is_replayed_without_the_database(database):
+    worker = Worker(database)
+    first = worker.post({"userName": "Paula"})
+    operations = database.container.inner.operations
+
+    retry = worker.post({"userName": "Paula"})
+
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert database.container.inner.operations == operations
+
+
+def test_a_duplicate_waits_for_the_first_request_with_reads_only(database):
+    body = b'{"userName": "Paula"}'
+    running = IdempotencyStore(database, ttl_seconds=300, lease_seconds=30, cache_size=100)
+    claimed, record = running.claim("/api/predictions:key-1", hashlib.sha256(body).hexdigest())
+    assert claimed
+    # The first request completes on another worker while the duplicate waits
+    threading.Timer(0.3, running.complete, (record, 201, [], b'{"success": true}', True)).start()
+    counting = CountingDatabase(database)
+    worker = Worker(counting)
+
+    response = worker.client.post(
+        "/api/predictions", content=body,
+        headers={"Idempotency-Key": "key-1", "Content-Type": "application/json"}
+    )
+
+    assert response.status_code == 201
+    assert response.headers["idempotent-replayed"] == "true"
+    assert worker.writes == []
+    assert counting.calls["create_idempotency_record"] == 1
+    assert counting.calls["replace_idempotency_record"] == 0
+    assert counting.calls["get_idempotency_record"] >= 3
+
+
+def test_completed_responses_are_cached_up_to_the_cache_size(database):
+    store = IdempotencyStore(database, ttl_seconds=300, lease_seconds=30, cache_size=2)
+    for key in ["key-1", "key-2", "key-3"]:
+        claimed, record = store.claim(f"/api/predictions:{key}", "same body")
+        store.complete(record, 201, [], b"{}", keep=True)
+
+    assert store.stats()["cachedResponses"] == 2
+    expired = IdempotencyStore(database, ttl_seconds=0, lease_seconds=30, cache_size=2)
+    claimed, record = expired.claim("/api/predictions:key-4", "same body")
+    expired.complete(record, 201, [], b"{}", keep=True)
+    assert expired.stats()["cachedResponses"] == 0
+
+
+def test_duplicates_are_rate_limited_before_the_key_is_read(database, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(controller, "limits", {"write": (0.001, 1)})
+    monkeypatch.setattr(controller, "_buckets", {"write": OrderedDict()})
+    worker = Worker(database)
+    assert worker.post({"userName": "Paula"}).status_code == 201
+    operations = database.container.inner.operations
+
+    retry = worker.post({"userName": "Paula"})
+
+    assert retry.status_code == 429
+    assert "retry-after" in retry.headers
+    assert database.container.inner.operations == operations
+    assert controller.inflight == 0
+
+
+def test_failed_requests_release_the_key(database):
+    worker = Worker(database, fail=1)
+
+    assert worker.post({"userName": "Paula"}).status_code == 503
+    retry = worker.post({"userName": "Paula"})
+
+    assert retry.status_code == 201
+    assert "idempotent-replayed" not in retry.headers
+    assert len(worker.writes) == 1
+
+
+def test_a_request_in_flight_keeps_its_key_until_its_lease_runs_out(database):
+    fingerprint = "same body"
+    running = IdempotencyStore(database, ttl_seconds=300, lease_seconds=30, cache_size=100)
+    claimed, record = running.claim("/api/predictions:key-1", fingerprint)
+    assert claimed
+
+    # Another worker sees the request running
+    other = IdempotencyStore(database, ttl_seconds=300, lease_seconds=30, cache_size=100)
+    claimed, current = other.claim("/api/predictions:key-1", fingerprint)
+    assert not claimed
+    assert current["status"] is None
+
+
+def test_a_key_whose_worker_died_is_taken_over(database):
+    fingerprint = "same body"
+    died = IdempotencyStore(database, ttl_seconds=300, lease_seconds=0, cache_size=100)
+    claimed, record = died.claim("/api/predictions:key-1", fingerprint)
+    assert claimed
+
+    other = IdempotencyStore(database, ttl_seconds=300, lease_seconds=30, cache_size=100)
+    claimed, taken = other.claim("/api/predictions:key-1", fingerprint)
+    assert claimed
+    assert taken["_etag"] != record["_etag"]
+
+    # The late completion of the dead worker's request doesn't overwrite the new claim
+    died.complete(record, 201, [], b"late", keep=True)
+    assert database.get_idempotency_record(record["id"])["status"] is None
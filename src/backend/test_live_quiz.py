@@ -0,0 +1,131 @@
+"""
+Tests of live quiz rounds (live_quiz.LiveQuizSession) with stand-in sockets
+and a Database on the in-memory Cosmos DB.
+
+    python -m pytest test_live_quiz.py
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from config import settings
+from group_commit import QuizAnswerCommitter
+from live_quiz import LiveQuizSession
+from quiz_questions import QuizQuestions
+
+
+class Socket:
+    """WebSocket stand-in: messages to the server are queued, messages from it recorded"""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+        self.closed = None
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def close(self, code=1000, reason=None):
+        self.closed = code
+        self.incoming.put_nowait({"type": "websocket.disconnect", "code": code})
+
+    def answer(self, question_id, answer):
+        self.incoming.put_nowait({"type": "websocket.receive", "text": json.dumps(
+            {"type": "answer", "questionId": question_id, "answer": answer}
+        )})
+
+    def of_type(self, message_type):
+        return [message for message in self.sent if message["type"] == message_type]
+
+
+class CountingDatabase:
+    """Passes calls on to the database, counting the answer saves"""
+
+    def __init__(self, database):
+        self.database = database
+        self.saves = []
+
+    def __getattr__(self, name):
+        return getattr(self.database, name)
+
+    def save_quiz_answers(self, user_name, quiz_answers):
+        self.saves.append((user_name, len(quiz_answers)))
+        return self.database.save_quiz_answers(user_name, quiz_answers)
+
+
+async def until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.parametrize("group_commit", [False, True])
+def test_answers_are_written_and_acknowledged_when_the_question_closes(database, monkeypatch, group_commit):
+    monkeypatch.setattr(settings, "LIVE_QUIZ_GRACE_MS", 0)
+    question = QuizQuestions.get_question_by_id("q1")
+    counting = CountingDatabase(database)
+    committer = QuizAnswerCommitter(counting, window_ms=5, max_batch=64) if group_commit else None
+    session = LiveQuizSession(counting, committer)
+    sockets = {"Paula": Socket(), "Lula": Socket()}
+
+    async def run():
+        players = [asyncio.create_task(session.connect(name, socket)) for name, socket in sockets.items()]
+        await until(lambda: len(session.connections) == 2)
+        # The question closes half a second from now
+        session.start(time.time() - question.timeLimit + 0.5, ["q1"])
+        await until(lambda: session.current is not None)
+
+        sockets["Paula"].answer("q1", question.correctAnswer)
+        sockets["Lula"].answer("q1", "Nadie")
+        sockets["Lula"].answer("q1", question.correctAnswer)
+        await until(lambda: sum(map(len, session.pending.values())) == 2)
+        written_while_open = list(counting.saves)
+        acknowledged_while_open = [socket.of_type("answerResult") for socket in sockets.values()]
+
+        await session._task
+        for socket in sockets.values():
+            await socket.close()
+        await asyncio.gather(*players)
+        return written_while_open, acknowledged_while_open
+
+    written_while_open, acknowledged_while_open = asyncio.run(run())
+
+    assert written_while_open == [] and acknowledged_while_open == [[], []]
+    assert sorted(counting.saves) == [("Lula", 1), ("Paula", 1)]
+    assert sockets["Paula"].of_type("answerResult") == [
+        {"type": "answerResult", "questionId": "q1", "isCorrect": True, "totalCorrect": 1}
+    ]
+    assert sockets["Lula"].of_type("error")[0]["message"] == "Question q1 has already been answered"
+    assert sockets["Lula"].of_type("answerResult")[0]["isCorrect"] is False
+    assert session.totals == {"Paula": 1}
+    assert sockets["Paula"].of_type("finished") == [{"type": "finished", "totals": {"Paula": 1}}]
+    assert {qa.answer for qa in database.get_user_quiz_answers("Lula")} == {"Nadie"}
+
+
+def test_a_new_connection_closes_the_one_it_replaces(database):
+    session = LiveQuizSession(database)
+    first, second = Socket(), Socket()
+
+    async def run():
+        served = asyncio.create_task(session.connect("Paula", first))
+        await until(lambda: "Paula" in session.connections)
+        replacing = asyncio.create_task(session.connect("Paula", second))
+        await until(lambda: session.connections.get("Paula") is second)
+        await served
+        await second.close()
+        await replacing
+
+    asyncio.run(run())
+
+    assert first.closed == 1000
+    assert "Paula" not in session.connections
@@ -0,0 +1,96 @@
+"""
+Tests of the quiz answer ledger (Database.save_quiz_answers) against the
+in-memory Cosmos DB: one document per answer, and the answer summary of
+the user's submission kept in step with it.
+
+    python -m pytest test_quiz_ledger.py
+"""
+
+from azure.cosmos import exceptions
+
+import migrate_quiz_answers
+from database import Database
+from models import QuizAnswer, QuizAnswerData, QuizCorrectAnswers, UserSubmission
+from schema import encode_legacy
+
+
+def answer(question_id, text):
+    return QuizAnswer(userName="Paula", questionId=question_id, answer=text, isCorrect=False)
+
+
+def summary(database):
+    score = database.get_user_score("Paula")
+    return score["quizCorrect"], score["quizTotal"]
+
+
+def test_a_second_answer_to_a_question_is_rejected(database):
+    database.save_quiz_correct_answers(QuizCorrectAnswers(answers={"q1": "Francina"}))
+
+    assert database.save_quiz_answers("Paula", [answer("q1", "Francina"), answer("q2", "Paula")]) == [None, None]
+    errors = database.save_quiz_answers("Paula", [answer("q1", "Lula")])
+
+    assert errors == ["Question q1 has already been answered"]
+    assert {qa.questionId: qa.answer for qa in database.get_user_quiz_answers("Paula")} == {
+        "q1": "Francina", "q2": "Paula"
+    }
+    assert summary(database) == (1, 2)
+
+
+def test_the_summary_is_repaired_when_the_ledger_got_ahead(database):
+    # The worker died after writing the answer to the ledger, before the summary
+    database.save_quiz_answers("Paula", [answer("q1", "Francina")])
+    database.container.create_item(Database._ledger_document("Paula", answer("q2", "Paula")))
+    assert summary(database) == (0, 1)
+
+    # The client's retry conflicts, and the summary is rebuilt from the ledger
+    errors = database.save_quiz_answers("Paula", [answer("q2", "Paula")])
+
+    assert errors == ["Question q2 has already been answered"]
+    assert summary(database) == (0, 2)
+
+
+def test_a_retried_summary_update_does_not_count_twice(database, monkeypatch):
+    database.save_quiz_answers("Paula", [answer("q1", "Francina")])
+    fake = database.container.inner
+    replace_item = fake.replace_item
+    lost = []
+
+    def replace_item_with_a_lost_response(*args, **kwargs):
+        # The update is applied, but its response is lost: the call is retried
+        stored = replace_item(*args, **kwargs)
+        if not lost:
+            lost.append(stored)
+            raise exceptions.CosmosHttpResponseError(status_code=503, message="Service unavailable")
+        return stored
+
+    monkeypatch.setattr(fake, "replace_item", replace_item_with_a_lost_response)
+    database.save_quiz_answers("Paula", [answer("q2", "Paula")])
+
+    assert lost
+    assert summary(database) == (0, 2)
+
+
+def test_answers_are_counted_against_the_current_correct_answers(database):
+    database.save_quiz_answers("Paula", [answer("q1", "Francina"), answer("q2", "Paula")])
+    assert summary(database) == (0, 2)
+
+    database.save_quiz_correct_answers(QuizCorrectAnswers(answers={"q1": "Francina", "q2": "Paula"}))
+
+    assert summary(database) == (2, 2)
+
+
+def test_embedded_answers_are_moved_once(database, monkeypatch):
+    legacy = UserSubmission(userName="Paula", quizAnswers=[QuizAnswerData(questionId="q1", answer="Francina")])
+    database.container.upsert_item(encode_legacy(legacy))
+    monkeypatch.setattr(migrate_quiz_answers, "db", database)
+    monkeypatch.setattr("sys.argv", ["migrate_quiz_answers.py"])
+
+    migrate_quiz_answers.main()
+
+    assert [qa.answer for qa in database.get_user_quiz_answers("Paula")] == ["Francina"]
+    assert database.get_migration("quiz_answer_ledger")["submissions"] == 1
+
+    # Run again, it reads the marker and scans nothing
+    operations = database.container.inner.operations
+    migrate_quiz_answers.main()
+    assert database.container.inner.operations == operations + 1
@@ -0,0 +1,22 @@
+"""
+Tests of the question bank (quiz_questions.QuestionBank)
+
+    python -m pytest test_quiz_questions.py
+"""
+
+from quiz_questions import QuizQuestions
+
+
+def test_only_the_users_subset_is_assigned():
+    bank = QuizQuestions.bank
+    served = {bank.questions[ordinal].id for ordinal in bank.user_ordinals("Paula", 3)}
+
+    assert len(served) == 3
+    assert {q.id for q in bank.questions if bank.is_assigned("Paula", q.id, 3)} == served
+    assert not bank.is_assigned("Paula", "unknown", 3)
+
+
+def test_every_question_is_assigned_without_subsets():
+    bank = QuizQuestions.bank
+
+    assert all(bank.is_assigned("Paula", q.id, 0) for q in bank.questions)
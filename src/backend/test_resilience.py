@@ -0,0 +1,195 @@
+"""
+Tests of the resilience layer against fake_cosmos.FakeContainer
+Throttling (max_ops_per_second) and injected 503s (error_rate) come from
+the fake, so retries, give-ups and the AIMD limit are driven by the same
+responses Cosmos DB would send.
+
+    python -m pytest test_resilience.py
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from azure.cosmos import exceptions
+
+from cosmos import to_db_thread
+from fake_cosmos import FakeContainer
+from resilience import DECREASE_COOLDOWN_SECONDS, AdaptiveLimiter, ResilientContainer
+
+
+def resilient(fake, max_retries=6, sleep=lambda seconds: None, initial=8):
+    return ResilientContainer(
+        fake, AdaptiveLimiter(initial=initial, minimum=1, maximum=16),
+        max_retries=max_retries, base_delay_ms=1, max_delay_ms=10, sleep=sleep
+    )
+
+
+def test_unavailable_requests_are_retried_until_they_succeed():
+    fake = FakeContainer(error_rate=0.3, seed=1)
+    container = resilient(fake)
+
+    for i in range(200):
+        container.upsert_item({"id": f"doc_{i}", "type": "demo"})
+
+    assert len(fake.items) == 200
+    assert fake.injected_errors > 0
+    assert container.retries == fake.injected_errors
+    assert container.calls == 200 + fake.injected_errors
+    assert container.failures == 0
+    # 503s are not backpressure: the limit only grew
+    assert container.throttled == 0
+    assert container.limiter.limit > 8
+
+
+def test_gives_up_after_max_retries():
+    fake = FakeContainer(error_rate=1.0)
+    container = resilient(fake, max_retries=3)
+
+    with pytest.raises(exceptions.CosmosHttpResponseError) as error:
+        container.upsert_item({"id": "doc", "type": "demo"})
+
+    assert error.value.status_code == 503
+    assert fake.requests == 4
+    assert container.retries == 3
+    assert container.failures == 1
+
+
+def test_errors_that_are_not_transient_are_not_retried():
+    fake = FakeContainer()
+    container = resilient(fake)
+
+    with pytest.raises(exceptions.CosmosResourceNotFoundError):
+        container.read_item(item="missing", partition_key="demo")
+
+    assert fake.requests == 1
+    assert container.retries == 0
+
+
+def test_throttled_requests_wait_for_retry_after_and_lower_the_limit():
+    fake = FakeContainer(max_ops_per_second=20)
+    delays = []
+
+    def sleep(seconds):
+        delays.append(seconds)
+        time.sleep(seconds)
+
+    container = resilient(fake, sleep=sleep)
+    started = time.monotonic()
+    for i in range(30):
+        container.upsert_item({"id": f"doc_{i}", "type": "demo"})
+
+    assert len(fake.items) == 30
+    assert fake.throttled >= 1
+    assert container.retries == fake.throttled
+    # The retry waits (at least) for the x-ms-retry-after-ms the fake sent
+    assert time.monotonic() - started >= 0.5
+    assert max(delays) >= 0.5
+    # Multiplicative decrease from the initial 8, then additive increase
+    assert container.limiter.limit < 8
+
+
+def test_query_pages_are_retried():
+    fake = FakeContainer(page_size=50, seed=3)
+    for i in range(250):
+        fake.upsert_item({"id": f"doc_{i}", "type": "demo", "n": i})
+    fake.error_rate = 0.3
+    container = resilient(fake)
+
+    rows = list(container.query_items(query="SELECT * FROM c WHERE c.type = 'demo'", partition_key="demo"))
+
+    assert sorted(row["n"] for row in rows) == list(range(250))
+    assert container.retries == fake.injected_errors > 0
+
+
+class UnavailableOnce(FakeContainer):
+    """Answers the first create with 503, after applying it when written is set (a lost response)"""
+
+    def __init__(self, written: bool):
+        super().__init__()
+        self.written = written
+        self.unavailable = True
+
+    def create_item(self, body, **kwargs):
+        if self.unavailable:
+            self.unavailable = False
+            if self.written:
+                super().create_item(body, **kwargs)
+            raise exceptions.CosmosHttpResponseError(status_code=503, message="Service unavailable")
+        return super().create_item(body, **kwargs)
+
+
+def test_create_that_succeeded_before_a_503_is_not_a_conflict():
+    container = resilient(UnavailableOnce(written=True))
+
+    created = container.create_item({"id": "qa_Paula_q1", "type": "quiz_answer", "answer": "Lula"})
+
+    assert created["answer"] == "Lula"
+    assert container.retries == 1
+
+
+def test_create_of_a_different_document_after_a_503_still_conflicts():
+    fake = UnavailableOnce(written=False)
+    fake.upsert_item({"id": "qa_Paula_q1", "type": "quiz_answer", "answer": "Diego"})
+    container = resilient(fake)
+
+    with pytest.raises(exceptions.CosmosResourceExistsError):
+        container.create_item({"id": "qa_Paula_q1", "type": "quiz_answer", "answer": "Lula"})
+
+
+def test_create_conflict_without_a_503_is_not_retried():
+    fake = FakeContainer()
+    container = resilient(fake)
+    container.create_item({"id": "qa_Paula_q1", "type": "quiz_answer", "answer": "Lula"})
+
+    with pytest.raises(exceptions.CosmosResourceExistsError):
+        container.create_item({"id": "qa_Paula_q1", "type": "quiz_answer", "answer": "Lula"})
+
+    assert fake.requests == 2
+    assert container.retries == 0
+
+
+def test_aimd_limit():
+    limiter = AdaptiveLimiter(initial=8, minimum=1, maximum=16)
+
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+    # A burst of throttled responses counts once
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release()
+    assert 4.9 < limiter.limit < 5
+
+    # Once the cooldown is over, throttling halves it again, down to the minimum
+    for _ in range(4):
+        time.sleep(DECREASE_COOLDOWN_SECONDS)
+        limiter.acquire()
+        limiter.release(throttled=True)
+    assert limiter.limit == 1
+
+
+def test_db_calls_waiting_for_the_limiter_leave_the_default_executor_free():
+    limiter = AdaptiveLimiter(initial=1, minimum=1, maximum=1)
+    limiter.acquire()
+
+    async def run():
+        # Blocked on the limiter, like calls while Cosmos DB throttles
+        blocked = [asyncio.ensure_future(to_db_thread(limiter.acquire)) for _ in range(64)]
+        names = await asyncio.wait_for(
+            asyncio.gather(*(asyncio.to_thread(lambda: threading.current_thread().name) for _ in range(64))), 5
+        )
+        for _ in blocked:
+            limiter.release()
+        await asyncio.gather(*blocked)
+        return names, await to_db_thread(lambda: threading.current_thread().name)
+
+    names, db_thread = asyncio.run(run())
+
+    assert len(names) == 64
+    assert db_thread.startswith("cosmos")
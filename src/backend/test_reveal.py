@@ -0,0 +1,41 @@
+"""
+Tests of the reveal snapshot (reveal.RevealSnapshots) against a Database on
+the in-memory Cosmos DB. Two RevealSnapshots on the same database stand in
+for two workers.
+
+    python -m pytest test_reveal.py
+"""
+
+from datetime import datetime, timedelta
+
+from models import AMIGOS_INVISIBLES, CorrectAnswers
+from reveal import RevealSnapshots
+
+
+def set_correct_answers(database):
+    receivers = AMIGOS_INVISIBLES[1:] + AMIGOS_INVISIBLES[:1]
+    database.save_correct_answers(CorrectAnswers(answers=dict(zip(AMIGOS_INVISIBLES, receivers))))
+
+
+def test_a_snapshot_finalized_by_another_worker_is_final_everywhere(database):
+    set_correct_answers(database)
+    finalizing, other = RevealSnapshots(database, None), RevealSnapshots(database, None)
+    other.load()
+
+    finalizing.finalize()
+
+    assert other.current is None
+    assert other.is_final()
+    other.reopen()
+    assert not finalizing.is_final()
+
+
+def test_without_a_reveal_date_nothing_is_frozen_automatically(database):
+    set_correct_answers(database)
+    undated = RevealSnapshots(database, None)
+
+    assert undated.freeze_if_due()
+    assert undated.current is None and not undated.is_final()
+
+    RevealSnapshots(database, datetime.utcnow() - timedelta(minutes=1)).freeze_if_due()
+    assert undated.is_final()
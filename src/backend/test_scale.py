@@ -0,0 +1,283 @@
+"""
+Scale-curve test: every endpoint against growing synthetic games
+Each game size is measured in a fresh interpreter, because the roster is
+fixed when models is imported. The app runs in-process (TestClient)
+against the in-memory Cosmos DB (COSMOS_BACKEND=fake) with a fixed
+simulated latency per request (FAKE_LATENCY), so timings are dominated by
+round trips rather than noise. Loading the game and background jobs run
+without it. Every response (or WebSocket exchange) must be what the
+endpoint table expects. For every endpoint, the number of Cosmos DB
+operations and the median latency per request are fitted to a power law
+c * size^k:
+
+- DB operations growing with k above DB_CALLS_EXPONENT_LIMIT means the
+  endpoint reads per player (or per question). Only the endpoints in
+  PER_ITEM_ENDPOINTS may do that, and never superlinearly
+  (PER_ITEM_EXPONENT_LIMIT).
+- Latency growing with k above LATENCY_EXPONENT_LIMIT means the endpoint
+  does superlinear work. Latencies under one simulated round trip
+  (LATENCY_FLOOR_SECONDS) are fitted as one, so endpoints that never reach
+  the database don't fail on timer noise.
+
+The participant count stays fixed: it is bounded by the real exchange, and
+consensus / what-if solve assignment problems over it by design.
+
+    python -m pytest test_scale.py   # fails on endpoints that don't scale
+    python test_scale.py             # prints the growth curves
+"""
+
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+BASE_GAME = {"participants": 8, "players": 40, "questions": 30}
+SWEEPS = {
+    "players": [40, 80, 160, 320],
+    "questions": [30, 60, 120, 240],
+}
+REPEATS = 5
+ADMIN_SECRET = "scale-test"
+
+DB_CALLS_EXPONENT_LIMIT = 0.25
+PER_ITEM_EXPONENT_LIMIT = 1.25
+LATENCY_EXPONENT_LIMIT = 1.25
+
+# Simulated latency of every Cosmos DB request (fake_cosmos.LatencyModel spec)
+FAKE_LATENCY = "fixed:2"
+LATENCY_FLOOR_SECONDS = 0.002
+
+# Endpoints whose DB operations are expected to grow linearly
+PER_ITEM_ENDPOINTS = {
+    "POST /api/admin/set-correct-answers": "rescores every submission in a background job",
+    "POST /api/admin/quiz-answers": "rescores every submission in a background job",
+}
+
+
+def endpoints(game, client):
+    """(name, method, path, json body per repetition, expected outcome) for every endpoint in main.py
+
+    The expected outcome is one for every repetition, or a list with one per
+    repetition: the status of HTTP endpoints, a tuple of the types of the
+    messages received for WebSockets ("WS"). The path can be one per repetition too.
+    """
+    player = game.players[0]
+    unanswered = [q["id"] for q in game.questions if q["id"] not in game.quiz_answers[player]]
+    job_id = client.get("/api/admin/jobs").json()["data"][0]["id"]
+    return [
+        ("GET /api/health", "GET", "/api/health", None, 200),
+        ("POST /api/predictions", "POST", "/api/predictions",
+         lambda r: {"userName": player, "predictions": game.predictions[game.players[r + 1]]}, 201),
+        ("GET /api/predictions/consensus", "GET", "/api/predictions/consensus", None, 200),
+        ("GET /api/predictions/status", "GET", "/api/predictions/status", None, 200),
+        ("GET /api/predictions/all", "GET", "/api/predictions/all", None, 200),
+        ("POST /api/predictions/what-if", "POST", "/api/predictions/what-if",
+         lambda r: {"revealed": dict(list(game.correct_answers.items())[:len(game.participants) // 2])}, 200),
+        ("GET /api/predictions/{userName}", "GET", f"/api/predictions/{player}", None, 200),
+        ("GET /api/scores", "GET", "/api/scores", None, 200),
+        ("GET /api/quiz/questions/{userName}", "GET", f"/api/quiz/questions/{player}", None, 200),
+        ("POST /api/quiz/answer", "POST", "/api/quiz/answer",
+         lambda r: {"userName": player, "questionId": unanswered[r], "answer": "Option"}, 201),
+        ("GET /api/quiz/score/{userName}", "GET", f"/api/quiz/score/{player}", None, 200),
+        ("GET /api/admin/quiz-questions", "GET", "/api/admin/quiz-questions", None, 200),
+        ("GET /api/combined-score/{userName}", "GET", f"/api/combined-score/{player}", None, 200),
+        ("GET /api/scoreboard", "GET", "/api/scoreboard", None, 200),
+        # A player connects (their answers are read) and answers while no round runs
+        ("WS /ws/quiz/{userName}", "WS", lambda r: f"/ws/quiz/{game.players[r + 1]}",
+         lambda r: {"type": "answer", "questionId": unanswered[0], "answer": "Option"}, ("welcome", "error")),
+        # Only one round runs at a time
+        ("POST /api/admin/live-quiz/start", "POST", "/api/admin/live-quiz/start", lambda r: None,
+         [200] + [409] * (REPEATS - 1)),
+        ("GET /api/admin/live-quiz", "GET", "/api/admin/live-quiz", None, 200),
+        ("GET /api/admin/snapshot", "GET", "/api/admin/snapshot", None, 200),
+        ("GET /api/admin/jobs", "GET", "/api/admin/jobs", None, 200),
+        ("GET /api/admin/jobs/{jobId}", "GET", f"/api/admin/jobs/{job_id}", None, 200),
+        # The job has completed by now
+        ("POST /api/admin/jobs/{jobId}/cancel", "POST", f"/api/admin/jobs/{job_id}/cancel", lambda r: None, 409),
+        ("GET /api/metrics", "GET", "/api/metrics", None, 200),
+        ("GET /api/debug/allocations", "GET", "/api/debug/allocations", None, 200),
+        ("GET /api/debug/profiles", "GET", "/api/debug/profiles", None, 200),
+        ("GET /api/debug/profiles/{requestId}", "GET", "/api/debug/profiles/unknown", None, 404),
+        ("GET /api/version", "GET", "/api/version", None, 200),
+        ("POST /api/admin/reveal/finalize", "POST", "/api/admin/reveal/finalize", lambda r: None, 200),
+        ("POST /api/admin/reveal/reopen", "POST", "/api/admin/reveal/reopen", lambda r: None, 200),
+        # Last: they make every stored score stale
+        ("POST /api/admin/set-correct-answers", "POST", "/api/admin/set-correct-answers",
+         lambda r: {"answers": game.correct_answers}, 200),
+        ("POST /api/admin/quiz-answers", "POST", "/api/admin/quiz-answers",
+         lambda r: {"answers": game.quiz_correct_answers}, 200),
+    ]
+
+
+def exchange(client, method: str, path: str, body) -> tuple:
+    """Send one request (or hold one WebSocket exchange); returns its outcome and a description"""
+    if method == "WS":
+        with client.websocket_connect(path) as websocket:
+            received = [websocket.receive_json()]
+            websocket.send_json(body)
+            received.append(websocket.receive_json())
+        return tuple(message["type"] for message in received), json.dumps(received)
+    response = client.request(method, path, json=body, headers={"X-Admin-Secret": ADMIN_SECRET})
+    return response.status_code, response.text
+
+
+def measure(game_size: dict) -> dict:
+    """Median latency (seconds) and DB operations per endpoint for one game size"""
+    from synthetic import SyntheticGame
+
+    game = SyntheticGame(**game_size)
+    game.install_roster()
+
+    from datetime import datetime
+    from fastapi.routing import APIRoute, APIWebSocketRoute
+    from fastapi.testclient import TestClient
+    import main
+
+    fake = main.db.container.inner
+
+    @contextmanager
+    def without_latency():
+        latency, fake.latency = fake.latency, {}
+        try:
+            yield
+        finally:
+            fake.latency = latency
+
+    def wait_for_jobs() -> int:
+        """Wait until no background job runs; returns the lock reads it took"""
+        reads = 1
+        with without_latency():
+            while main.db.get_job_lock() is not None:
+                time.sleep(0.005)
+                reads += 1
+        return reads
+
+    results = {}
+    with TestClient(main.app) as client:
+        with without_latency():
+            game.load(main.db)
+        # A job for the job endpoints (workers only start one when scores are stale)
+        client.portal.call(main.jobs.enqueue_rescore, "scale test")
+        wait_for_jobs()
+        # Open the reveal endpoints. The snapshot task waits for the configured
+        # (future) date, so they compute live results, which is what is measured
+        main.settings.REVEAL_DATE = datetime.utcnow()
+        table = endpoints(game, client)
+
+        routes = {
+            f"{method} {route.path}" for route in main.app.routes
+            if isinstance(route, APIRoute) for method in route.methods
+        } | {f"WS {route.path}" for route in main.app.routes if isinstance(route, APIWebSocketRoute)}
+        missing = routes - {name for name, *_ in table}
+        if missing:
+            raise AssertionError(f"Endpoints not covered by the scale test: {sorted(missing)}")
+
+        for name, method, path, body, expected in table:
+            if not isinstance(expected, list):
+                expected = [expected] * REPEATS
+            latencies, db_calls = [], []
+            for r in range(REPEATS):
+                operations = fake.operations
+                started = time.perf_counter()
+                outcome, text = exchange(client, method, path(r) if callable(path) else path, body(r) if body else None)
+                latencies.append(time.perf_counter() - started)
+                lock_reads = wait_for_jobs()
+                db_calls.append(fake.operations - operations - lock_reads)
+                if outcome != expected[r]:
+                    raise AssertionError(f"{name} answered {outcome}, expected {expected[r]}: {text[:200]}")
+            results[name] = {"latency": statistics.median(latencies), "dbCalls": statistics.median(db_calls)}
+    return results
+
+
+def growth_exponent(sizes, values) -> float:
+    """k of the least-squares fit of values = c * sizes^k (on a log-log scale)"""
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(value, 1e-6)) for value in values]
+    mean_x, mean_y = statistics.mean(xs), statistics.mean(ys)
+    return (
+        sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+        / sum((x - mean_x) ** 2 for x in xs)
+    )
+
+
+def run_sweep(dimension: str) -> dict:
+    """Measure every size of a sweep, each in a fresh interpreter"""
+    curves = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SWEEPS[dimension]:
+            game_size = dict(BASE_GAME, **{dimension: size})
+            bank = os.path.join(directory, f"bank_{size}.ndjson")
+            env = dict(
+                os.environ,
+                COSMOS_BACKEND="fake",
+                COSMOS_FAKE_READ_LATENCY=FAKE_LATENCY,
+                COSMOS_FAKE_WRITE_LATENCY=FAKE_LATENCY,
+                COSMOS_FAKE_QUERY_LATENCY=FAKE_LATENCY,
+                COSMOS_FAKE_RU_PER_SECOND="0",
+                COSMOS_FAKE_ERROR_RATE="0",
+                QUESTION_BANK_SOURCE="file",
+                QUESTION_BANK_FILE=bank,
+                RATE_LIMIT_ENABLED="false",
+                RESCORE_DOCUMENTS_PER_SECOND="1000000",
+                REVEAL_DATE="2999-12-24T00:00:00",  # measure the live game, not the frozen reveal
+                ADMIN_SECRET=ADMIN_SECRET,
+            )
+            output = subprocess.run(
+                [sys.executable, __file__, "--measure", json.dumps(game_size), bank],
+                env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True, check=True
+            ).stdout
+            for name, result in json.loads(output.splitlines()[-1]).items():
+                curves.setdefault(name, []).append(result)
+    return curves
+
+
+def check_sweep(dimension: str) -> tuple:
+    """Growth exponents per endpoint, and the endpoints whose DB operations or latency don't scale"""
+    sizes = SWEEPS[dimension]
+    rows, failures = [], []
+    for name, curve in run_sweep(dimension).items():
+        latency_k = growth_exponent(sizes, [max(point["latency"], LATENCY_FLOOR_SECONDS) for point in curve])
+        db_k = growth_exponent(sizes, [max(point["dbCalls"], 1) for point in curve])
+        db_limit = PER_ITEM_EXPONENT_LIMIT if name in PER_ITEM_ENDPOINTS else DB_CALLS_EXPONENT_LIMIT
+        rows.append((name, curve, latency_k, db_k))
+        if db_k > db_limit:
+            failures.append(f"{name}: DB operations grow as {dimension}^{db_k:.2f}")
+        if latency_k > LATENCY_EXPONENT_LIMIT:
+            failures.append(f"{name}: latency grows as {dimension}^{latency_k:.2f}")
+    return rows, failures
+
+
+def test_endpoints_scale_with_players():
+    _, failures = check_sweep("players")
+    assert not failures, "\n".join(failures)
+
+
+def test_endpoints_scale_with_questions():
+    _, failures = check_sweep("questions")
+    assert not failures, "\n".join(failures)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--measure":
+        game_size = json.loads(sys.argv[2])
+        from synthetic import SyntheticGame
+        SyntheticGame(**game_size).write_question_bank(sys.argv[3])
+        print(json.dumps(measure(game_size)))
+        sys.exit(0)
+
+    for dimension, sizes in SWEEPS.items():
+        rows, failures = check_sweep(dimension)
+        print(f"\n=== {dimension}: {sizes} ===")
+        for name, curve, latency_k, db_k in rows:
+            latencies = " ".join(f"{point['latency'] * 1000:7.1f}" for point in curve)
+            db_calls = " ".join(f"{point['dbCalls']:5g}" for point in curve)
+            flag = " ⚠️" if latency_k > LATENCY_EXPONENT_LIMIT else ""
+            print(f"{name:40} ms [{latencies}] k={latency_k:5.2f}{flag:3}   db [{db_calls}] k={db_k:5.2f}")
+        for failure in failures:
+            print(f"❌ {failure}")
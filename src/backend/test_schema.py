@@ -0,0 +1,87 @@
+"""
+Tests of the user_submission storage schema (schema.SubmissionCodec)
+
+    python -m pytest test_schema.py
+"""
+
+from datetime import datetime
+
+import pytest
+
+from fake_cosmos import FakeContainer
+from models import QuizAnswerData, UserSubmission
+from schema import COMPACT_SCHEMA_VERSION, SubmissionCodec, encode_legacy
+
+
+def submission():
+    created = datetime(2024, 12, 1, 10, 30, 15, 123456)
+    return UserSubmission(
+        id="user_Paula",
+        userName="Paula",
+        predictions={"Miriam": "Paula", "Paula": "Lula", "Diego": "Miriam"},
+        quizAnswers=[
+            QuizAnswerData(questionId="q1", answer="Lula", timestamp=datetime(2024, 12, 2, 9, 0, 0, 1)),
+            # Not one of the options: kept as text
+            QuizAnswerData(questionId="q2", answer="Nadie", timestamp=datetime(2024, 12, 2, 9, 0, 1, 999999)),
+        ],
+        timestamp=created,
+        createdAt=created,
+        updatedAt=datetime(2024, 12, 3, 18, 45, 0, 654321),
+    )
+
+
+def test_compact_documents_round_trip_with_microseconds():
+    codec = SubmissionCodec(FakeContainer())
+    original = submission()
+
+    doc = codec.encode(original)
+
+    assert doc["schemaVersion"] == COMPACT_SCHEMA_VERSION
+    assert doc["qa"][0][1] == 2  # option index of "Lula"
+    assert doc["qa"][1][1] == "Nadie"
+    assert UserSubmission(**codec.decode(doc)) == original
+
+
+def test_legacy_and_compact_documents_decode_the_same():
+    codec = SubmissionCodec(FakeContainer())
+    original = submission()
+
+    assert codec.decode(encode_legacy(original)) == codec.decode(codec.encode(original))
+
+
+def test_version_2_documents_are_read_in_milliseconds():
+    codec = SubmissionCodec(FakeContainer())
+    doc = codec.encode(submission())
+    doc["schemaVersion"] = 2
+    for field in ("ts", "createdAt", "updatedAt"):
+        doc[field] //= 1000
+    for entry in doc["qa"]:
+        entry[2] //= 1000
+
+    decoded = codec.decode(doc)
+
+    assert decoded["updatedAt"] == datetime(2024, 12, 3, 18, 45, 0, 654000)
+    assert decoded["quizAnswers"][1]["timestamp"] == datetime(2024, 12, 2, 9, 0, 1, 999000)
+
+
+def test_older_versions_are_read_from_the_schema_documents_once():
+    container = FakeContainer()
+    doc = SubmissionCodec(container).encode(submission())
+
+    # A process that only knows other roster and question set versions
+    codec = SubmissionCodec(container)
+    codec._rosters.clear()
+    codec._question_sets.clear()
+    operations = container.operations
+
+    assert UserSubmission(**codec.decode(doc)) == submission()
+    assert UserSubmission(**codec.decode(doc)) == submission()
+    assert container.operations - operations == 2
+
+
+def test_unknown_versions_are_rejected():
+    codec = SubmissionCodec(FakeContainer())
+    doc = dict(codec.encode(submission()), rosterVersion="0123456789ab")
+
+    with pytest.raises(ValueError):
+        codec.decode(doc)
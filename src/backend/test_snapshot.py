@@ -0,0 +1,45 @@
+"""
+Tests of game snapshot export and restore (snapshot.py) with fake_cosmos
+
+    python -m pytest test_snapshot.py
+"""
+
+import io
+
+from fake_cosmos import FakeContainer
+from snapshot import export_snapshot, iter_snapshot_chunks, read_snapshot, restore_snapshot
+
+GAME_DATA = [
+    {"id": "user_Paula", "type": "user_submission", "userName": "Paula"},
+    {"id": "qa_Paula_q1", "type": "quiz_answer", "userName": "Paula", "questionId": "q1"},
+    {"id": "correct_answers", "type": "answers", "answers": {}},
+    {"id": "quiz_correct_answers", "type": "quiz_answers", "answers": {}},
+    {"id": "roster_0123456789ab", "type": "schema", "values": ["Paula"]},
+]
+TRANSIENT = [
+    {"id": "idem_0123", "type": "idempotency", "status": None},
+    {"id": "job_lock", "type": "job", "jobId": "job_1"},
+    {"id": "reveal_snapshot", "type": "reveal", "status": "final"},
+    {"id": "live_quiz_round", "type": "live_quiz", "questionIds": []},
+]
+
+
+def test_only_game_data_is_exported():
+    container = FakeContainer()
+    for doc in GAME_DATA + TRANSIENT:
+        container.upsert_item(doc)
+    exported = io.BytesIO()
+
+    assert export_snapshot(container, exported) == len(GAME_DATA)
+
+    exported.seek(0)
+    assert sorted(doc["id"] for doc in read_snapshot(exported)) == sorted(doc["id"] for doc in GAME_DATA)
+
+
+def test_transient_documents_of_old_snapshots_are_not_restored():
+    snapshot = io.BytesIO(b"".join(iter_snapshot_chunks(GAME_DATA + TRANSIENT)))
+    container = FakeContainer()
+
+    restore_snapshot(container, snapshot, verbose=False)
+
+    assert sorted(doc_id for _, doc_id in container.items) == sorted(doc["id"] for doc in GAME_DATA)
@@ -0,0 +1,28 @@
+"""
+Rewrite legacy user_submission documents in the compact storage schema
+Servers write a user's document in the compact schema the next time that
+user changes it; this moves all the others at once. Run it once, after the
+servers run with STORAGE_SCHEMA_VERSION set to the compact version. Each
+rewrite is conditional on the document's ETag, so it is safe while the game
+is live, and it can be run again to pick up documents that changed meanwhile.
+
+Usage:
+    python upgrade_schema.py
+"""
+
+from config import settings
+from database import db
+from schema import COMPACT_SCHEMA_VERSION, is_compact
+
+
+def main():
+    if not is_compact(settings.STORAGE_SCHEMA_VERSION):
+        print(f"⚠️ STORAGE_SCHEMA_VERSION is {settings.STORAGE_SCHEMA_VERSION}: servers still write the "
+              f"legacy schema. Set it to {COMPACT_SCHEMA_VERSION} first.")
+        return
+    upgraded = db.upgrade_submissions()
+    print(f"✅ Upgraded {upgraded} submissions to the compact schema")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+What-if engine for partially revealed Secret Santa assignments
+Given the pairs revealed so far, computes for every player the score range
+still reachable and the chance of winning over all assignments consistent
+with the reveal (bijections of the remaining givers to the remaining
+receivers in which nobody gives to themselves).
+
+- Minimum / maximum scores come from optimal assignment (O(n^3)), not enumeration.
+- Players who cannot reach the best guaranteed score are pruned (0% chance).
+- Win chances are exact for small remainders (backtracking over completions)
+  and estimated by uniform sampling of completions for larger ones.
+"""
+
+import random
+from math import comb, factorial
+from typing import Dict, List
+
+from assignment import FORBIDDEN, max_weight_assignment
+from config import settings
+
+
+class WhatIfError(ValueError):
+    """The revealed pairs are not consistent with any valid assignment"""
+
+
+def count_completions(givers: List[str], receivers: List[str]) -> int:
+    """Number of valid completions (inclusion-exclusion over possible self-gifts)"""
+    k = len(givers)
+    f = len(set(givers) & set(receivers))
+    return sum((-1) ** j * comb(f, j) * factorial(k - j) for j in range(f + 1))
+
+
+def _score_bound(givers, receivers, votes, maximize: bool) -> int:
+    """Best (or worst) number of a player's remaining predictions that can come true"""
+    sign = 1 if maximize else -1
+    weights = [
+        [FORBIDDEN if g == r else sign * (1 if votes.get(g) == r else 0) for r in receivers]
+        for g in givers
+    ]
+    columns = max_weight_assignment(weights)
+    return sum(1 for g, c in zip(givers, columns) if votes.get(g) == receivers[c])
+
+
+def _exact_wins(givers, receivers, players, base, hits) -> Dict[str, float]:
+    """Expected win share per player over every completion (backtracking)"""
+    wins = {p: 0.0 for p in players}
+    scores = dict(base)
+    used = [False] * len(receivers)
+    total = 0
+
+    def visit(i):
+        nonlocal total
+        if i == len(givers):
+            total += 1
+            top = max(scores[p] for p in players)
+            winners = [p for p in players if scores[p] == top]
+            for p in winners:
+                wins[p] += 1 / len(winners)
+            return
+        giver = givers[i]
+        for j, receiver in enumerate(receivers):
+            if used[j] or receiver == giver:
+                continue
+            used[j] = True
+            for p in hits[giver].get(receiver, ()):
+                scores[p] += 1
+            visit(i + 1)
+            for p in hits[giver].get(receiver, ()):
+                scores[p] -= 1
+            used[j] = False
+
+    visit(0)
+    return {p: wins[p] / total for p in players}
+
+
+def _sampled_wins(givers, receivers, players, base, hits, samples: int) -> Dict[str, float]:
+    """Estimated win share per player from uniformly sampled completions"""
+    rng = random.Random(0)  # deterministic results for identical inputs
+    wins = {p: 0.0 for p in players}
+    shuffled = list(receivers)
+    drawn = 0
+    while drawn < samples:
+        rng.shuffle(shuffled)
+        # Rejection keeps the sample uniform over valid completions
+        if any(g == r for g, r in zip(givers, shuffled)):
+            continue
+        drawn += 1
+        scores = dict(base)
+        for giver, receiver in zip(givers, shuffled):
+            for p in hits[giver].get(receiver, ()):
+                scores[p] += 1
+        top = max(scores[p] for p in players)
+        winners = [p for p in players if scores[p] == top]
+        for p in winners:
+            wins[p] += 1 / len(winners)
+    return {p: wins[p] / samples for p in players}
+
+
+def what_if(revealed: Dict[str, str], predictions: Dict[str, Dict[str, str]], participants: List[str]) -> dict:
+    """Score ranges and win chances for every player given the revealed pairs
+
+    revealed: giver -> receiver pairs known so far
+    predictions: userName -> {giver: receiver}
+    participants: everyone taking part in the exchange
+    """
+    revealed_receivers = set(revealed.values())
+    givers = [g for g in participants if g not in revealed]
+    receivers = [r for r in participants if r not in revealed_receivers]
+    completions = count_completions(givers, receivers)
+    if completions == 0:
+        raise WhatIfError("No valid assignment is consistent with the revealed pairs")
+
+    players = sorted(predictions)
+    current = {
+        p: sum(1 for g, r in revealed.items() if predictions[p].get(g) == r)
+        for p in players
+    }
+    minimum = {p: current[p] + _score_bound(givers, receivers, predictions[p], maximize=False) for p in players}
+    maximum = {p: current[p] + _score_bound(givers, receivers, predictions[p], maximize=True) for p in players}
+
+    # Nobody can finish below the best guaranteed score
+    floor = max(minimum.values(), default=0)
+    contenders = [p for p in players if maximum[p] >= floor]
+
+    # hits[giver][receiver] = contenders who predicted that pair
+    hits = {g: {} for g in givers}
+    for p in contenders:
+        for g in givers:
+            r = predictions[p].get(g)
+            if r is not None:
+                hits[g].setdefault(r, []).append(p)
+
+    if len(contenders) <= 1:
+        chances, method = {p: 1.0 for p in contenders}, "exact"
+    elif completions <= settings.WHATIF_EXACT_LIMIT:
+        chances, method = _exact_wins(givers, receivers, contenders, current, hits), "exact"
+    else:
+        chances = _sampled_wins(givers, receivers, contenders, current, hits, settings.WHATIF_SAMPLES)
+        method = "sampled"
+
+    return {
+        "consistentAssignments": completions,
+        "method": method,
+        "players": sorted(
+            (
+                {
+                    "userName": p,
+                    "currentCorrect": current[p],
+                    "minCorrect": minimum[p],
+                    "maxCorrect": maximum[p],
+                    "winProbability": round(chances.get(p, 0.0), 4),
+                }
+                for p in players
+            ),
+            key=lambda x: (x["winProbability"], x["maxCorrect"]),
+            reverse=True
+        ),
+    }